@@ -0,0 +1,154 @@
+import numpy as np
+import optparse
+
+## Summaries of per-event metrics, updated chunk by chunk and mergeable across
+## processes or machines: train.py saves one per metric and algorithm of a job,
+## and the jobs of a scan are combined from these files, without their per-event arrays:
+##   Moments   : count, mean, std (as np.mean/np.std), min, max
+##   Histogram : fixed binning, with under/overflow, and approximate quantiles
+##   MetricAccumulator : both, saved to / loaded from .npz files
+
+class Moments:
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self.M2 = 0.
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        if len(x)==0: return self
+        other = Moments()
+        other.n = len(x)
+        other.mean = x.mean()
+        other.M2 = np.sum((x-other.mean)**2)
+        other.min = x.min()
+        other.max = x.max()
+        return self.merge(other)
+
+    ## pairwise combination of Chan et al.
+    def merge(self, other):
+        n = self.n + other.n
+        if n==0: return self
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta*other.n/n
+        self.M2 = self.M2 + other.M2 + delta**2*self.n*other.n/n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def std(self):
+        return np.sqrt(self.M2/self.n) if self.n else np.nan
+
+    def state(self):
+        return {'n':self.n, 'mean':self.mean, 'M2':self.M2, 'min':self.min, 'max':self.max}
+
+    @classmethod
+    def fromState(cls, state):
+        m = cls()
+        m.n, m.mean, m.M2, m.min, m.max = int(state['n']), float(state['mean']), float(state['M2']), float(state['min']), float(state['max'])
+        return m
+
+class Histogram:
+    def __init__(self, nbins=100, lims=(0.,1.)):
+        self.edges = np.linspace(lims[0], lims[1], nbins+1)
+        # [underflow, bins..., overflow]
+        self.counts = np.zeros(nbins+2, dtype=np.int64)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        # the last bin includes its upper edge, as np.histogram
+        ibin = np.searchsorted(self.edges, x, side='right')
+        ibin[x==self.edges[-1]] = len(self.edges)-1
+        self.counts += np.bincount(ibin, minlength=len(self.counts))
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("can only merge histograms with the same binning")
+        self.counts += other.counts
+        return self
+
+    ## quantiles from the cumulative counts, interpolated linearly within the bins;
+    ## values in the under/overflow are reported at the first/last edge
+    def quantile(self, q):
+        n = self.counts.sum()
+        if n==0: return np.full(np.shape(q), np.nan)
+        cum = np.cumsum(self.counts)
+        target = np.asarray(q, dtype=np.float64)*n
+        ibin = np.clip(np.searchsorted(cum, target, side='left'), 1, len(self.edges)-1)
+        before = cum[ibin-1]
+        inbin = self.counts[ibin]
+        frac = np.clip(np.divide(target-before, inbin, out=np.zeros_like(target), where=inbin>0), 0., 1.)
+        lo = self.edges[ibin-1]
+        hi = self.edges[ibin]
+        return lo + frac*(hi-lo)
+
+class MetricAccumulator:
+    def __init__(self, nbins=1000, lims=(-1.,20.)):
+        self.moments = Moments()
+        self.hist = Histogram(nbins, lims)
+
+    def update(self, x):
+        self.moments.update(x)
+        self.hist.update(x)
+        return self
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.hist.merge(other.hist)
+        return self
+
+    def quantile(self, q):
+        return self.hist.quantile(q)
+
+    ## same values as the text files written by plotHist
+    def summary(self):
+        return "{}, {}, {}, \t {}, {}, \n".format(*self.quantile([0.5, 0.5-0.68/2, 0.5+0.68/2]),
+                                                 self.moments.mean, self.moments.std())
+
+    def save(self, fname):
+        np.savez(fname, edges=self.hist.edges, counts=self.hist.counts, **self.moments.state())
+
+    @classmethod
+    def load(cls, fname):
+        with np.load(fname) as f:
+            acc = cls()
+            acc.hist.edges = f['edges']
+            acc.hist.counts = f['counts']
+            acc.moments = Moments.fromState(f)
+        return acc
+
+## binning of the evalModel metrics (all have -1/-0.5 sentinels for empty events)
+metricLims = {
+    'EMD'       :(-1.,20.),
+    'dMean'     :(-1.,20.),
+    'dRMS'      :(-1.,10.),
+    'cross_corr':(-1.,1.),
+    'SSD'       :(-1.,10.),
+}
+
+def accumulate(vals, chunksize=100000, **kwargs):
+    acc = MetricAccumulator(**kwargs)
+    for i in range(0, len(vals), chunksize):
+        acc.update(vals[i:i+chunksize])
+    return acc
+
+def mergeFiles(fnames):
+    acc = MetricAccumulator.load(fnames[0])
+    for fname in fnames[1:]:
+        acc.merge(MetricAccumulator.load(fname))
+    return acc
+
+## merge the accumulators saved by separate jobs, e.g.
+## python accumulators.py -o acc_EMD_ae.npz job*/acc_EMD_ae.npz
+if __name__== "__main__":
+    parser = optparse.OptionParser(usage="usage: %prog [options] acc1.npz acc2.npz ...")
+    parser.add_option('-o',"--output", type="string", default = '', dest="output", help="write the merged accumulator to this file")
+    (options, args) = parser.parse_args()
+    acc = mergeFiles(args)
+    print('n =',acc.moments.n)
+    print('median, lo, hi, mean, std:', acc.summary())
+    if options.output: acc.save(options.output)
@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+import numpy as np
+from collections import OrderedDict
+import poolUtil
+
+## Cache of the baseline algorithm outputs (stc, bc, thr_lo, ...) and of their
+## per-event metrics, which depend only on the validation inputs and not on the AE.
+## Entries are keyed by a hash of the validation arrays plus the settings of the
+## algorithm/metric, kept in memory for the later models of a run and, with a
+## cacheDir, saved as .npy files for later runs.
+## The memory holds up to maxMemory bytes of entries, the least recently used go first.
+
+maxMemory = 2**30
+_memory = OrderedDict()
+
+def arrayHash(*arrays):
+    h = hashlib.sha1()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(str((a.dtype.str, a.shape)).encode())
+        h.update(a.view(np.uint8).reshape(-1) if a.size else b'')
+    return h.hexdigest()
+
+def entryKey(dataKey, name, settings=None):
+    if settings is None: settings = {}
+    key = json.dumps({'data':dataKey, 'name':name, 'settings':settings}, sort_keys=True, default=str)
+    return "{}_{}".format(name, hashlib.sha1(key.encode()).hexdigest()[:16])
+
+def cached(cacheDir, dataKey, name, settings, compute):
+    key = entryKey(dataKey, name, settings)
+    if key in _memory:
+        _memory.move_to_end(key)
+        return _memory[key]
+    fname = os.path.join(cacheDir, key+'.npy') if cacheDir else ''
+    if fname and os.path.exists(fname):
+        print('Using cached', name, 'from', fname)
+        arr = np.load(fname)
+    else:
+        arr = np.asarray(compute())
+        if fname:
+            if not os.path.exists(cacheDir): os.makedirs(cacheDir, exist_ok=True)
+            poolUtil.saveArray(fname, arr)
+    remember(key, arr)
+    return arr
+
+def remember(key, arr):
+    if arr.nbytes > maxMemory: return
+    _memory[key] = arr
+    size = sum(a.nbytes for a in _memory.values())
+    while size > maxMemory:
+        _, old = _memory.popitem(last=False)
+        size -= old.nbytes
+
+def clear():
+    _memory.clear()
@@ -0,0 +1,47 @@
+import numpy as np
+
+## Traditional compression algorithms used as benchmarks for the AE,
+## applied to all events at once: inQ is an (N,48) (or (N,...)) array of charges.
+
+STC4mask = np.array([
+    [ 0,  1,  4,  5], #indices for 1 super trigger cell
+    [ 2,  3,  6,  7],
+    [ 8,  9, 12, 13],
+    [10, 11, 14, 15],
+    [16, 17, 20, 21],
+    [18, 19, 22, 23],
+    [24, 25, 28, 29],
+    [26, 27, 30, 31],
+    [32, 33, 36, 37],
+    [34, 35, 38, 39],
+    [40, 41, 44, 45],
+    [43, 43, 46, 47]])
+STC16mask = np.array(range(16))
+STC16mask = np.array([STC16mask,STC16mask+16,STC16mask+32])
+
+## super trigger cells: the sum of each group of cells goes to its max cell,
+## or is shared equally (sum/4) among the cells with shareQ
+def make_supercells(inQ, shareQ=False, stc16=True):
+    mask = STC16mask if stc16 else STC4mask
+    inFlat = inQ.reshape(len(inQ),-1)
+    outFlat = inFlat.copy()
+    cells = inFlat[:,mask]           # (N, n_sc, n_cells)
+    sums = np.sum(cells, axis=2)     # (N, n_sc)
+    if shareQ:
+        outFlat[:,mask] = (sums/4.)[:,:,None]
+    else:
+        ii = np.argmax(cells, axis=2)
+        outFlat[:,mask] = 0
+        outFlat[np.arange(len(inQ))[:,None], mask[np.arange(len(mask)),ii]] = sums
+    return outFlat.reshape(inQ.shape)
+
+## best choice: keep the n largest charges of each event
+def best_choice(inQ, n):
+    inFlat = inQ.reshape(len(inQ),-1)
+    outFlat = inFlat.copy()
+    ncells = inFlat.shape[1]
+    # as argsort(...)[:-n]: nothing is dropped for n=0 or n>=ncells
+    if n<=0 or n>=ncells or len(inQ)==0: return outFlat.reshape(inQ.shape)
+    drop = np.argpartition(inFlat, ncells-n, axis=1)[:,:ncells-n]
+    np.put_along_axis(outFlat, drop, 0, axis=1)
+    return outFlat.reshape(inQ.shape)
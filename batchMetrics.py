@@ -0,0 +1,65 @@
+import numpy as np
+from emdEngine import hexCoords,HexSigmaX,HexSigmaY
+
+## Batched versions of the per-event metrics of train.py:
+## x and y are (N,48) (or (N,...)) arrays, and the result is an (N,) array.
+## Events with an empty input get -1, events with an empty output -0.5, as in the scalar versions.
+
+def _flat(x):
+    x = np.asarray(x)
+    return x.reshape(len(x),-1).astype(np.float64)
+
+def _sentinels(vals, xsum, ysum):
+    vals[ysum==0] = -0.5
+    vals[xsum==0] = -1.
+    return vals
+
+def _normed(x, xsum):
+    return x/np.where(xsum!=0, xsum, 1.)[:,None]
+
+### cross correlation of input/output
+def cross_corr(x, y):
+    x, y = _flat(x), _flat(y)
+    xsum, ysum = x.sum(axis=1), y.sum(axis=1)
+    # np.cov, with ddof=1
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    n = x.shape[1]-1
+    cov = np.einsum('ij,ij->i', xc, yc)/n
+    stdsqr = np.sqrt(np.einsum('ij,ij->i', xc, xc)/n) * np.sqrt(np.einsum('ij,ij->i', yc, yc)/n)
+    vals = np.divide(cov, stdsqr, out=np.zeros_like(cov), where=(stdsqr!=0))
+    return _sentinels(vals, xsum, ysum)
+
+def ssd(x, y):
+    x, y = _flat(x), _flat(y)
+    xsum, ysum = x.sum(axis=1), y.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vals = np.sum((x-y)**2, axis=1)/(np.sum(x**2, axis=1)*np.sum(y**2, axis=1))**0.5
+    return _sentinels(vals, xsum, ysum)
+
+def d_weighted_mean(x, y):
+    x, y = _flat(x), _flat(y)
+    xsum, ysum = x.sum(axis=1), y.sum(axis=1)
+    d = _normed(x, xsum) - _normed(y, ysum)
+    dx = d.dot(hexCoords[:,0])
+    dy = d.dot(hexCoords[:,1])
+    return _sentinels(np.sqrt(dx*dx+dy*dy), xsum, ysum)
+
+def get_rms(coords, weights):
+    mu_x = weights.dot(coords[:,0])
+    mu_y = weights.dot(coords[:,1])
+    sig2 = np.power((coords[:,0]-mu_x[:,None])/HexSigmaX, 2) \
+         + np.power((coords[:,1]-mu_y[:,None])/HexSigmaY, 2)
+    w2 = np.power(weights,2)
+    return np.sqrt(np.sum(sig2*w2, axis=1))
+
+def d_weighted_rms(a, b):
+    a, b = _flat(a), _flat(b)
+    asum, bsum = a.sum(axis=1), b.sum(axis=1)
+    vals = get_rms(hexCoords, _normed(a, asum)) - get_rms(hexCoords, _normed(b, bsum))
+    return _sentinels(vals, asum, bsum)
+
+def d_abs_weighted_rms(a, b):
+    a, b = _flat(a), _flat(b)
+    asum, bsum = a.sum(axis=1), b.sum(axis=1)
+    return _sentinels(np.abs(d_weighted_rms(a, b)), asum, bsum)
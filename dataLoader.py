@@ -0,0 +1,148 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import poolUtil
+
+## Loading of the 48 TC charge columns from the input CSVs.
+## Parsed files can be cached as .npy files in cacheDir, keyed by
+## path + size + mtime (+ nrows), and are memory-mapped on later runs.
+## Files in a directory can be parsed by a pool of worker processes.
+## With intCharges the raw ADC charges are kept as unsigned integers (uint16 when they fit).
+
+def toUint(data):
+    if len(data)==0: return data.astype(np.uint16)
+    if data.min()<0 or np.any(np.mod(data,1)!=0):
+        raise ValueError("intCharges requires non-negative integer charges in the input")
+    return data.astype(np.uint16 if data.max()<2**16 else np.uint32)
+
+def readCSV(infile, nrows=None, intCharges=False):
+    data = pd.read_csv(infile, dtype=np.float64, header=0, nrows=nrows, usecols=[*range(0, 48)]).values
+    return toUint(data) if intCharges else data
+
+def cacheName(infile, nrows=None, cacheDir='./', intCharges=False):
+    stat = os.stat(infile)
+    key  = "{}:{}:{}:{}:{}".format(os.path.abspath(infile), stat.st_size, stat.st_mtime_ns, nrows, intCharges)
+    return os.path.join(cacheDir, "{}_{}.npy".format(os.path.basename(infile), hashlib.sha1(key.encode()).hexdigest()[:16]))
+
+def loadCSV(infile, nrows=None, cacheDir='', intCharges=False):
+    if not cacheDir:
+        return readCSV(infile, nrows, intCharges)
+    fname = cacheName(infile, nrows, cacheDir, intCharges)
+    if not os.path.exists(fname):
+        print('Caching', infile, 'to', fname)
+        if not os.path.exists(cacheDir): os.makedirs(cacheDir, exist_ok=True)
+        poolUtil.saveArray(fname, readCSV(infile, nrows, intCharges))
+    return np.load(fname, mmap_mode='r')
+
+def listInputs(inputFile):
+    if not os.path.isdir(inputFile): return [inputFile]
+    flist = []
+    for infile in os.listdir(inputFile):
+        infile = os.path.join(inputFile, infile)
+        if os.path.isdir(infile): continue
+        flist.append(infile)
+    return flist
+
+def loadNonzero(job):
+    infile, nrows, cacheDir, intCharges = job
+    data = loadCSV(infile, nrows, cacheDir, intCharges)
+    return data[data.sum(axis=1) != 0] #drop rows where occupancy = 0
+
+def loadData(inputFile, nrowsPerFile=None, cacheDir='', workers=1, intCharges=False):
+    if not os.path.isdir(inputFile):
+        return loadNonzero((inputFile, None, cacheDir, intCharges))
+    jobs = [(infile, nrowsPerFile, cacheDir, intCharges) for infile in listInputs(inputFile)]
+    arrs = poolUtil.poolMap(loadNonzero, jobs, workers)
+    # fill one preallocated array, keeping the file order of the serial loop
+    data = np.empty((sum(len(a) for a in arrs), 48), dtype=np.result_type(*arrs))
+    i = 0
+    for a in arrs:
+        data[i:i+len(a)] = a
+        i += len(a)
+    return data
+
+## chunked reading, for inputs that do not fit in memory
+def iterChunks(inputFile, chunksize=100000, nrowsPerFile=None, cacheDir='', intCharges=False):
+    isdir = os.path.isdir(inputFile)
+    for infile in listInputs(inputFile):
+        nrows = nrowsPerFile if isdir else None
+        if cacheDir:
+            data = loadCSV(infile, nrows, cacheDir, intCharges)
+            chunks = (np.array(data[i:i+chunksize]) for i in range(0, len(data), chunksize))
+        else:
+            chunks = (df.values for df in pd.read_csv(infile, dtype=np.float64, header=0, nrows=nrows,
+                                                      usecols=[*range(0, 48)], chunksize=chunksize))
+            if intCharges: chunks = (toUint(chunk) for chunk in chunks)
+        for chunk in chunks:
+            yield chunk[chunk.sum(axis=1) != 0] #drop rows where occupancy = 0
+
+## split every chunk as train.split does: the first validation_frac events go to validation
+def streamEvents(inputFile, subset='train', validation_frac=0.2, chunksize=100000, nrowsPerFile=None, cacheDir='', intCharges=False):
+    for chunk in iterChunks(inputFile, chunksize, nrowsPerFile, cacheDir, intCharges):
+        N = round(len(chunk)*validation_frac)
+        if subset=='val':     chunk = chunk[:N]
+        elif subset=='train': chunk = chunk[N:]
+        if len(chunk): yield chunk
+
+def loadEvents(inputFile, subset='val', maxEvents=-1, **kwargs):
+    arrs = []
+    nevts = 0
+    for chunk in streamEvents(inputFile, subset, **kwargs):
+        if maxEvents>0 and nevts+len(chunk)>=maxEvents:
+            arrs.append(chunk[:maxEvents-nevts])
+            break
+        arrs.append(chunk)
+        nevts += len(chunk)
+    return np.concatenate(arrs) if arrs else np.zeros((0,48))
+
+## per-event normalization of the charges, computed for all events at once
+## (arrays of shape (N,...), normalized in place like the former per-row loops)
+def _rowShape(data):
+    return (len(data),)+(1,)*(data.ndim-1)
+
+def _sumlog2(sums):
+    with np.errstate(divide='ignore'):
+        return 2**(np.floor(np.log2(sums)))
+
+def normalize(data,rescaleInputToMax=False, sumlog2=True):
+    flat = data.reshape(len(data),-1)
+    maxes = flat.max(axis=1) if len(data) else np.zeros(0)
+    sums  = flat.sum(axis=1)
+    sums_log2 = _sumlog2(sums)
+    if sumlog2:
+        norm = sums_log2
+    elif rescaleInputToMax:
+        norm = maxes
+    else:
+        norm = sums
+    data[...] = 1.*data/np.where(norm!=0, norm, 1.).reshape(_rowShape(data))
+    if sumlog2:
+        return  data,maxes,sums_log2
+    else:
+        return data,maxes,sums
+
+## normalize integer charges into float32 fractions, converting one chunk of events at a time
+## (no float copy of all charges besides the fractions)
+def normalizeInt(data, rescaleInputToMax=False, sumlog2=True, chunksize=100000):
+    normdata = np.empty(data.shape, np.float32)
+    maxes, sums = [], []
+    for i in range(0, len(data), chunksize):
+        chunk,m,s = normalize(data[i:i+chunksize].astype(np.float32), rescaleInputToMax, sumlog2)
+        normdata[i:i+chunksize] = chunk
+        maxes.append(m)
+        sums.append(s)
+    if not maxes: return normdata, np.zeros(0, np.float32), np.zeros(0, np.float32)
+    return normdata, np.concatenate(maxes), np.concatenate(sums)
+
+def unnormalize(norm_data,maxvals,rescaleOutputToMax=False, sumlog2=True):
+    flat = norm_data.reshape(len(norm_data),-1)
+    if rescaleOutputToMax:
+        norm = flat.max(axis=1) if len(norm_data) else np.zeros(0)
+    elif sumlog2:
+        norm = _sumlog2(flat.sum(axis=1))
+    else:
+        norm = flat.sum(axis=1)
+    shape = _rowShape(norm_data)
+    norm_data[...] = norm_data * np.asarray(maxvals).reshape(shape) / np.where(norm!=0, norm, 1.).reshape(shape)
+    return norm_data
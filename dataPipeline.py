@@ -0,0 +1,78 @@
+import numpy as np
+import tensorflow as tf
+
+import dataLoader
+from dataLoader import normalize
+
+## tf.data input pipeline for training on samples larger than memory.
+## The input CSVs are read chunk by chunk; every chunk is cleaned of empty events,
+## normalized and arranged with the model's prepInput before being batched.
+## Raw charges stay in their stored type (e.g. uint16), only float32 fractions are fed to the model.
+## With lazyClone, the shuffled hi occ copies of the model's n_copy setting are made per batch.
+
+def streamDataset(model, inputFile, subset='train', batch_size=500, shuffle_buffer=50000,
+                  rescaleInputToMax=False, validation_frac=0.2, chunksize=100000,
+                  nrowsPerFile=None, cacheDir='', intCharges=False, lazyClone=False, seed=0):
+    shape = tuple(model.pams['shape'])
+    lazyClone = lazyClone and model.pams['n_copy']>0
+
+    def gen():
+        for events in dataLoader.streamEvents(inputFile, subset, validation_frac, chunksize, nrowsPerFile, cacheDir, intCharges):
+            normdata,_,_ = normalize(events.astype(np.float64), rescaleInputToMax=rescaleInputToMax)
+            yield model.prepInput(normdata, clone=not lazyClone).astype(np.float32)
+
+    ds = tf.data.Dataset.from_generator(gen, output_signature=tf.TensorSpec(shape=(None,)+shape, dtype=tf.float32))
+    ds = ds.unbatch()
+    if shuffle_buffer>0:
+        ds = ds.shuffle(shuffle_buffer, seed=seed)
+    ds = ds.batch(batch_size)
+    if lazyClone:
+        ds = cloneBatches(ds, model.pams, seed)
+    ds = ds.map(lambda x: (x, x)) # autoencoder target = input
+    return ds.prefetch(tf.data.experimental.AUTOTUNE)
+
+## the in-memory events of the streamed (and evalOnly) runs and their indices: every event of
+## normdata once, without the n_copy clones, so that they line up with its maxdata/sumdata
+## as the validation events of train.split do
+def evalInput(model, normdata):
+    val_input = model.prepInput(normdata, clone=False)
+    return val_input, np.arange(len(val_input))
+
+## batches from prepared in-memory inputs, reshuffled every epoch
+## (the orders of the epochs are drawn from seed, as the lazy clones)
+def arrayDataset(model, x, batch_size=500, shuffle=True, lazyClone=False, seed=0):
+    shape = tuple(model.pams['shape'])
+    rng = np.random.default_rng(seed)
+
+    def gen():
+        order = rng.permutation(len(x)) if shuffle else np.arange(len(x))
+        for i in range(0, len(x), batch_size):
+            yield x[order[i:i+batch_size]].astype(np.float32)
+
+    ds = tf.data.Dataset.from_generator(gen, output_signature=tf.TensorSpec(shape=(None,)+shape, dtype=tf.float32))
+    if lazyClone and model.pams['n_copy']>0:
+        ds = cloneBatches(ds, model.pams, seed)
+    ds = ds.map(lambda x: (x, x))
+    return ds.prefetch(tf.data.experimental.AUTOTUNE)
+
+## Append n_copy clones of the events with occ_low < occupancy <= occ_hi to every batch,
+## with the cells shuffled as in denseCNN.cloneInput (one random order per copy).
+## The orders are drawn from (seed, batch index), so every epoch sees the same clones.
+def cloneBatches(ds, pams, seed=0):
+    n_copy  = pams['n_copy']
+    occ_low = pams['occ_low']
+    occ_hi  = pams['occ_hi']
+    shape   = tuple(pams['shape'])
+    nCells  = int(np.prod(shape))
+
+    def addClones(ibatch, x):
+        flat = tf.reshape(x, (-1, nCells))
+        occ  = tf.math.count_nonzero(flat, axis=1)
+        occ_q = tf.boolean_mask(flat, tf.logical_and(occ<=occ_hi, occ>occ_low))
+        clones = [x]
+        for i in range(n_copy):
+            order = tf.argsort(tf.random.stateless_uniform([nCells], seed=tf.stack([tf.constant(seed,tf.int64), ibatch*n_copy+i])))
+            clones.append(tf.reshape(tf.gather(occ_q, order, axis=1), (-1,)+shape))
+        return tf.concat(clones, axis=0)
+
+    return ds.enumerate().map(addClones, num_parallel_calls=tf.data.experimental.AUTOTUNE)
@@ -4,7 +4,6 @@ from tensorflow.keras import backend as K
 from tensorflow.keras.utils import plot_model
 import numpy as np
 import json
-from telescope import telescopeMSE2
 
 import tensorflow as tf
 ##Need to use 32 bits for telescopeMSE
@@ -3,7 +3,7 @@ from tensorflow.keras.models import Model
 from tensorflow.keras import backend as K
 import numpy as np
 import json
-from telescope import telescopeMSE2
+from telescope import telescopeMSE2F
 
 import tensorflow as tf
 import inspect
@@ -28,6 +28,68 @@ class MaskLayer(Layer):
         return config
 
 
+def invertArrange(arrange,arrMask=[],calQMask=[]):
+    remap =[]
+    hashmap = {}  ## cell:index mapping
+    ##Valid arrange check
+    if not np.all(np.unique(arrange)==np.arange(48)):
+        raise ValueError("Found cell location with number > 48. Please check your arrange:",arrange)
+    foundDuplicateCharge = False
+    if len(arrMask)==0:
+        if len(arrange)>len(np.unique(arrange)):
+            foundDuplicateCharge=True
+    else:
+        if len(arrange[arrMask==1])>len(np.unique(arrange[arrMask==1])):
+            foundDuplicateCharge=True
+
+    if foundDuplicateCharge and len(calQMask)==0:
+        raise ValueError("Found duplicated charge arrangement, but did not specify calQmask")  
+    if len(calQMask)>0 and np.count_nonzero(calQMask)!=48:
+        raise ValueError("calQmask must indicate 48 calQ ")  
+
+    for i in range(len(arrange)):
+        if len(arrMask)>0 :
+            ## fill hashmap only if arrMask allows it
+            if arrMask[i]==1:   
+                if(foundDuplicateCharge):
+                    ## fill hashmap only if calQMask allows it
+                    if calQMask[i]==1: hashmap[arrange[i]]=i                    
+                else:
+                    hashmap[arrange[i]]=i                    
+        else:
+            hashmap[arrange[i]]=i
+    ## Always map to 48 calQ orders
+    for i in range(len(np.unique(arrange))):
+        remap.append(hashmap[i])
+    return np.array(remap)
+
+## Index arrays for an arrange/arrMask/calQMask layout, validated once and
+## shared by all models with the same layout (see getArrangePlan)
+class ArrangePlan:
+    def __init__(self,arrange,arrMask=[],calQMask=[]):
+        self.arrange = np.array(arrange)
+        self.masked  = np.where(np.array(arrMask)==0)[0] if len(arrMask)>0 else np.array([],dtype=int)
+        self.remap   = invertArrange(self.arrange,np.array(arrMask),np.array(calQMask))
+
+    ## (N,48) calQ order -> (N,len(arrange)) model order, masked cells set to 0
+    def forward(self,x):
+        out = np.take(x,self.arrange,axis=1)
+        if len(self.masked)>0:
+            out[:,self.masked]=0  #zeros out repeated entries
+        return out
+
+    ## (N,...) model order -> (N,48) calQ order
+    def inverse(self,x):
+        return np.take(x.reshape(len(x),-1),self.remap,axis=1)
+
+_arrangePlans = {}
+def getArrangePlan(arrange,arrMask=[],calQMask=[]):
+    key = tuple(tuple(int(i) for i in a) for a in (arrange,arrMask,calQMask))
+    if not key in _arrangePlans:
+        _arrangePlans[key] = ArrangePlan(arrange,arrMask,calQMask)
+    return _arrangePlans[key]
+
+
 class denseCNN:
     def __init__(self,name='',weights_f=''):
         self.name=name
@@ -69,27 +131,28 @@ class denseCNN:
         occ_q     = input_q[selection]
         occ_q_flat= occ_q.reshape(len(occ_q),48)
         self.pams['cloned_fraction'] = len(occ_q)/len(input_q)
+        clones = [input_q]
         for i in range(0,n_copy):
             clone   = self.shuffle(occ_q_flat)
             clone   = clone.reshape(len(clone),shape[0],shape[1],shape[2])
-            input_q = np.concatenate([input_q,clone])
-        return input_q
+            clones.append(clone)
+        return np.concatenate(clones)
             
-    def prepInput(self,normData):
+    ## clone=False leaves the hi occ copies to the input pipeline (dataPipeline.cloneBatches)
+    def prepInput(self,normData,clone=True):
       shape = self.pams['shape']
       
       if len(self.pams['arrange'])>0:
-          arrange = self.pams['arrange']
-          inputdata = normData[:,arrange]
+          inputdata = self.arrangePlan().forward(normData)
       else:
           inputdata = normData
-      if len(self.pams['arrMask'])>0:
-          arrMask = self.pams['arrMask']
-          inputdata[:,arrMask==0]=0  #zeros out repeated entries
+          if len(self.pams['arrMask'])>0:
+              arrMask = self.pams['arrMask']
+              inputdata[:,arrMask==0]=0  #zeros out repeated entries
       
       shaped_data = inputdata.reshape(len(inputdata),shape[0],shape[1],shape[2])
 
-      if self.pams['n_copy']>0:
+      if clone and self.pams['n_copy']>0:
         n_copy  = self.pams['n_copy']
         occ_low = self.pams['occ_low']
         occ_hi = self.pams['occ_hi']
@@ -223,8 +286,8 @@ class denseCNN:
             self.autoencoder.compile(loss=self.weightedMSE, optimizer=opt)
             self.encoder.compile(loss=self.weightedMSE, optimizer=opt)
         elif self.pams['loss'] == 'telescopeMSE':
-            self.autoencoder.compile(loss=telescopeMSE2, optimizer=opt)
-            self.encoder.compile(loss=telescopeMSE2, optimizer=opt)
+            self.autoencoder.compile(loss=telescopeMSE2F, optimizer=opt)
+            self.encoder.compile(loss=telescopeMSE2F, optimizer=opt)
         elif self.pams['loss']!='':
             self.autoencoder.compile(loss=self.pams['loss'], optimizer=opt)
             self.encoder.compile(loss=self.pams['loss'], optimizer=opt)
@@ -238,59 +301,34 @@ class denseCNN:
        return self.autoencoder,self.encoder
 
     def invertArrange(self,arrange,arrMask=[],calQMask=[]):
-        remap =[]
-        hashmap = {}  ## cell:index mapping
-        ##Valid arrange check
-        if not np.all(np.unique(arrange)==np.arange(48)):
-            raise ValueError("Found cell location with number > 48. Please check your arrange:",arrange)
-        foundDuplicateCharge = False
-        if len(arrMask)==0:
-            if len(arrange)>len(np.unique(arrange)):
-                foundDuplicateCharge=True
-        else:
-            if len(arrange[arrMask==1])>len(np.unique(arrange[arrMask==1])):
-                foundDuplicateCharge=True
-    
-        if foundDuplicateCharge and len(calQMask)==0:
-            raise ValueError("Found duplicated charge arrangement, but did not specify calQmask")  
-        if len(calQMask)>0 and np.count_nonzero(calQMask)!=48:
-            raise ValueError("calQmask must indicate 48 calQ ")  
-            
-        for i in range(len(arrange)):
-            if len(arrMask)>0 :
-                ## fill hashmap only if arrMask allows it
-                if arrMask[i]==1:   
-                    if(foundDuplicateCharge):
-                        ## fill hashmap only if calQMask allows it
-                        if calQMask[i]==1: hashmap[arrange[i]]=i                    
-                    else:
-                        hashmap[arrange[i]]=i                    
-            else:
-                hashmap[arrange[i]]=i
-        ## Always map to 48 calQ orders
-        for i in range(len(np.unique(arrange))):
-            remap.append(hashmap[i])
-        return np.array(remap)
+        return invertArrange(arrange,arrMask,calQMask)
 
     ## remap input/output of autoencoder into CALQs orders
     def mapToCalQ(self,x):
         if len(self.pams['arrange']) > 0:
-            arrange = self.pams['arrange']
-            remap   = self.invertArrange(arrange,self.pams['arrMask'],self.pams['calQMask'])
-            if len(self.pams['arrMask'])>0:
-                imgSize =self.pams['shape'][0] *self.pams['shape'][1]* self.pams['shape'][2]
-                x = x.reshape(len(x),imgSize)
-                x[:,self.pams['arrMask']==0]=0 ## apply arrMask
-                return x[:,remap]             ## map to calQ 
-            else:
-                return x.reshape(len(x),48)[:,remap]
+            plan = self.arrangePlan()
+            if len(plan.masked)>0:
+                x.reshape(len(x),-1)[:,plan.masked]=0 ## apply arrMask (also to x, as before)
+            return plan.inverse(x)                     ## map to calQ
         else:
             return x.reshape(len(x),48)
 
+    def arrangePlan(self):
+        return getArrangePlan(self.pams['arrange'],self.pams['arrMask'],self.pams['calQMask'])
+
            
-    def predict(self,x):
-        decoded_Q = self.autoencoder.predict(x)
-        encoded_Q = self.encoder.predict(x)
+    ## one model returning (decoded, encoded), sharing the encoder/decoder layers;
+    ## built once per encoder/decoder, so that predict() is not traced again on every call
+    def get_inference_model(self):
+        cached = getattr(self, '_inference', None)
+        if cached is None or cached[0] is not self.encoder or cached[1] is not self.decoder:
+            encoded = self.encoder.outputs[0]
+            model = Model(self.encoder.inputs, [self.decoder(encoded), encoded], name='inference')
+            self._inference = (self.encoder, self.decoder, model)
+        return self._inference[2]
+
+    def predict(self,x,batch_size=None):
+        decoded_Q, encoded_Q = self.get_inference_model().predict(x, batch_size=batch_size)
         encoded_Q = np.reshape(encoded_Q, (len(encoded_Q), self.pams['encoded_dim'], 1))
         #s = self.pams['shape'] 
         #if self.pams['channels_first']:
@@ -0,0 +1,164 @@
+import numpy as np
+import ot
+import scipy.stats
+import poolUtil
+from supercells import Remap_48_12,Remap_12_3
+
+## Earth mover's distance between 48-TC charge maps, on the fixed hexagonal geometry.
+## emd() solves one event; emd_batch() solves a whole (N,48) set, reusing the
+## cost matrix and splitting the events across a pool of worker processes.
+## emd_sparse() solves the same problem restricted to the cells with charge.
+## emd_tree() is a linear-time approximation on the supercell hierarchy of supercells.py.
+
+# calculate "earth mover's distance"
+# (cost, in distance, to move earth from one config to another)
+hexCoords = np.array([
+    [0.0, 0.0], [0.0, -2.4168015], [0.0, -4.833603], [0.0, -7.2504044],
+    [2.09301, -1.2083969], [2.09301, -3.6251984], [2.09301, -6.042], [2.09301, -8.458794],
+    [4.18602, -2.4168015], [4.18602, -4.833603], [4.18602, -7.2504044], [4.18602, -9.667198],
+    [6.27903, -3.6251984], [6.27903, -6.042], [6.27903, -8.458794], [6.27903, -10.875603],
+    [-8.37204, -10.271393], [-6.27903, -9.063004], [-4.18602, -7.854599], [-2.0930138, -6.6461945],
+    [-8.37204, -7.854599], [-6.27903, -6.6461945], [-4.18602, -5.4377975], [-2.0930138, -4.229393],
+    [-8.37204, -5.4377975], [-6.27903, -4.229393], [-4.18602, -3.020996], [-2.0930138, -1.8125992],
+    [-8.37204, -3.020996], [-6.27903, -1.8125992], [-4.18602, -0.6042023], [-2.0930138, 0.6042023],
+    [4.7092705, -12.386101], [2.6162605, -11.177696], [0.5232506, -9.969299], [-1.5697594, -8.760895],
+    [2.6162605, -13.594498], [0.5232506, -12.386101], [-1.5697594, -11.177696], [-3.6627693, -9.969299],
+    [0.5232506, -14.802895], [-1.5697594, -13.594498], [-3.6627693, -12.386101], [-5.7557793, -11.177696],
+    [-1.5697594, -16.0113], [-3.6627693, -14.802895], [-5.7557793, -13.594498], [-7.848793, -12.386101]])
+
+#normalize so that distance between small cells (there are 4 per TC) is 1
+oneHexCell = 0.5 * 2.4168015
+#oneHexCell = 0.5 * np.min(ot.dist(hexCoords[:16],hexCoords[:16],'euclidean'))
+hexCoords = hexCoords / oneHexCell
+# for later normalization
+HexSigmaX = np.std(hexCoords[:,0])
+HexSigmaY = np.std(hexCoords[:,1])
+# pairwise distances
+hexMetric = ot.dist(hexCoords, hexCoords, 'euclidean')
+MAXDIST = np.max(hexMetric)
+def emd(_x, _y, threshold=-1):
+    if (np.sum(_x)==0): return -1.
+    if (np.sum(_y)==0): return -0.5
+    x = np.array(_x, dtype=np.float64)
+    y = np.array(_y, dtype=np.float64)
+    x = (1./x.sum() if x.sum() else 1.)*x.flatten()
+    y = (1./y.sum() if y.sum() else 1.)*y.flatten()
+
+    if threshold > 0:
+        # only keep entries above 2%, e.g.
+        x = np.where(x>threshold,x,0)
+        y = np.where(y>threshold,y,0)
+        x = 1.*x/x.sum()
+        y = 1.*y/y.sum()
+
+    return ot.emd2(x, y, hexMetric)
+
+## same as emd, on the non-zero support of x and y only:
+## empty cells carry no flow, so the transport problem reduces to the sub-matrix
+## of hexMetric, and to a weighted sum of distances if either side has a single cell
+def emd_sparse(_x, _y, threshold=-1):
+    if (np.sum(_x)==0): return -1.
+    if (np.sum(_y)==0): return -0.5
+    x = np.array(_x, dtype=np.float64)
+    y = np.array(_y, dtype=np.float64)
+    x = (1./x.sum() if x.sum() else 1.)*x.flatten()
+    y = (1./y.sum() if y.sum() else 1.)*y.flatten()
+
+    if threshold > 0:
+        x = np.where(x>threshold,x,0)
+        y = np.where(y>threshold,y,0)
+        x = 1.*x/x.sum()
+        y = 1.*y/y.sum()
+
+    ix = np.flatnonzero(x)
+    iy = np.flatnonzero(y)
+    if len(ix)==1: return hexMetric[ix[0],iy].dot(y[iy])
+    if len(iy)==1: return hexMetric[ix,iy[0]].dot(x[ix])
+    return ot.emd2(x[ix], y[iy], hexMetric[np.ix_(ix,iy)])
+
+## batched version
+def _emdChunk(job):
+    x, y, threshold, sparse = job
+    f = emd_sparse if sparse else emd
+    out = np.empty(len(x))
+    for i in range(len(x)):
+        out[i] = f(x[i], y[i], threshold)
+    return out
+
+def emd_batch(x, y, threshold=-1, workers=1, chunksize=2000, sparse=False):
+    x = np.asarray(x).reshape(len(x),-1)
+    y = np.asarray(y).reshape(len(y),-1)
+    if len(x)!=len(y):
+        raise ValueError("emd_batch: got %i inputs and %i outputs"%(len(x),len(y)))
+    vals = np.empty(len(x))
+    # sentinels for empty events, as in emd()
+    xempty = x.sum(axis=1)==0
+    yempty = y.sum(axis=1)==0
+    vals[yempty] = -0.5
+    vals[xempty] = -1.
+    idx = np.flatnonzero(~(xempty | yempty))
+    if len(idx)==0: return vals
+
+    workers = poolUtil.nWorkers(workers)
+    nchunks = max(1, -(-len(idx)//chunksize))
+    if workers > 1: nchunks = max(nchunks, min(workers, len(idx)))
+    jobs = [(x[i], y[i], threshold, sparse) for i in np.array_split(idx, nchunks)]
+    vals[idx] = np.concatenate(poolUtil.poolMap(_emdChunk, jobs, workers))
+    return vals
+
+## tree-Wasserstein approximation:
+## TC -> 2x2 supercell (Remap_48_12) -> 4x4 supercell (Remap_12_3) -> wafer.
+## Each edge has the length between the centers of the child and parent cells,
+## and the distance is the sum over edges of length * |mass difference below the edge|.
+## Tree paths are never shorter than the straight line, so emd_tree >= emd.
+Remap_48_3 = Remap_48_12.dot(Remap_12_3)
+center_12 = Remap_48_12.T.dot(hexCoords) / Remap_48_12.sum(axis=0)[:,None]
+center_3  = Remap_48_3.T.dot(hexCoords) / Remap_48_3.sum(axis=0)[:,None]
+center_1  = hexCoords.mean(axis=0)
+treeWeights_48 = np.linalg.norm(hexCoords - Remap_48_12.dot(center_12), axis=1)
+treeWeights_12 = np.linalg.norm(center_12 - Remap_12_3.dot(center_3), axis=1)
+treeWeights_3  = np.linalg.norm(center_3 - center_1, axis=1)
+
+def emd_tree(x, y):
+    x = np.asarray(x, dtype=np.float64).reshape(len(x),-1)
+    y = np.asarray(y, dtype=np.float64).reshape(len(y),-1)
+    xsum = x.sum(axis=1)
+    ysum = y.sum(axis=1)
+    d = x/np.where(xsum!=0, xsum, 1.)[:,None] - y/np.where(ysum!=0, ysum, 1.)[:,None]
+    vals = (np.abs(d).dot(treeWeights_48)
+            + np.abs(d.dot(Remap_48_12)).dot(treeWeights_12)
+            + np.abs(d.dot(Remap_48_3)).dot(treeWeights_3))
+    # sentinels for empty events, as in emd()
+    vals[ysum==0] = -0.5
+    vals[xsum==0] = -1.
+    return vals
+
+## compare emd_tree with the exact emd on (a subset of) the events
+def treeCalibration(x, y, nmax=10000, workers=1):
+    x = np.asarray(x).reshape(len(x),-1)[:nmax]
+    y = np.asarray(y).reshape(len(y),-1)[:nmax]
+    tree  = emd_tree(x, y)
+    exact = emd_batch(x, y, workers=workers)
+    sel = exact>=0
+    tree, exact = tree[sel], exact[sel]
+    if len(exact)<2: return {'n':int(len(exact))}
+    ratio = tree[exact>0]/exact[exact>0]
+    slope, intercept = np.polyfit(tree, exact, 1)
+    return {
+        'n'        : int(len(exact)),
+        'pearson'  : float(scipy.stats.pearsonr(tree, exact)[0]),
+        'spearman' : float(scipy.stats.spearmanr(tree, exact)[0]),
+        'ratio_mean'  : float(np.mean(ratio)),
+        'ratio_std'   : float(np.std(ratio)),
+        'ratio_min'   : float(np.min(ratio)),
+        'slope'    : float(slope),
+        'intercept': float(intercept),
+        'mean_tree' : float(np.mean(tree)),
+        'mean_exact': float(np.mean(exact)),
+        'rms_resid' : float(np.std(exact - (slope*tree+intercept))),
+    }
+
+def printCalibration(calib):
+    print('tree EMD calibration on %i events'%calib['n'])
+    for k,v in calib.items():
+        if k!='n': print('  %-10s %.4f'%(k,v))
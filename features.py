@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+## Per-event features of a set of charges, computed once for all events
+## and read by the plots, profiles, slices and reweighting instead of rescanning the charges.
+##   Q      : (N,48) (or (N,...)) charges
+##   maxQ   : per-event max charge, sumQ: per-event (sum) normalization, in the same units as the profiles
+##   mip    : charge above which a cell counts for occupancy_1MT, in units of Q
+
+def featureTable(Q, maxQ, sumQ, mip=1.):
+    Q = np.asarray(Q).reshape(len(Q),-1)
+    maxQ = np.asarray(maxQ).reshape(-1)
+    sumQ = np.asarray(sumQ).reshape(-1)
+    with np.errstate(divide='ignore'):
+        return pd.DataFrame({
+            'occupancy'    : np.count_nonzero(Q,axis=1),
+            'occupancy_1MT': np.count_nonzero(Q>mip,axis=1),
+            'maxQ'         : maxQ,
+            'sumQ'         : sumQ,
+            'log10_maxQ'   : np.log10(maxQ),
+            'log10_sumQ'   : np.log10(sumQ),
+        })
+
+## scale each event of arr (N,...) by the per-event values (N,)
+def perEvent(arr, values):
+    values = np.asarray(values)
+    return arr * values.reshape((len(values),)+(1,)*(arr.ndim-1))
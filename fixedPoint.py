@@ -0,0 +1,207 @@
+import numpy as np
+import json
+import pickle
+import optparse
+
+## Integer (NumPy only) inference of the qDenseCNN encoders, bit-exact with qkeras
+## (checked against the saved outputs of qkeras models, tests/qkeras_vectors.pkl):
+##   input_qa -> [QConv2D relu (-> MaxPooling2D)]... -> accum1_qa -> Flatten
+##   -> [QDense relu]... -> QDense encoded_vector -> encod_qa
+## The layout and the quantizers come from the <name>_pams.json of the model, the
+## weights from the encoder_<name>.pkl of model_save_quantized_weights.
+## Values are integers in units of 2**exponent, with the exponents of each layer fixed
+## when the model is loaded; sums and products are exact, and only the QActivations round.
+## The convolutions of the small input images are unrolled into matrices, so each layer
+## is one matmul over the batch (in float64 when the integers stay below 2**53).
+
+## quantized_bits(bits, integer, keep_negative, alpha=1) of qkeras:
+## x -> 2**integer * clip(round(x * m / 2**integer), -keep_negative*m, m-1) / m,  m = 2**(bits-keep_negative)
+class QuantizedBits:
+    def __init__(self, total, integer, keep_negative=1):
+        self.bits = total
+        self.integer = integer
+        self.keep_negative = keep_negative
+        m = 2**(total-keep_negative)
+        self.exponent = integer - (total-keep_negative)  # lsb = 2**exponent
+        self.min = -keep_negative*m
+        self.max = m-1
+
+    @classmethod
+    def fromPams(cls, nBits):
+        return cls(nBits['total'], nBits['integer'], nBits['keep_negative'])
+
+    ## float input (as the float32 tensors of TF), rounded half to even as tf.round
+    def fromFloat(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        q = np.round(np.ldexp(x, -self.exponent))
+        return np.clip(q, self.min, self.max).astype(np.int64), self.exponent
+
+    ## weights saved by model_save_quantized_weights, which are on the grid already
+    def fromWeights(self, w):
+        scaled = np.ldexp(np.asarray(w, dtype=np.float64), -self.exponent)
+        q = np.round(scaled)
+        if not np.array_equal(q, scaled):
+            raise ValueError("weights are not quantized with %s"%self)
+        return q.astype(np.int64), self.exponent
+
+    def __str__(self):
+        return "quantized_bits(%i,%i,%i)"%(self.bits, self.integer, self.keep_negative)
+
+## ints / 2**shift, rounded half to even
+def _roundShift(ints, shift):
+    q = ints >> shift
+    rem = ints - (q << shift)
+    half = 1 << (shift-1)
+    return q + ((rem > half) | ((rem == half) & ((q & 1) == 1)))
+
+## requantize integer-valued arrays from 2**exponent to 2**q.exponent units;
+## float64 arrays hold the integers exactly (see FixedPointEncoder), int64 arrays are shifted
+def _requantize(x, exponent, q):
+    shift = q.exponent - exponent
+    if x.dtype == np.int64:
+        x = x << -shift if shift <= 0 else _roundShift(x, shift)
+    else:
+        x = np.round(np.ldexp(x, -shift))
+    return np.clip(x, q.min, q.max)
+
+## 'same' padding of Keras: the extra pixel goes after
+def _samePad(x, kh, kw, value=0):
+    ph, pw = kh-1, kw-1
+    return np.pad(x, ((0,0),(ph//2,ph-ph//2),(pw//2,pw-pw//2),(0,0)), constant_values=value)
+
+## stride 1, 'same' padding, channels_last
+def conv2d(x, kernel):
+    kh, kw, cin, cout = kernel.shape
+    n, h, w, _ = x.shape
+    windows = np.lib.stride_tricks.sliding_window_view(_samePad(x, kh, kw), (kh,kw), axis=(1,2))
+    # (n,h,w,cin,kh,kw) -> (n*h*w, kh*kw*cin), in the order of the kernel
+    cols = windows.transpose(0,1,2,4,5,3).reshape(n*h*w, kh*kw*cin)
+    return (cols @ kernel.reshape(kh*kw*cin, cout)).reshape(n, h, w, cout)
+
+## the convolution of an (h,w,cin) image as a (h*w*cin, h*w*cout) matrix,
+## so that the small wafer images go through one matmul per layer
+def convMatrix(kernel, h, w):
+    cin = kernel.shape[2]
+    basis = np.eye(h*w*cin, dtype=kernel.dtype).reshape(h*w*cin, h, w, cin)
+    return conv2d(basis, kernel).reshape(h*w*cin, -1)
+
+def maxPool(x, size=(2,2)):
+    n, h, w, c = x.shape
+    ph, pw = -h % size[0], -w % size[1]
+    lowest = np.iinfo(np.int64).min if x.dtype==np.int64 else -np.inf
+    x = np.pad(x, ((0,0),(0,ph),(0,pw),(0,0)), constant_values=lowest)
+    return x.reshape(n, (h+ph)//size[0], size[0], (w+pw)//size[1], size[1], c).max(axis=(2,4))
+
+def activation(x, name):
+    if name == 'relu':
+        return np.maximum(x, 0)
+    if name in ('linear', None):
+        return x
+    raise ValueError("no integer implementation of the activation '%s'"%name)
+
+class FixedPointEncoder:
+    maxExact = 2**53
+
+    def __init__(self, pams, qweights):
+        self.pams = pams
+        nBits_weight = pams['nBits_weight']
+        self.input_q = QuantizedBits.fromPams(pams['nBits_input'])
+        self.accum_q = QuantizedBits.fromPams(pams['nBits_accum'])
+        self.encod_q = QuantizedBits.fromPams(pams['nBits_encod'])
+        conv_q  = QuantizedBits.fromPams(pams.get('nBits_conv',  nBits_weight))
+        dense_q = QuantizedBits.fromPams(pams.get('nBits_dense', nBits_weight))
+        activation(0, pams.get('activation','relu')) # fail early on unsupported activations
+
+        # the exponents of all the values are known in advance: the weights and biases
+        # are aligned here, and the largest possible |int| of each layer is tracked
+        if pams.get('channels_first', False):
+            c, h, w = pams['shape']
+        else:
+            h, w, c = pams['shape']
+        e = self.input_q.exponent
+        bound = max(-self.input_q.min, self.input_q.max)
+        self.convs = []
+        for i in range(len(pams['CNN_layer_nodes'])):
+            k, b = qweights["conv2d_%i_m"%i]['weights']
+            (k, ek), (b, eb) = conv_q.fromWeights(k), conv_q.fromWeights(b)
+            mat = convMatrix(k, h, w)
+            mat, bias, e = self._align(mat, e+ek, np.tile(b, h*w), eb)
+            bound = bound*np.abs(mat).sum(axis=0).max() + np.abs(bias).max()
+            c = k.shape[3]
+            self.convs.append((mat, bias, (h, w, c), pams['CNN_pool'][i]))
+            if pams['CNN_pool'][i]: h, w = (h+1)//2, (w+1)//2
+        self.accum_e = e
+        convBound = bound
+        e = self.accum_q.exponent
+        bound = max(-self.accum_q.min, self.accum_q.max)
+        self.denses = []
+        names = ["en_dense_%i"%i for i in range(len(pams['Dense_layer_nodes']))] + ['encoded_vector']
+        for name in names:
+            k, b = qweights[name]['weights']
+            (k, ek), (b, eb) = dense_q.fromWeights(k), dense_q.fromWeights(b)
+            k, b, e = self._align(k, e+ek, b, eb)
+            bound = max(bound, bound*np.abs(k).sum(axis=0).max() + np.abs(b).max())
+            act = 'relu' if name!='encoded_vector' else pams.get('activation','relu')
+            self.denses.append((k, b, act))
+        self.encod_e = e
+        # float64 (BLAS) when all sums are exact in the 53 bit mantissa, int64 otherwise
+        self.dtype = np.float64 if max(convBound, bound) < self.maxExact else np.int64
+        self.convs = [(mat.astype(self.dtype), bias.astype(self.dtype), shape, pool) for mat, bias, shape, pool in self.convs]
+        self.denses = [(k.astype(self.dtype), b.astype(self.dtype), act) for k, b, act in self.denses]
+
+    @staticmethod
+    def _align(k, ek, b, eb):
+        e = min(ek, eb)
+        return k << (ek-e), b << (eb-e), e
+
+    @classmethod
+    def load(cls, name, odir='.'):
+        with open('%s/%s_pams.json'%(odir,name)) as f:
+            pams = json.load(f)
+        with open('%s/encoder_%s.pkl'%(odir,name), 'rb') as f:
+            qweights = pickle.load(f)
+        return cls(pams, qweights)
+
+    ## integer encoded vectors of one batch, in units of 2**encod_q.exponent
+    def _encodeInt(self, x):
+        channels_first = self.pams.get('channels_first', False)
+        if channels_first:
+            x = x.transpose(0,2,3,1)
+        x = self.input_q.fromFloat(x)[0].astype(self.dtype).reshape(len(x), -1)
+        for mat, bias, shape, pool in self.convs:
+            x = activation(x @ mat + bias, 'relu')
+            if pool: x = maxPool(x.reshape((len(x),)+shape)).reshape(len(x), -1)
+        x = _requantize(x, self.accum_e, self.accum_q)
+        if channels_first:
+            h, w, c = self.convs[-1][2]
+            if self.convs[-1][3]: h, w = (h+1)//2, (w+1)//2
+            x = x.reshape(len(x), h, w, c).transpose(0,3,1,2).reshape(len(x), -1)
+        for k, b, act in self.denses:
+            x = activation(x @ k + b, act)
+        return _requantize(x, self.encod_e, self.encod_q).astype(np.int64)
+
+    ## encoded vectors of the (N,)+shape inputs, as the float outputs of the encoder
+    ## or (asInt) as the integers of the encod_qa quantizer
+    def encode(self, x, asInt=False, batch_size=10000):
+        x = np.asarray(x).reshape((-1,)+tuple(self.pams['shape']))
+        out = np.concatenate([self._encodeInt(x[i:i+batch_size]) for i in range(0, len(x), batch_size)]) \
+              if len(x) else np.zeros((0,self.pams['encoded_dim']), dtype=np.int64)
+        if asInt: return out
+        return np.ldexp(out, self.encod_q.exponent).astype(np.float32)
+
+## e.g. python fixedPoint.py --odir CNN/model --name model -i verify_input_ae.csv -o encoded_int.csv --asInt
+if __name__== "__main__":
+    parser = optparse.OptionParser()
+    parser.add_option("--odir", type="string", default = '.', dest="odir", help="directory of the model files")
+    parser.add_option("--name", type="string", default = '', dest="name", help="model name (<name>_pams.json, encoder_<name>.pkl)")
+    parser.add_option('-i',"--inputFile", type="string", default = '', dest="inputFile", help="csv (or .npy) of the AE inputs, one event per row")
+    parser.add_option('-o',"--outputFile", type="string", default = 'encoded.csv', dest="outputFile", help="csv of the encoded vectors")
+    parser.add_option("--asInt", action='store_true', default = False, dest="asInt", help="write the integer codes of the encoded vector")
+    (options, args) = parser.parse_args()
+    encoder = FixedPointEncoder.load(options.name, options.odir)
+    if options.inputFile.endswith('.npy'):
+        x = np.load(options.inputFile)
+    else:
+        x = np.loadtxt(options.inputFile, delimiter=',', dtype=np.float32, ndmin=2)
+    out = encoder.encode(x, asInt=options.asInt)
+    np.savetxt(options.outputFile, out, delimiter=',', fmt='%d' if options.asInt else '%.12f')
@@ -1,6 +1,9 @@
 import tensorflow as tf
 import os
 import numpy as np
+import re
+import json
+import hashlib
 from tensorflow.keras.models import model_from_json
 from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
 from denseCNN import MaskLayer
@@ -13,7 +16,7 @@ def get_flops_from_pb_v2(model_json):
         model.summary()
         print(model)
         inputs = [
-            tf.TensorSpec([1] + inp.shape[1:], inp.dtype) for inp in model.inputs
+            tf.TensorSpec([1] + list(inp.shape[1:]), inp.dtype) for inp in model.inputs
         ]
         full_model = tf.function(model).get_concrete_function(inputs)
         frozen_func = convert_variables_to_constants_v2(full_model)
@@ -31,7 +34,7 @@ def get_flops_from_pb_v2(model_json):
  
 def get_flops_from_model(model):
         inputs = [
-            tf.TensorSpec([1] + inp.shape[1:], inp.dtype) for inp in model.inputs
+            tf.TensorSpec([1] + list(inp.shape[1:]), inp.dtype) for inp in model.inputs
         ]
         full_model = tf.function(model).get_concrete_function(inputs)
         frozen_func = convert_variables_to_constants_v2(full_model)
@@ -47,6 +50,101 @@ def get_flops_from_model(model):
         )
         return flops.total_float_ops
 
+## Analytic counts from the layer configs, without freezing/profiling the graph.
+## FLOPs follow the TF profiler: 2 per multiply-accumulate, plus 1 per bias add
+## (Conv2DTranspose is counted as its Conv2DBackpropInput op).
+## Weight bits use the bits of the qkeras kernel/bias quantizers, 32 for float weights.
+
+CONV_LAYERS  = ['Conv2D','QConv2D']
+DECONV_LAYERS= ['Conv2DTranspose','QConv2DTranspose']
+DENSE_LAYERS = ['Dense','QDense']
+POOL_LAYERS  = ['MaxPooling2D','AveragePooling2D','MaxPool2D','AvgPool2D']
+# no arithmetic (MaskLayer is a gather)
+FREE_LAYERS  = ['InputLayer','MaskLayer','Flatten','Reshape','Activation','QActivation',
+                'UpSampling2D','Dropout','ZeroPadding2D','Cropping2D','Concatenate']
+
+_cache = {}
+
+def _quantizerBits(q):
+    if q is None: return 32
+    if isinstance(q, dict):
+        cfg = q.get('config', q)
+        return int(cfg['bits']) if 'bits' in cfg else 32
+    if isinstance(q, str):
+        m = re.search(r'quantized_bits\((?:bits=)?(\d+)', q)
+        return int(m.group(1)) if m else 32
+    return int(getattr(q, 'bits', 32))
+
+def _channelAxis(config):
+    return 1 if config.get('data_format','channels_last')=='channels_first' else -1
+
+def _spatial(shape, config):
+    shape = list(shape[1:])
+    del shape[_channelAxis(config)]
+    return int(np.prod(shape))
+
+def layer_counts(layer):
+    name = type(layer).__name__
+    config = layer.get_config()
+    counts = {'name':layer.name, 'class':name, 'macs':0, 'flops':0,
+              'params':layer.count_params(), 'weight_bits':0}
+    nout = int(np.prod(layer.output.shape[1:])) if name!='InputLayer' else 0
+    if name in CONV_LAYERS:
+        kh, kw = config['kernel_size']
+        cin = layer.input.shape[_channelAxis(config)]
+        counts['macs'] = nout*kh*kw*cin//config.get('groups',1)
+    elif name in DECONV_LAYERS:
+        kh, kw = config['kernel_size']
+        counts['macs'] = int(np.prod(layer.input.shape[1:]))*kh*kw*config['filters']
+    elif name in DENSE_LAYERS:
+        counts['macs'] = int(np.prod(layer.input.shape[1:]))*config['units']
+    elif name in POOL_LAYERS:
+        ph, pw = config['pool_size']
+        counts['flops'] = nout*ph*pw
+    elif name not in FREE_LAYERS and counts['params']>0:
+        print('get_flops: no FLOP count for layer %s (%s)'%(layer.name,name))
+    counts['flops'] += 2*counts['macs']
+    if config.get('use_bias',False): counts['flops'] += nout
+
+    # weight bits, per weight tensor
+    for w in layer.weights:
+        n = int(np.prod(w.shape))
+        if 'kernel' in w.name:   bits = _quantizerBits(config.get('kernel_quantizer'))
+        elif 'bias' in w.name:   bits = _quantizerBits(config.get('bias_quantizer'))
+        else:                    bits = 32
+        counts['weight_bits'] += n*bits
+    return counts
+
+def _layers(model):
+    for layer in model.layers:
+        if hasattr(layer, 'layers'): # nested models (encoder/decoder of the autoencoder)
+            yield from _layers(layer)
+        else:
+            yield layer
+
+## hash of the layer types, configs and shapes, independent of the layer names
+def architecture_hash(model):
+    arch = []
+    for layer in _layers(model):
+        config = {k:v for k,v in layer.get_config().items() if k!='name'}
+        shape = layer.output.shape if type(layer).__name__=='InputLayer' else layer.input.shape
+        arch.append((type(layer).__name__, config, str(shape)))
+    return hashlib.sha1(json.dumps(arch, sort_keys=True, default=str).encode()).hexdigest()
+
+## MACs, FLOPs, parameter and weight-bit counts of a model, with the per-layer counts
+def count_ops(model):
+    key = architecture_hash(model)
+    if key not in _cache:
+        layers = [layer_counts(layer) for layer in _layers(model)]
+        _cache[key] = {k:sum(l[k] for l in layers) for k in ['macs','flops','params','weight_bits']}
+        _cache[key]['layers'] = layers
+    return _cache[key]
+
+def count_ops_from_json(model_json):
+    with open(model_json,'r') as fjson:
+        model = model_from_json(fjson.read(),custom_objects={'MaskLayer':MaskLayer})
+    return count_ops(model)
+
 if __name__=='__main__':
 
     flist = [
@@ -105,8 +203,9 @@ if __name__=='__main__':
     results = {}
     for f in flist:
         results[f.split('/')[-1]]={}
-        flops, pams = get_flops_from_pb_v2(f)
-        results[f.split('/')[-1]]['flops']= flops
-        results[f.split('/')[-1]]['pams']= pams
+        counts = count_ops_from_json(f)
+        results[f.split('/')[-1]]['flops']= counts['flops']
+        results[f.split('/')[-1]]['pams']= counts['params']
+        results[f.split('/')[-1]]['weight_bits']= counts['weight_bits']
     for k in results:
-        print(k,results[k]['flops'],results[k]['pams'])
+        print(k,results[k]['flops'],results[k]['pams'],results[k]['weight_bits'])
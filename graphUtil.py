@@ -110,6 +110,112 @@ def layerOutput(model,layer_index,x):
     )
     return m.predict(x)
 
+## Histogram with power-of-2 bin widths, aligned on multiples of the width.
+## The range follows the data: when it would need more than nbins bins,
+## the width doubles and pairs of bins are merged, so memory stays bounded.
+class AutoHistogram:
+    def __init__(self, nbins=50):
+        self.nbins = nbins
+        self.width = None
+        self.k0 = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _rebin(self, kmin, kmax):
+        # union of the filled range and [kmin,kmax], in units of the current width
+        if len(self.counts):
+            kmin, kmax = min(kmin, self.k0), max(kmax, self.k0+len(self.counts)-1)
+        while kmax-kmin+1 > self.nbins:
+            if len(self.counts):
+                k = np.arange(self.k0, self.k0+len(self.counts))//2
+                self.counts = np.bincount(k-k[0], weights=self.counts).astype(np.int64)
+                self.k0 = k[0]
+            self.width *= 2
+            kmin, kmax = kmin//2, kmax//2
+        if not len(self.counts):
+            self.k0 = kmin
+        lo = self.k0-kmin
+        self.counts = np.pad(self.counts, (lo, kmax-kmin+1-lo-len(self.counts)))
+        self.k0 = kmin
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        if len(x)==0: return self
+        xmin, xmax = x.min(), x.max()
+        if self.width is None:
+            span = (xmax-xmin)/max(self.nbins-1,1)
+            self.width = 2.**np.ceil(np.log2(span)) if span>0 else 2.**-20
+        self._rebin(int(np.floor(xmin/self.width)), int(np.floor(xmax/self.width)))
+        k = np.floor(x/self.width).astype(np.int64) - self.k0
+        self.counts += np.bincount(k, minlength=len(self.counts))
+        return self
+
+    def edges(self):
+        return (self.k0 + np.arange(len(self.counts)+1))*self.width
+
+## Running range of the output of one layer:
+## min/max, zeros, histogram, and the counts of the integer bits each value needs
+## (|x| < 2**intBits, without sign), to check the saturation of quantized_bits settings
+class LayerStats:
+    maxIntBits = 32
+
+    def __init__(self, name, nbins=50):
+        self.name = name
+        self.n = 0
+        self.nZero = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.hist = AutoHistogram(nbins)
+        self.intBitCounts = np.zeros(self.maxIntBits+1, dtype=np.int64)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        if len(x)==0: return self
+        self.n += len(x)
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+        ax = np.abs(x)
+        self.nZero += np.count_nonzero(ax==0)
+        # bits needed for the integer part: 0 below 1, floor(log2|x|)+1 above
+        with np.errstate(divide='ignore'):
+            bits = np.where(ax>=1, np.floor(np.log2(np.maximum(ax,1)))+1, 0).astype(np.int64)
+        self.intBitCounts += np.bincount(np.minimum(bits,self.maxIntBits), minlength=self.maxIntBits+1)
+        self.hist.update(x)
+        return self
+
+    ## n of values out of the range of intBits integer bits
+    def saturated(self, intBits):
+        return int(self.intBitCounts[intBits+1:].sum())
+
+    ## smallest n of integer bits with at most a fraction maxFrac of saturated values
+    def intBits(self, maxFrac=0.):
+        for i in range(self.maxIntBits+1):
+            if self.saturated(i) <= maxFrac*self.n: return i
+        return self.maxIntBits
+
+    def summary(self):
+        return {'n':self.n, 'min':float(self.min), 'max':float(self.max),
+                'zero_frac':float(self.nZero/self.n) if self.n else 0.,
+                'intBits':self.intBits(),
+                'saturated':{i:self.saturated(i) for i in range(self.intBits()+1)}}
+
+## Output statistics of the layers of model on input x, in one pass:
+## a single model with the outputs of all layers, run batch by batch
+def activationStats(model,x,layer_indices=[],batch_size=500,nBins=50):
+    if len(layer_indices)==0:
+        layer_indices = range(len(model.layers))
+    layers = [model.layers[i] for i in layer_indices]
+    m = tf.keras.models.Model(
+        inputs =model.inputs,
+        outputs=[l.output for l in layers]
+    )
+    stats = [LayerStats(l.name, nBins) for l in layers]
+    for i in range(0, len(x), batch_size):
+        outputs = m.predict_on_batch(x[i:i+batch_size])
+        if len(stats)==1: outputs = [outputs]
+        for s,out in zip(stats,outputs):
+            s.update(out)
+    return stats
+
 ## plotAll the weights from model
 def plotWeights(model,nBins=20):
     plt.figure(figsize=(8,6))
@@ -135,10 +241,8 @@ def plotOutputs(model,x,layer_indices=[],nBins=10):
         layers = layer_indices
     else:
         layers = range(1,len(model.layers))
-    for ilayer in layers:
-        label = model.layers[ilayer].name
-        output,bins = np.histogram(layerOutput(model,ilayer,x).flatten(),nBins)
-        hep.histplot(output,bins,label=label)
+    for s in activationStats(model,x,layers,nBins=nBins):
+        hep.histplot(s.hist.counts,s.hist.edges(),label=s.name)
     plt.yscale('log')
     plt.tight_layout()
     plt.legend()
@@ -57,3 +57,79 @@ def decode(val,droppedBits=1,expBits=4,mantBits=3,edge=False,quarter=False):
         if (droppedBits+shift)>0:
             data += 1<<(shift+droppedBits-1)
     return data
+
+## Array versions of encode/decode, with integer bit operations on int64 arrays;
+## the codes are identical to encode(..., asInt=True) and decode for non-negative inputs
+
+# number of bits of each (non-negative) value, as len(bin(v))-2 (1 for 0)
+def bit_length(v):
+    v = np.asarray(v, dtype=np.int64)
+    if v.size==0 or v.max() < (1 << 53):
+        # exact in float64: v = f * 2**n with 0.5 <= f < 1
+        return np.maximum(np.frexp(v.astype(np.float64))[1], 1).astype(np.int64)
+    n = np.zeros(v.shape, dtype=np.int64)
+    for s in [32,16,8,4,2,1]:
+        big = (v >> n) >= (1 << s)
+        n[big] += s
+    return np.maximum(n + ((v >> n) > 0), 1)
+
+def encode_array(values, dropBits=1, expBits=4, mantBits=3, roundBits=False):
+    v = np.asarray(values, dtype=np.int64)
+    if np.any(v < 0):
+        raise ValueError("encode_array takes non-negative values")
+    nbits = bit_length(v)
+    mask = (1 << mantBits) - 1
+    r = (1 << (dropBits-1)) if (roundBits and dropBits>0) else 0
+
+    # short values: kept as they are, after dropping the dropBits
+    code = (v + r) >> dropBits
+
+    # one bit more than the mantissa: exponent 1, the mantissa below the leading bit
+    vs = (v + r) >> dropBits
+    ls = bit_length(vs)
+    one = (1 << mantBits) | ((vs >> np.maximum(ls-1-mantBits, 0)) & mask)
+    code = np.where(nbits == mantBits+dropBits+1, one, code)
+
+    # longer values: exponent from the position of the leading bit, saturated at all ones
+    if roundBits:
+        vt = v + (np.int64(1) << np.maximum(nbits-2-mantBits, 0))
+    else:
+        vt = v
+    lt = bit_length(vt)
+    firstZero = lt - mantBits - dropBits
+    mant = (vt >> np.maximum(lt-1-mantBits, 0)) & mask
+    long = np.where(firstZero < (1 << expBits), (firstZero << mantBits) | mant, (1 << (expBits+mantBits)) - 1)
+    return np.where(nbits > mantBits+dropBits+1, long, code)
+
+def decode_array(values, droppedBits=1, expBits=4, mantBits=3, edge=False, quarter=False):
+    val = np.asarray(values, dtype=np.int64)
+    exp = val >> mantBits
+    mant = val & ((1 << mantBits) - 1)
+    shift = np.maximum(exp-1, 0)
+    if np.any(exp+mantBits+droppedBits > 62):
+        # beyond int64, as python ints
+        exp, mant, shift = exp.astype(object), mant.astype(object), shift.astype(object)
+    data = np.where(exp > 0, (mant << shift) + (1 << (shift+mantBits)), mant)
+    data = data << droppedBits
+
+    if quarter:
+        data = np.where(droppedBits+shift > 1, data + (1 << np.maximum(shift+droppedBits-2, 0)), data)
+    elif not edge:
+        data = np.where(droppedBits+shift > 0, data + (1 << np.maximum(shift+droppedBits-1, 0)), data)
+    return data
+
+## decoded values of all the codes of expBits+mantBits bits, e.g. the 7b (4E+3M) ROC
+## and 9b (5E+4M) sum codes; decode_lut(...)[codes] is decode of each code
+_luts = {}
+def decode_lut(droppedBits=1, expBits=4, mantBits=3, edge=False, quarter=False):
+    key = (droppedBits, expBits, mantBits, edge, quarter)
+    if key not in _luts:
+        _luts[key] = decode_array(np.arange(1 << (expBits+mantBits)), *key)
+    return _luts[key]
+
+## decode_array through the table, for codes of at most maxLUTBits bits
+def decode_codes(values, droppedBits=1, expBits=4, mantBits=3, edge=False, quarter=False, maxLUTBits=12):
+    values = np.asarray(values, dtype=np.int64)
+    if expBits+mantBits <= maxLUTBits and (values.size==0 or (values.min() >= 0 and values.max() < (1 << (expBits+mantBits)))):
+        return decode_lut(droppedBits, expBits, mantBits, edge, quarter)[values]
+    return decode_array(values, droppedBits, expBits, mantBits, edge, quarter)
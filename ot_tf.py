@@ -49,3 +49,37 @@ def sink(a, b, M, m_size, reg, numItermax=1000, stopThr=1e-9):
     return result
 
 
+
+## batched log-domain Sinkhorn: a (N,na) and b (N,nb) are normalized per event,
+## and all events are iterated together for a fixed number of iterations.
+## Potentials are kept as F=f/reg, G=g/reg, so the only kernel needed is C=-M/reg.
+def sink_batch(a, b, C, M, numItermax=100):
+    a = a / tf.maximum(tf.reduce_sum(a, axis=1, keepdims=True), 1e-30)
+    b = b / tf.maximum(tf.reduce_sum(b, axis=1, keepdims=True), 1e-30)
+    # empty cells get a negligible mass instead of log(0)
+    loga = tf.math.log(tf.maximum(a, 1e-30))  # (N, na)
+    logb = tf.math.log(tf.maximum(b, 1e-30))  # (N, nb)
+    C = tf.expand_dims(C, 0)  # (1, na, nb)
+
+    def loop_func(cpt, F, G):
+        F = loga - tf.reduce_logsumexp(tf.expand_dims(G, 1) + C, axis=2)
+        G = logb - tf.reduce_logsumexp(tf.expand_dims(F, 2) + C, axis=1)
+        return [cpt + 1, F, G]
+
+    F = tf.zeros_like(loga)
+    G = tf.zeros_like(logb)
+    _, F, G = tf.while_loop(cond=lambda cpt, F, G: cpt < numItermax, body=loop_func,
+                            loop_vars=[tf.constant(0), F, G], maximum_iterations=numItermax)
+
+    P = tf.exp(tf.expand_dims(F, 2) + tf.expand_dims(G, 1) + C)  # (N, na, nb)
+    return tf.reduce_sum(P * M, axis=(1, 2))
+
+def sinkhorn_loss(M, reg=0.5, numItermax=100):
+    M = tf.cast(M, tf.float32)
+    C = -M / reg
+    n = M.shape[0]
+    def sinkhorn_loss(y_true, y_pred):
+        y_true = tf.cast(tf.reshape(y_true, (-1, n)), tf.float32)
+        y_pred = tf.cast(tf.reshape(y_pred, (-1, n)), tf.float32)
+        return sink_batch(y_true, y_pred, C, M, numItermax)
+    return sinkhorn_loss
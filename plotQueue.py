@@ -0,0 +1,158 @@
+import os
+import pickle
+import optparse
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import poolUtil
+import plotWafer
+
+## Rendering of the train.py plots, immediate or deferred.
+## The plot functions of train.py compute their numbers and text files, then
+## submit() the drawing. When deferred, each plot is recorded as a spec
+## (render function, data, working directory) and drawn later by render(),
+## in a pool of processes, or saved with save() and drawn from the spec file:
+##   python plotQueue.py plots.pkl --workers 8
+
+_deferred = False
+_specs = []
+
+def defer(enable=True):
+    global _deferred
+    _deferred = enable
+
+def submit(func, *args, **kwargs):
+    if not _deferred:
+        return func(*args, **kwargs)
+    # the specs refer to the render functions by name, so only those of this module can be deferred
+    if globals().get(func.__name__) is not func:
+        raise ValueError('cannot defer %s: not a render function of plotQueue'%func.__name__)
+    # the plots are saved relative to the current directory (train.py changes it per model)
+    _specs.append((func.__name__, args, kwargs, os.getcwd()))
+
+def pending():
+    return len(_specs)
+
+def clear():
+    del _specs[:]
+
+def _renderSpec(spec):
+    fname, args, kwargs, cwd = spec
+    os.chdir(cwd)
+    globals()[fname](*args, **kwargs)
+
+def render(workers=1, specs=None):
+    if specs is None:
+        specs = list(_specs)
+        del _specs[:]
+    if not specs: return
+    print('Rendering %i plots'%len(specs))
+    cwd = os.getcwd()
+    workers = poolUtil.nWorkers(workers)
+    poolUtil.poolMap(_renderSpec, specs, workers, chunksize=max(1,len(specs)//(4*workers)))
+    os.chdir(cwd)
+
+## the pending plots stay queued, for render()
+def save(fname):
+    poolUtil.saveAtomic(fname, lambda f: pickle.dump(_specs, f))
+    print('Saved %i plot specs to %s'%(len(_specs),fname))
+
+def renderFile(fname, workers=1):
+    with open(fname,'rb') as f:
+        specs = pickle.load(f)
+    render(workers, specs)
+
+## the drawing part of train.plotHist, plotProfile, OverlayPlots and visDisplays
+def renderHist(vals, name, pname, xtitle="", ytitle="", nbins=40, lims=None, stats=None, logy=False, leg=None):
+    plt.figure(figsize=(6,4))
+    if leg:
+        n, bins, patches = plt.hist(vals, nbins, range=lims, label=leg)
+    else:
+        n, bins, patches = plt.hist(vals, nbins, range=lims)
+    ax = plt.gca()
+    plt.text(0.1, 0.9, name,transform=ax.transAxes)
+    if stats is not None:
+        mu, std = stats
+        plt.text(0.1, 0.8, r'$\mu=%.3f,\ \sigma=%.3f$'%(mu,std),transform=ax.transAxes)
+    plt.xlabel(xtitle)
+    plt.ylabel(ytitle if ytitle else 'Entries')
+    if logy: plt.yscale('log')
+    print("Saving "+pname)
+    plt.savefig(pname)
+    plt.close()
+
+def renderProfile(bin_centers, median, loe, hie, name, pname, xtitle="", ytitle="Entries", logy=False, leg=None, text=""):
+    plt.figure(figsize=(6,4))
+    plt.errorbar(x=bin_centers, y=median, yerr=[loe,hie], linestyle='none', marker='.', label=leg)
+    ax = plt.gca()
+    plt.text(0.1, 0.9, name,transform=ax.transAxes)
+    if text: plt.text(0.1, 0.82, text.replace('MAX','inf'), transform=ax.transAxes)
+    plt.xlabel(xtitle)
+    plt.ylabel(ytitle)
+    if logy: plt.yscale('log')
+    print("Saving "+pname)
+    plt.savefig(pname)
+    plt.close()
+
+def renderOverlay(results, name, pname, xtitle="", ytitle="Entries", text="", ylim=None):
+    centers = results[0][1][0]
+    wid = centers[1]-centers[0]
+    offset = 0.33*wid
+
+    plt.figure(figsize=(6,4))
+
+    for ir,r in enumerate(results):
+        lab = r[0]
+        dat = r[1]
+        off = offset * (ir-1)/2 * (-1. if ir%2 else 1.) # .1 left, .1 right, .2 left, ...
+        plt.errorbar(x=dat[0]+off, y=dat[1], yerr=dat[2], label=lab)
+
+    ax = plt.gca()
+    plt.text(0.1, 0.9, name, transform=ax.transAxes)
+    if text: plt.text(0.1, 0.82, text.replace('MAX','inf'), transform=ax.transAxes)
+    if ylim is not None:
+        plt.ylim(ylim[0],ylim[1])
+    plt.xlabel(xtitle)
+    plt.ylabel(ytitle)
+    plt.legend(loc='upper right')
+    print("Saving "+pname)
+    plt.savefig(pname)
+    plt.close()
+
+def renderDisplays(inputImgCalQ, outputImg, encodedImg, pname):
+    Nevents = len(inputImgCalQ)
+    fig, axs = plt.subplots(3, Nevents, figsize=(16, 10))
+    for i in range(Nevents):
+        if i==0:
+            axs[0,i].set(xlabel='',ylabel='cell_y',title='Input_%i'%i)
+        else:
+            axs[0,i].set(xlabel='',title='Input_%i'%i)
+        plotWafer.plotWafer( inputImgCalQ[i], fig, axs[0,i])
+
+    for i in range(Nevents):
+        if i==0:
+            axs[1,i].set(xlabel='cell_x',ylabel='cell_y',title='CNN Ouput_%i'%i)
+        else:
+            axs[1,i].set(xlabel='cell_x',title='CNN Ouput_%i'%i)
+        plotWafer.plotWafer( outputImg[i], fig, axs[1,i])
+
+    if len(encodedImg):
+        for i in range(0,Nevents):
+            if i==0:
+                axs[2,i].set(xlabel='latent dim',ylabel='depth',title='Encoded_%i'%i)
+            else:
+                axs[2,i].set(xlabel='latent dim',title='Encoded_%i'%i)
+            c1=axs[2,i].imshow(encodedImg[i])
+            if i==Nevents:
+                plt.colorbar(c1,ax=axs[2,i])
+
+    plt.savefig(pname)
+    plt.close()
+
+if __name__== "__main__":
+    parser = optparse.OptionParser(usage="usage: %prog [options] plots.pkl")
+    parser.add_option("--workers", type='int', default=1, dest="workers", help="n of processes rendering the plots (-1: all cores)")
+    (options, args) = parser.parse_args()
+    matplotlib.use('PDF')
+    for fname in args:
+        renderFile(fname, options.workers)
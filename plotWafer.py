@@ -200,7 +200,7 @@ coords = np.array([[[ 7.30715907, 17.77361044],
 #construct patches
 patches = []
 for coord in coords:
-    patches.append(mpatches.Polygon(coord,True))
+    patches.append(mpatches.Polygon(coord,closed=True))
     
     
     
@@ -0,0 +1,28 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+## Process pools and cache files shared by dataLoader, emdEngine, baselineCache,
+## plotQueue and verifyVectors.
+
+## n of processes for the --*Workers options, -1 for all cores
+def nWorkers(workers):
+    return os.cpu_count() if workers < 0 else workers
+
+## [func(job) for job in jobs], in a pool of up to workers processes
+## (serially for a single worker or a single job)
+def poolMap(func, jobs, workers=1, chunksize=1):
+    workers = min(nWorkers(workers), len(jobs))
+    if workers <= 1:
+        return [func(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, jobs, chunksize=chunksize))
+
+## write then rename, so concurrent jobs never see a partial file
+def saveAtomic(fname, save):
+    tmp = fname + '.%i.tmp'%os.getpid()
+    with open(tmp, 'wb') as f: save(f)
+    os.replace(tmp, fname)
+
+def saveArray(fname, arr):
+    saveAtomic(fname, lambda f: np.save(f, arr))
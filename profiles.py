@@ -0,0 +1,66 @@
+import numpy as np
+import scipy.stats
+
+## Binned quantiles of y vs x, as plotProfile draws them
+## (median and the 16%/84% quantiles of y in each x bin).
+## The events are sorted once by (bin, y); the quantiles of any subset of the
+## events are then read off the sorted order, without sorting again.
+
+QUANTILES = (0.5-0.68/2, 0.5, 0.5+0.68/2)
+
+## np.quantile(v, q) ('linear' method) of the sorted values v[start:start+n], for many ranges at once
+def _sortedQuantile(v, start, n, q):
+    index = (n-1)*q
+    lo = np.floor(index)
+    gamma = index - lo
+    lo = lo.astype(np.int64)
+    hi = np.minimum(lo+1, n-1)
+    a = v[start+lo]
+    b = v[start+hi]
+    # same interpolation as numpy's _lerp
+    diff_b_a = b - a
+    out = a + diff_b_a*gamma
+    return np.where(gamma>=0.5, b - diff_b_a*(1-gamma), out)
+
+class Profile:
+    def __init__(self, x, y, nbins=40, lims=None):
+        x = np.asarray(x).reshape(-1)
+        y = np.asarray(y).reshape(-1)
+        if lims is None: lims = (x.min(),x.max())
+        self.nbins = nbins
+        # same binning as scipy.stats.binned_statistic
+        binned = scipy.stats.binned_statistic(x, x, bins=nbins, range=lims, statistic='count')
+        self.bin_edges = binned.bin_edges
+        self.bin_centers = (self.bin_edges[:-1] + self.bin_edges[1:])/2.
+        binnumber = binned.binnumber
+        inRange = (binnumber>=1) & (binnumber<=nbins)
+        self.index = np.flatnonzero(inRange)
+        order = np.lexsort((y[self.index], binnumber[self.index]))
+        self.index = self.index[order]
+        self.bins = binnumber[self.index]-1
+        self.y = y[self.index]
+        self.size = len(x)
+
+    ## quantiles of the events in mask (all events by default), shape (len(quantiles), nbins)
+    ## empty bins give nan, as binned_statistic does
+    def quantiles(self, mask=None, quantiles=QUANTILES):
+        bins, y = self.bins, self.y
+        if mask is not None:
+            sel = np.asarray(mask)[self.index]
+            bins, y = bins[sel], y[sel]
+        counts = np.bincount(bins, minlength=self.nbins)
+        starts = np.concatenate([[0],np.cumsum(counts)[:-1]])
+        filled = counts>0
+        out = np.full((len(quantiles),self.nbins), np.nan)
+        for i,q in enumerate(quantiles):
+            out[i,filled] = _sortedQuantile(y, starts[filled], counts[filled], q)
+        return out
+
+    ## quantiles for several subsets of the events, shape (len(masks), len(quantiles), nbins)
+    def sliceQuantiles(self, masks, quantiles=QUANTILES):
+        return np.stack([self.quantiles(mask, quantiles) for mask in masks])
+
+    ## the (bin_centers, lo, median, hi) plotProfile expects
+    def stats(self, mask=None):
+        lo, median, hi = self.quantiles(mask)
+        return self.bin_centers, lo, median, hi
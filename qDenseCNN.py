@@ -14,8 +14,6 @@ import json
 import ot_tf
 import ot
 
-from telescope import telescopeMSE2
-
 hexCoords = np.array([ 
     [0.0, 0.0], [0.0, -2.4168015], [0.0, -4.833603], [0.0, -7.2504044], 
     [2.09301, -1.2083969], [2.09301, -3.6251984], [2.09301, -6.042], [2.09301, -8.458794], 
@@ -31,17 +29,8 @@ hexCoords = np.array([
     [-1.5697594, -16.0113], [-3.6627693, -14.802895], [-5.7557793, -13.594498], [-7.848793, -12.386101]])
 hexMetric = tf.constant( ot.dist(hexCoords, hexCoords, 'euclidean'), tf.float32)
 
-def myfunc(a):
-    reg=0.5
-    y_true, y_pred = tf.split(a,num_or_size_splits=2,axis=1)
-    tf_sinkhorn_loss = ot_tf.sink(y_true, y_pred, hexMetric, (48, 48), reg)
-    return tf_sinkhorn_loss
-def sinkhorn_loss(y_true, y_pred):
-    y_true = K.cast(y_true, y_pred.dtype)
-    y_pred = K.reshape(y_pred, (-1,48,1))
-    y_true = K.reshape(y_true, (-1,48,1))
-    cc = tf.concat([y_true, y_pred], axis=2)
-    return K.mean( tf.map_fn(myfunc, cc), axis=(-1) )
+# batched over the events, with a fixed number of iterations
+sinkhorn_loss = ot_tf.sinkhorn_loss(hexMetric, reg=0.5, numItermax=100)
 
 from denseCNN import denseCNN
 
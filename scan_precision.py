@@ -8,6 +8,7 @@ import matplotlib.pyplot as plt
 import json
 
 from train import trainCNN
+import verifyVectors
 from utils import plotGraphErr
 
 def plotScan(x,outs,name,odir,xtitle="n bits"):
@@ -55,7 +56,31 @@ if __name__== "__main__":
     parser.add_option("--epochs", type='int', default = 100, dest="epochs", help="n epoch to train")
     parser.add_option("--skipPlot", action='store_true', default = False,dest="skipPlot", help="skip the plotting step")
     parser.add_option("--nCSV", type='int', default = 50, dest="nCSV", help="n of validation events to write to csv")
+    parser.add_option("--verifyFormat", type="choice", choices=verifyVectors.FORMATS, default = 'float', dest="verifyFormat", help="format of the verify_*.csv quantized vectors: float, or the fixed-point codes as int or hex")
+    parser.add_option("--verifyBin", action='store_true', default = False, dest="verifyBin", help="also write the verification vectors to .bin files, described in .json files")
+    parser.add_option("--verifyWorkers", type='int', default=1, dest="verifyWorkers", help="n of processes formatting the verification vectors (-1: all cores)")
     parser.add_option("--rescaleInputToMax", action='store_true', default = False,dest="rescaleInputToMax", help="recale the input images so the maximum deposit is 1. Else normalize")
+    parser.add_option("--cacheDir", type="string", default = '', dest="cacheDir", help="cache parsed input CSVs as memory-mapped .npy files in this directory")
+    parser.add_option("--loadWorkers", type='int', default=1, dest="loadWorkers", help="n of processes reading the files of an input directory (-1: all cores)")
+    parser.add_option("--stream", action='store_true', default = False,dest="stream", help="stream the training events with tf.data instead of loading the full input")
+    parser.add_option("--chunksize", type='int', default=100000, dest="chunksize", help="n of rows read per chunk when streaming, and normalized per chunk with --intCharges")
+    parser.add_option("--intCharges", action='store_true', default = False,dest="intCharges", help="keep the raw input charges as unsigned integers, and the normalized inputs as float32")
+    parser.add_option("--lazyClone", action='store_true', default = False,dest="lazyClone", help="make the n_copy hi occ clones of the training events per batch instead of in memory")
+    parser.add_option("--cloneSeed", type='int', default=0, dest="cloneSeed", help="seed for the training event order and the cell order of the lazy clones")
+    parser.add_option("--predictBatch", type='int', default=500, dest="predictBatch", help="batch size for the AE evaluation")
+    parser.add_option("--shapeMetrics", action='store_true', default = False,dest="shapeMetrics", help="also compute the dMean, dRMS, cross_corr and SSD metrics")
+    parser.add_option("--emdWorkers", type='int', default=1, dest="emdWorkers", help="n of processes computing the EMD of the evaluation events (-1: all cores)")
+    parser.add_option("--sparseEMD", action='store_true', default = False,dest="sparseEMD", help="solve the EMD on the non-zero cells of each event only")
+    parser.add_option("--treeEMD", action='store_true', default = False,dest="treeEMD", help="use the tree-Wasserstein approximation on the supercell hierarchy for the EMD")
+    parser.add_option("--treeCalib", type='int', default=0, dest="treeCalib", help="n of AE output events on which to compare the tree EMD with the exact EMD, once per model")
+    parser.add_option("--baselineCache", type="string", default = '', dest="baselineCache", help="save the baseline algorithm outputs and metrics in this directory, to reuse them in later runs")
+    parser.add_option("--saveAccumulators", action='store_true', default = False,dest="saveAccumulators", help="save mergeable histograms/moments of each metric (acc_<metric>_<alg>.npz)")
+    parser.add_option("--deferPlots", action='store_true', default = False,dest="deferPlots", help="draw the plots at the end of the run, in --plotWorkers processes")
+    parser.add_option("--plotWorkers", type='int', default=1, dest="plotWorkers", help="n of processes drawing the deferred plots (-1: all cores)")
+    parser.add_option("--plotSpecs", type="string", default = '', dest="plotSpecs", help="save the deferred plots to this file, to draw them with 'python plotQueue.py <file>'")
+    parser.add_option("--noRender", action='store_true', default = False,dest="noRender", help="do not draw the deferred plots (e.g. on batch nodes, with --plotSpecs)")
+    parser.add_option("--maxFlops", type='int', default=0, dest="maxFlops", help="skip the models whose encoder needs more FLOPs than this")
+    parser.add_option("--maxPams", type='int', default=0, dest="maxPams", help="skip the models whose encoder has more parameters than this")
     (options, args) = parser.parse_args()
     #trainCNN(options,args)
     BitScan(options,args)
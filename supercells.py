@@ -0,0 +1,27 @@
+import numpy as np
+
+## Supercell groupings of the 48 TCs, as plain numpy arrays (used by telescope.py
+## for the losses and by emdEngine.py for the tree EMD, without TensorFlow)
+
+#
+# keep simplified 12 x 3 mapping for now
+SCmask_48_12 = np.array([
+    [ 0,  1,  4,  5],
+    [ 2,  3,  6,  7],
+    [ 8,  9, 12, 13],
+    [10, 11, 14, 15],
+    [16, 17, 20, 21],
+    [18, 19, 22, 23],
+    [24, 25, 28, 29],
+    [26, 27, 30, 31],
+    [32, 33, 36, 37],
+    [34, 35, 38, 39],
+    [40, 41, 44, 45],
+    [42, 43, 46, 47],
+])
+Remap_48_12 = np.zeros((48,12))
+for isc,sc in enumerate(SCmask_48_12): 
+    for tc in sc:
+        Remap_48_12[int(tc),isc]=1
+Remap_12_3 = np.zeros((12,3))
+for i in range(12): Remap_12_3[i,int(i/4)]=1
@@ -32,6 +32,7 @@ while for a SC shifted one TC to the right the weight is 2*1/4+2*1/2=1.5
 import tensorflow as tf
 import numpy as np
 from tensorflow.keras import backend as K
+from supercells import SCmask_48_12,Remap_48_12,Remap_12_3
 
 # combine neighbor cells in 2x2 grids, record weights
 # multilpy weights by 0.25 for now to account for effective increase in cells from 12 (sum weights now 48 not 12)
@@ -82,28 +83,8 @@ Weights_48_36 = SCmask_48_36[:,4]
 tf_Weights_48_36 = tf.constant(Weights_48_36,dtype=tf.float32)
 
 #
-# keep simplified 12 x 3 mapping for now
-SCmask_48_12 = np.array([
-    [ 0,  1,  4,  5],
-    [ 2,  3,  6,  7],
-    [ 8,  9, 12, 13],
-    [10, 11, 14, 15],
-    [16, 17, 20, 21],
-    [18, 19, 22, 23],
-    [24, 25, 28, 29],
-    [26, 27, 30, 31],
-    [32, 33, 36, 37],
-    [34, 35, 38, 39],
-    [40, 41, 44, 45],
-    [42, 43, 46, 47],
-])
-Remap_48_12 = np.zeros((48,12))
-for isc,sc in enumerate(SCmask_48_12): 
-    for tc in sc:
-        Remap_48_12[int(tc),isc]=1
+# keep simplified 12 x 3 mapping for now (see supercells.py)
 tf_Remap_48_12 = tf.constant(Remap_48_12,dtype=tf.float32)
-Remap_12_3 = np.zeros((12,3))
-for i in range(12): Remap_12_3[i,int(i/4)]=1
 tf_Remap_12_3 = tf.constant(Remap_12_3,dtype=tf.float32)
 
 def telescopeMSE2(y_true, y_pred):
@@ -169,3 +150,35 @@ def telescopeMSE8x8(y_true,y_pred):
     return telescopeMSE2(tf.matmul(K.reshape(y_true,(-1,64)),remap_8x8_matrix),
                          tf.matmul(K.reshape(y_pred,(-1,64)),remap_8x8_matrix))
 
+
+
+## fused versions: the layout remap and the 2x2 and 4x4 supercell sums are folded into
+## one (n_in, 36+3) matrix, so the supercell terms need a single matmul per input.
+## The TC term is computed on the input cells directly, with weight 0 for the cells the layout drops.
+## The means and 4/2/1 factors of telescopeMSE2 become per-column weights.
+Remap_48_3 = Remap_48_12.dot(Remap_12_3)
+Remap_48_39 = np.concatenate([Remap_48_36, Remap_48_3], axis=1)
+Weights_39 = np.concatenate([2.*Weights_48_36/36, np.full(3, 1./3)])
+
+def fusedTelescopeMSE(remap_matrix=None, name='telescopeMSE2'):
+    if remap_matrix is None: remap_matrix = np.eye(48)
+    n_in = remap_matrix.shape[0]
+    tf_combined = tf.constant(np.dot(remap_matrix, Remap_48_39), dtype=tf.float32)
+    tf_weights = tf.constant(Weights_39, dtype=tf.float32)
+    tf_tcWeights = tf.constant(4./48*remap_matrix.sum(axis=1), dtype=tf.float32)
+    def loss(y_true, y_pred):
+        y_true = K.cast(y_true, y_pred.dtype)
+        y_pred_rs = K.reshape(y_pred, (-1,n_in))
+        y_true_rs = K.reshape(y_true, (-1,n_in))
+        lossTC = K.sum(K.square(y_true_rs - y_pred_rs) * K.maximum(y_pred_rs, y_true_rs) * tf_tcWeights, axis=(-1))
+        y_pred_sc = tf.matmul(y_pred_rs, tf_combined)
+        y_true_sc = tf.matmul(y_true_rs, tf_combined)
+        lossSC = K.sum(K.square(y_true_sc - y_pred_sc) * K.maximum(y_pred_sc, y_true_sc) * tf_weights, axis=(-1))
+        return lossTC + lossSC
+    loss.__name__ = name
+    return loss
+
+telescopeMSE2F   = fusedTelescopeMSE(None, 'telescopeMSE2F')
+telescopeMSE443F = fusedTelescopeMSE(remap_443_matrix, 'telescopeMSE443F')
+telescopeMSE663F = fusedTelescopeMSE(remap_663_matrix, 'telescopeMSE663F')
+telescopeMSE8x8F = fusedTelescopeMSE(remap_8x8_matrix, 'telescopeMSE8x8F')
@@ -0,0 +1,27 @@
+# calibration of the tree-Wasserstein EMD approximation against the exact EMD,
+# on the verify_input_calQ.csv / verify_decoded_calQ.csv files written by train.py
+import numpy as np
+import pandas as pd
+import optparse
+import json
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import emdEngine
+
+if __name__== "__main__":
+
+    parser = optparse.OptionParser()
+    parser.add_option('-i',"--inputFile", type="string", default = 'verify_input_calQ.csv',dest="inputFile", help="input charges (N x 48 csv)")
+    parser.add_option("--outputFile", type="string", default = 'verify_decoded_calQ.csv',dest="outputFile", help="decoded charges (N x 48 csv)")
+    parser.add_option("--nEvents", type='int', default = 10000, dest="nEvents", help="n of events to compare")
+    parser.add_option("--emdWorkers", type='int', default=1, dest="emdWorkers", help="n of processes computing the exact EMD (-1: all cores)")
+    parser.add_option("--json", type="string", default = '',dest="json", help="write the calibration to this json file")
+    (options, args) = parser.parse_args()
+
+    x = pd.read_csv(options.inputFile, dtype=np.float64, header=None).values
+    y = pd.read_csv(options.outputFile, dtype=np.float64, header=None).values
+    calib = emdEngine.treeCalibration(x, y, options.nEvents, options.emdWorkers)
+    emdEngine.printCalibration(calib)
+    if options.json:
+        with open(options.json,'w') as f: json.dump(calib, f, indent=2)
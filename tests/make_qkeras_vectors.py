@@ -0,0 +1,63 @@
+# write the reference vectors of tests/test_fixed_point.py: encoder outputs of real qDenseCNN (qkeras) models
+# for a few layouts and quantizers, with their quantized weights and inputs.
+# Needs qkeras (with TF 2.16+: tf_keras and TF_USE_LEGACY_KERAS=1); the CPU convolutions of TF are channels_last only.
+import numpy as np
+import tensorflow as tf
+import optparse
+import pickle
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+
+PAMS = {
+    'CNN_layer_nodes': [8], 'CNN_kernel_size': [3], 'CNN_pool': [False],
+    'Dense_layer_nodes': [], 'encoded_dim': 16, 'shape': [4, 4, 3],
+    'channels_first': False, 'activation': 'relu',
+    'nBits_input'  : {'total': 10, 'integer': 3, 'keep_negative': 1},
+    'nBits_accum'  : {'total': 11, 'integer': 3, 'keep_negative': 1},
+    'nBits_weight' : {'total':  5, 'integer': 1, 'keep_negative': 1},
+    'nBits_encod'  : {'total':  9, 'integer': 1, 'keep_negative': 0},
+}
+
+CONFIGS = [
+    PAMS,
+    dict(PAMS, CNN_layer_nodes=[8,4], CNN_kernel_size=[3,3], CNN_pool=[True,False], Dense_layer_nodes=[12]),
+    dict(PAMS, CNN_kernel_size=[2], activation='linear', nBits_encod={'total': 9, 'integer': 2, 'keep_negative': 1}),
+    dict(PAMS, shape=[8, 8, 1], CNN_layer_nodes=[4], CNN_pool=[True], encoded_dim=8,
+         nBits_conv={'total': 6, 'integer': 0, 'keep_negative': 1},
+         nBits_dense={'total': 7, 'integer': 1, 'keep_negative': 1}),
+]
+
+## inputs as the normalized charges, with some saturating events
+def getData(n, nCells, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.exponential(1., size=(n,nCells)) * (rng.random((n,nCells))<0.3)
+    x = x/np.maximum(x.sum(axis=1, keepdims=True), 1e-9)
+    x[::10] *= 20.
+    return x.astype(np.float32)
+
+def makeVectors(pams, nEvents, seed):
+    from qkeras.utils import model_save_quantized_weights
+    from qDenseCNN import qDenseCNN
+    tf.keras.utils.set_random_seed(seed)
+    m = qDenseCNN()
+    m.setpams(dict(pams))
+    m.init(printSummary=False)
+    ae, en = m.get_models()
+    qweights = model_save_quantized_weights(en)
+    x = getData(nEvents, int(np.prod(pams['shape'])), seed).reshape((-1,)+tuple(pams['shape']))
+    return {'pams': pams, 'qweights': qweights, 'input': x, 'encoded': en.predict(x)}
+
+if __name__== "__main__":
+
+    parser = optparse.OptionParser()
+    parser.add_option('-o',"--outputFile", type="string", default = os.path.join(os.path.dirname(os.path.abspath(__file__)),'qkeras_vectors.pkl'),
+                      dest="outputFile", help="pickle file of the vectors")
+    parser.add_option("--nEvents", type='int', default = 200, dest="nEvents", help="n of events per model")
+    (options, args) = parser.parse_args()
+
+    vectors = [makeVectors(pams, options.nEvents, seed) for seed,pams in enumerate(CONFIGS)]
+    for v in vectors:
+        print(v['pams']['shape'], v['pams']['CNN_layer_nodes'], 'nonzero codes: %.2f'%np.mean(v['encoded']!=0))
+    with open(options.outputFile,'wb') as f:
+        pickle.dump(vectors, f)
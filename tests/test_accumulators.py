@@ -0,0 +1,61 @@
+# check the streaming accumulators against numpy on the full arrays, and their merging
+import numpy as np
+import tempfile
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import accumulators
+
+def getVals(n=200000, seed=0):
+    rng = np.random.default_rng(seed)
+    vals = rng.exponential(2.,size=n)
+    vals[::7] = -1.
+    vals[3::7] = -0.5
+    return vals
+
+def test_moments():
+    vals = getVals()
+    acc = accumulators.accumulate(vals, chunksize=7777)
+    assert acc.moments.n==len(vals)
+    assert np.isclose(acc.moments.mean, np.mean(vals), rtol=1e-12)
+    assert np.isclose(acc.moments.std(), np.std(vals), rtol=1e-12)
+    assert acc.moments.min==vals.min() and acc.moments.max==vals.max()
+
+def test_histogram():
+    vals = getVals()
+    acc = accumulators.accumulate(vals, nbins=1000, lims=(-1.,20.))
+    counts, edges = np.histogram(vals, 1000, range=(-1.,20.))
+    assert np.array_equal(acc.hist.counts[1:-1], counts)
+    assert acc.hist.counts[0]==0 and acc.hist.counts[-1]==np.sum(vals>20.)
+    # quantiles within one bin width
+    q = [0.5, 0.5-0.68/2, 0.5+0.68/2, 0.99]
+    assert np.all(np.abs(acc.quantile(q)-np.quantile(vals,q)) <= edges[1]-edges[0])
+
+def test_merge():
+    vals = getVals()
+    parts = np.array_split(vals, 5)
+    with tempfile.TemporaryDirectory() as d:
+        fnames = []
+        for i,part in enumerate(parts):
+            fnames.append(os.path.join(d,'acc%i.npz'%i))
+            accumulators.accumulate(part).save(fnames[-1])
+        merged = accumulators.mergeFiles(fnames)
+    full = accumulators.accumulate(vals)
+    assert merged.moments.n==full.moments.n
+    assert np.isclose(merged.moments.mean, full.moments.mean, rtol=1e-12)
+    assert np.isclose(merged.moments.std(), full.moments.std(), rtol=1e-12)
+    assert np.array_equal(merged.hist.counts, full.hist.counts)
+    try:
+        merged.merge(accumulators.MetricAccumulator(lims=(0.,1.)))
+        assert False
+    except ValueError:
+        pass
+
+def main():
+    test_moments()
+    test_histogram()
+    test_merge()
+    print(accumulators.accumulate(getVals()).summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# compare the one-pass activation statistics with the per-layer layerOutput models, and time both
+import numpy as np
+import tensorflow as tf
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import graphUtil
+
+def getModel():
+    inp = tf.keras.layers.Input(shape=(4,4,3))
+    x = tf.keras.layers.Conv2D(8,3,padding='same',activation='relu')(inp)
+    x = tf.keras.layers.Flatten()(x)
+    x = tf.keras.layers.Dense(16)(x)
+    x = tf.keras.layers.Activation('relu')(x)
+    x = tf.keras.layers.Dense(16,activation='linear')(x)
+    return tf.keras.models.Model(inp,x)
+
+def getData(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.exponential(1.,size=(n,4,4,3)).astype(np.float32)
+    x[::5] *= 100.
+    return x
+
+def test_histogram():
+    rng = np.random.default_rng(1)
+    h = graphUtil.AutoHistogram(50)
+    chunks = [rng.normal(0,1,1000), rng.normal(5,0.1,1000), rng.exponential(100,1000), np.zeros(10), -rng.exponential(1000,100)]
+    for c in chunks: h.update(c)
+    vals = np.concatenate(chunks)
+    edges = h.edges()
+    assert len(h.counts)<=50
+    assert edges[0]<=vals.min() and edges[-1]>vals.max()
+    assert np.array_equal(h.counts, np.histogram(vals, edges)[0])
+
+def test_activationStats():
+    model, x = getModel(), getData()
+    stats = graphUtil.activationStats(model, x, batch_size=512)
+    assert [s.name for s in stats]==[l.name for l in model.layers]
+    for i,s in enumerate(stats):
+        out = graphUtil.layerOutput(model,i,x).flatten().astype(np.float64)
+        assert s.n==len(out)
+        assert np.isclose(s.min,out.min(),rtol=1e-5) and np.isclose(s.max,out.max(),rtol=1e-5)
+        assert s.hist.counts.sum()==len(out)
+        bits = s.intBits()
+        assert np.all(np.abs(out)<2.**bits*(1+1e-6))
+        if bits>0:
+            assert s.saturated(bits-1)==np.sum(np.abs(out)>=2.**(bits-1))>0
+
+def main():
+    test_histogram()
+    model, x = getModel(), getData(50000)
+    t0 = time.time()
+    for i in range(len(model.layers)):
+        np.histogram(graphUtil.layerOutput(model,i,x).flatten(),50)
+    t1 = time.time()
+    stats = graphUtil.activationStats(model, x)
+    t2 = time.time()
+    print('per-layer models: %.2f s, one pass: %.2f s'%(t1-t0,t2-t1))
+    for s in stats: print(s.name, s.summary())
+
+if __name__ == "__main__":
+    main()
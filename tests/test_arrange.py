@@ -0,0 +1,148 @@
+# compare the arrangement plans of denseCNN with the former prepInput/mapToCalQ, and time both
+import numpy as np
+import pytest
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from denseCNN import denseCNN,getArrangePlan
+
+# former denseCNN.invertArrange, prepInput (without clones) and mapToCalQ
+def invertArrange(arrange,arrMask=[],calQMask=[]):
+    remap =[]
+    hashmap = {}  ## cell:index mapping
+    foundDuplicateCharge = False
+    if len(arrMask)==0:
+        if len(arrange)>len(np.unique(arrange)):
+            foundDuplicateCharge=True
+    else:
+        if len(arrange[arrMask==1])>len(np.unique(arrange[arrMask==1])):
+            foundDuplicateCharge=True
+    for i in range(len(arrange)):
+        if len(arrMask)>0 :
+            if arrMask[i]==1:
+                if(foundDuplicateCharge):
+                    if calQMask[i]==1: hashmap[arrange[i]]=i
+                else:
+                    hashmap[arrange[i]]=i
+        else:
+            hashmap[arrange[i]]=i
+    for i in range(len(np.unique(arrange))):
+        remap.append(hashmap[i])
+    return np.array(remap)
+
+def prepInput(pams,normData):
+    shape = pams['shape']
+    if len(pams['arrange'])>0:
+        arrange = pams['arrange']
+        inputdata = normData[:,arrange]
+    else:
+        inputdata = normData
+    if len(pams['arrMask'])>0:
+        arrMask = pams['arrMask']
+        inputdata[:,arrMask==0]=0  #zeros out repeated entries
+    return inputdata.reshape(len(inputdata),shape[0],shape[1],shape[2])
+
+def mapToCalQ(pams,x):
+    if len(pams['arrange']) > 0:
+        arrange = pams['arrange']
+        remap   = invertArrange(arrange,pams['arrMask'],pams['calQMask'])
+        if len(pams['arrMask'])>0:
+            imgSize =pams['shape'][0] *pams['shape'][1]* pams['shape'][2]
+            x = x.reshape(len(x),imgSize)
+            x[:,pams['arrMask']==0]=0 ## apply arrMask
+            return x[:,remap]             ## map to calQ
+        else:
+            return x.reshape(len(x),48)[:,remap]
+    else:
+        return x.reshape(len(x),48)
+
+# the layouts of train.buildmodels
+arrange443 = np.array([[i,16+i,32+i] for i in range(16)]).flatten()
+arrange8x8 = np.array([
+    28,29,30,31,0,4,8,12,
+    24,25,26,27,1,5,9,13,
+    20,21,22,23,2,6,10,14,
+    16,17,18,19,3,7,11,15,
+    47,43,39,35,35,34,33,32,
+    46,42,38,34,39,38,37,36,
+    45,41,37,33,43,42,41,40,
+    44,40,36,32,47,46,45,44])
+arrMask8x8 = np.array([
+    1,1,1,1,1,1,1,1,
+    1,1,1,1,1,1,1,1,
+    1,1,1,1,1,1,1,1,
+    1,1,1,1,1,1,1,1,
+    1,1,1,1,1,1,1,1,
+    1,1,1,0,0,1,1,1,
+    1,1,0,0,0,0,0,1,
+    1,0,0,0,0,0,0,1,])
+# the first unmasked location of every cell holds its calQ
+calQMask8x8 = np.zeros(64, dtype=int)
+calQMask8x8[[np.where((arrange8x8==c) & (arrMask8x8==1))[0][0] for c in range(48)]] = 1
+arrange12x4 = np.random.default_rng(2).permutation(48)
+
+LAYOUTS = [
+    {'shape':(4,4,3), 'arrange':[], 'arrMask':[], 'calQMask':[]},
+    {'shape':(4,4,3), 'arrange':arrange443, 'arrMask':[], 'calQMask':[]},
+    {'shape':(8,8,1), 'arrange':arrange8x8, 'arrMask':arrMask8x8, 'calQMask':calQMask8x8},
+    {'shape':(12,4,1), 'arrange':[], 'arrMask':[], 'calQMask':[]},
+    {'shape':(12,4,1), 'arrange':arrange12x4, 'arrMask':[], 'calQMask':[]},
+]
+
+def getData(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.2)
+    x[::10] = 0 # some empty events
+    return x.astype(np.float64)
+
+def getModel(pams):
+    m = denseCNN()
+    m.setpams(pams)
+    return m
+
+@pytest.mark.parametrize('pams', LAYOUTS)
+def test_prepInput(pams):
+    x = getData()
+    assert np.array_equal(getModel(pams).prepInput(x.copy()), prepInput(pams, x.copy()))
+
+@pytest.mark.parametrize('pams', LAYOUTS)
+def test_mapToCalQ(pams):
+    m = getModel(pams)
+    x = getData()
+    # an output of the model: arranged, with charges also in the masked locations
+    out = m.prepInput(x.copy()) + np.random.default_rng(1).random((500,)+pams['shape'])
+    assert np.array_equal(m.mapToCalQ(out.copy()), mapToCalQ(pams, out.copy()))
+    # arranged inputs go back to the calQ order
+    assert np.array_equal(m.mapToCalQ(m.prepInput(x.copy())), x)
+
+def test_invertArrange():
+    for pams in LAYOUTS:
+        if len(pams['arrange'])==0: continue
+        ref = invertArrange(pams['arrange'], pams['arrMask'], pams['calQMask'])
+        assert np.array_equal(getArrangePlan(pams['arrange'], pams['arrMask'], pams['calQMask']).remap, ref)
+    with pytest.raises(ValueError):
+        getArrangePlan(arrange8x8, arrMask8x8)
+
+def main():
+    x = getData(200000)
+    for pams in LAYOUTS:
+        if len(pams['arrange'])==0: continue
+        m = getModel(pams)
+        out = m.prepInput(x.copy()) + 1.
+        t0 = time.time()
+        prepInput(pams, x.copy())
+        mapToCalQ(pams, out.copy())
+        t1 = time.time()
+        m.prepInput(x.copy())
+        m.mapToCalQ(out.copy())
+        t2 = time.time()
+        print('{:10s} prepInput+mapToCalQ, 200k events: former {:7.3f}s  plan {:7.3f}s'.format(str(pams['shape']), t1-t0, t2-t1))
+    test_invertArrange()
+    for pams in LAYOUTS:
+        test_prepInput(pams)
+        test_mapToCalQ(pams)
+    print('arrangements match')
+
+if __name__ == "__main__":
+    main()
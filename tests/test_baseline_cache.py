@@ -0,0 +1,84 @@
+# check that the baseline cache reuses entries for the same validation data and settings only
+import numpy as np
+import tempfile
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import baselineCache
+from baselines import make_supercells
+
+def getData(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.3) * 1.
+
+def test_cache():
+    x = getData()
+    calls = []
+    def stc():
+        calls.append(1)
+        return make_supercells(x)
+    with tempfile.TemporaryDirectory() as cacheDir:
+        key = baselineCache.arrayHash(x)
+        baselineCache.clear()
+        a = baselineCache.cached(cacheDir, key, 'stc', {'stc16':True}, stc)
+        b = baselineCache.cached(cacheDir, key, 'stc', {'stc16':True}, stc)
+        assert len(calls)==1 and b is a
+        # a later run reads it back from cacheDir
+        baselineCache.clear()
+        c = baselineCache.cached(cacheDir, key, 'stc', {'stc16':True}, stc)
+        assert len(calls)==1 and np.array_equal(a,c)
+        # other settings or other data are new entries
+        baselineCache.cached(cacheDir, key, 'stc', {'stc16':False}, stc)
+        baselineCache.cached(cacheDir, baselineCache.arrayHash(getData(seed=1)), 'stc', {'stc16':True}, stc)
+        assert len(calls)==3
+        assert len(os.listdir(cacheDir))==3
+    baselineCache.clear()
+
+def test_memory_only():
+    x = getData()
+    calls = []
+    baselineCache.clear()
+    for i in range(3):
+        baselineCache.cached('', baselineCache.arrayHash(x), 'thr_lo', {'thr':1.35}, lambda: calls.append(1) or np.where(x>1.35,x,0))
+    assert len(calls)==1
+    baselineCache.clear()
+
+def test_hash():
+    x = getData()
+    assert baselineCache.arrayHash(x)==baselineCache.arrayHash(x.copy())
+    assert baselineCache.arrayHash(x)!=baselineCache.arrayHash(x.astype(np.float32))
+    assert baselineCache.arrayHash(x)!=baselineCache.arrayHash(x.reshape(-1,4,4,3))
+
+def test_memory_limit():
+    x = getData()
+    maxMemory = baselineCache.maxMemory
+    baselineCache.maxMemory = 2*x.nbytes
+    calls = []
+    def compute(i):
+        return lambda: calls.append(i) or x+i
+    baselineCache.clear()
+    try:
+        key = baselineCache.arrayHash(x)
+        for i in [0,1,0,2]:
+            baselineCache.cached('', key, 'out', {'i':i}, compute(i))
+        # 0 was used after 1, so 1 made room for 2
+        assert calls==[0,1,2] and len(baselineCache._memory)==2
+        baselineCache.cached('', key, 'out', {'i':0}, compute(0))
+        baselineCache.cached('', key, 'out', {'i':1}, compute(1))
+        assert calls==[0,1,2,1]
+        # entries over the limit are not kept
+        baselineCache.cached('', key, 'big', {}, lambda: np.zeros(3*len(x)*48))
+        assert len(baselineCache._memory)==2
+    finally:
+        baselineCache.maxMemory = maxMemory
+        baselineCache.clear()
+
+def main():
+    test_cache()
+    test_memory_only()
+    test_hash()
+    test_memory_limit()
+    print('cache ok')
+
+if __name__ == "__main__":
+    main()
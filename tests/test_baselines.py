@@ -0,0 +1,98 @@
+# compare the batched STC and BC baselines with the former per-event loops, and time both
+import numpy as np
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from baselines import STC4mask,STC16mask,make_supercells,best_choice
+
+# per-event loops as they were in train.py
+def make_supercells_loop(inQ, shareQ=False, stc16=True):
+    outQ = inQ.copy()
+    inshape = inQ[0].shape
+    for i in range(len(inQ)):
+        inFlat = inQ[i].flatten()
+        outFlat = outQ[i].flatten()
+        for sc in (STC16mask if stc16 else STC4mask):
+            # set max cell to sum
+            if shareQ:
+                mysum = np.sum( inFlat[sc] )
+                outFlat[sc]=mysum/4.
+            else:
+                ii = np.argmax( inFlat[sc] )
+                mysum = np.sum( inFlat[sc] )
+                outFlat[sc]=0
+                outFlat[sc[ii]]=mysum
+        outQ[i] = outFlat.reshape(inshape)
+    return outQ
+
+def best_choice_loop(inQ, n):
+    outQ = inQ.copy()
+    inshape = inQ[0].shape
+    for i in range(len(inQ)):
+        inFlat = inQ[i].flatten()
+        outFlat = outQ[i].flatten()
+        outFlat[np.argsort(outFlat)[:-n]]=0
+        # get indices of all but n largest Q, set elements to zero
+        outQ[i] = outFlat.reshape(inshape)
+    return outQ
+
+def getData(n=2000, seed=0, ties=True):
+    rng = np.random.default_rng(seed)
+    if ties:
+        x = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.3)
+    else:
+        x = rng.random((n,48)) * (rng.random((n,48))<0.3)
+    x[::10] = 0
+    return x.astype(np.float64)
+
+stcModes = [dict(shareQ=s, stc16=t) for s in [False,True] for t in [False,True]]
+
+def test_supercells():
+    x = getData()
+    for kw in stcModes:
+        assert np.array_equal(make_supercells_loop(x,**kw), make_supercells(x,**kw)), kw
+
+def test_supercells_shaped():
+    x = getData(300).reshape(-1,4,4,3)
+    for kw in stcModes:
+        assert np.array_equal(make_supercells_loop(x,**kw), make_supercells(x,**kw)), kw
+
+def test_best_choice():
+    x = getData(ties=False)
+    for n in [0,1,4,6,9,14,47,48]:
+        assert np.array_equal(best_choice_loop(x,n), best_choice(x,n)), n
+
+def test_best_choice_ties():
+    # with equal charges the kept cells may differ, but not the kept charges
+    x = getData()
+    for n in [4,6,9,14]:
+        ref = best_choice_loop(x,n)
+        new = best_choice(x,n)
+        assert np.array_equal(np.sort(ref,axis=1), np.sort(new,axis=1)), n
+        assert np.all((new==0) | (new==x)), n
+
+def main():
+    x = getData(100000)
+    for kw in stcModes:
+        t0 = time.time()
+        make_supercells_loop(x,**kw)
+        t1 = time.time()
+        make_supercells(x,**kw)
+        t2 = time.time()
+        print('make_supercells {:30s} loop {:7.3f}s  batched {:7.3f}s'.format(str(kw), t1-t0, t2-t1))
+    for n in [4,6,9,14]:
+        t0 = time.time()
+        best_choice_loop(x,n)
+        t1 = time.time()
+        best_choice(x,n)
+        t2 = time.time()
+        print('best_choice     {:30s} loop {:7.3f}s  batched {:7.3f}s'.format('n=%i'%n, t1-t0, t2-t1))
+    test_supercells()
+    test_supercells_shaped()
+    test_best_choice()
+    test_best_choice_ties()
+    print('outputs match')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# compare the batched metrics with the per-event versions of train.py, and time both
+import numpy as np
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import batchMetrics
+from emdEngine import hexCoords,HexSigmaX,HexSigmaY
+
+# per-event versions, as in train.py
+def cross_corr(x,y):
+    if (np.sum(x)==0): return -1.
+    if (np.sum(y)==0): return -0.5
+    cov = np.cov(x.flatten(),y.flatten())
+    std = np.sqrt(np.diag(cov))
+    stdsqr = np.multiply.outer(std, std)
+    corr = np.divide(cov, stdsqr, out=np.zeros_like(cov), where=(stdsqr!=0))
+    return corr[0,1]
+
+def ssd(x,y):
+    if (np.sum(x)==0): return -1.
+    if (np.sum(y)==0): return -0.5
+    if (np.sum(x)==0 or np.sum(y)==0): return 1.
+    ssd=np.sum(((x-y)**2).flatten())
+    ssd = ssd/(np.sum(x**2)*np.sum(y**2))**0.5
+    return ssd
+
+def d_weighted_mean(x, y):
+    if (np.sum(x)==0): return -1.
+    if (np.sum(y)==0): return -0.5
+    x = (1./x.sum() if x.sum() else 1.)*x.flatten()
+    y = (1./y.sum() if y.sum() else 1.)*y.flatten()
+    dx = hexCoords[:,0].dot(x-y)
+    dy = hexCoords[:,1].dot(x-y)
+    return np.sqrt(dx*dx+dy*dy)
+
+def get_rms(coords, weights):
+    mu_x = coords[:,0].dot(weights)
+    mu_y = coords[:,1].dot(weights)
+    sig2 = np.power((coords[:,0]-mu_x)/HexSigmaX, 2) \
+         + np.power((coords[:,1]-mu_y)/HexSigmaY, 2)
+    w2 = np.power(weights,2)
+    return np.sqrt(sig2.dot(w2))
+
+def d_weighted_rms(a, b):
+    if (np.sum(a)==0): return -1.
+    if (np.sum(b)==0): return -0.5
+    a = (1./a.sum() if a.sum() else 1.)*a.flatten()
+    b = (1./b.sum() if b.sum() else 1.)*b.flatten()
+    return get_rms(hexCoords,a) - get_rms(hexCoords,b)
+def d_abs_weighted_rms(a, b):
+    if (np.sum(a)==0): return -1.
+    if (np.sum(b)==0): return -0.5
+    return np.abs(d_weighted_rms(a, b))
+
+pairs = [
+    (cross_corr, batchMetrics.cross_corr),
+    (ssd, batchMetrics.ssd),
+    (d_weighted_mean, batchMetrics.d_weighted_mean),
+    (d_weighted_rms, batchMetrics.d_weighted_rms),
+    (d_abs_weighted_rms, batchMetrics.d_abs_weighted_rms),
+]
+
+def getData(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.2)
+    y = x * rng.random((n,48)) + rng.random((n,48)) * (rng.random((n,48))<0.1)
+    x[::10] = 0 # some empty inputs
+    y[5::10] = 0 # and empty outputs
+    x[7::10] = 0
+    x[7::10,3] = 5 # single-cell inputs, with zero variance
+    return x.astype(np.float64), y
+
+def loop(metric, x, y):
+    return np.array([metric(x[i],y[i]) for i in range(len(x))])
+
+def test_parity():
+    x,y = getData()
+    for ref,new in pairs:
+        r = loop(ref,x,y)
+        n = new(x,y)
+        assert n.shape==(len(x),)
+        assert np.allclose(r, n, rtol=1e-10, atol=1e-12), ref.__name__
+        assert np.all(n[::10]==-1.) and np.all(n[5::10]==-0.5), ref.__name__
+
+def test_float32():
+    x,y = getData(500)
+    y = y.astype(np.float32)
+    for ref,new in pairs:
+        assert np.allclose(loop(ref,x,y), new(x,y), rtol=1e-5, atol=1e-6), ref.__name__
+
+def test_shaped():
+    x,y = getData(200)
+    for ref,new in pairs:
+        assert np.allclose(loop(ref,x,y), new(x.reshape(-1,4,4,3),y.reshape(-1,4,4,3)), rtol=1e-10, atol=1e-12), ref.__name__
+
+def main():
+    x,y = getData(100000)
+    for ref,new in pairs:
+        t0 = time.time()
+        loop(ref,x,y)
+        t1 = time.time()
+        new(x,y)
+        t2 = time.time()
+        print('{:20s} loop {:7.3f}s  batched {:7.3f}s'.format(ref.__name__, t1-t0, t2-t1))
+    test_parity()
+    test_float32()
+    test_shaped()
+    print('metrics match')
+
+if __name__ == "__main__":
+    main()
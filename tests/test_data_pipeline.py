@@ -0,0 +1,112 @@
+# check the streamed training input, the in-memory evaluation events of train.py --stream and the lazy clones
+import numpy as np
+import pandas as pd
+import tempfile
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import dataLoader
+import dataPipeline
+from dataLoader import normalize
+from denseCNN import denseCNN
+
+PAMS = {'shape':(4,4,3), 'n_copy':2, 'occ_low':3, 'occ_hi':20}
+
+def getModel(pams=PAMS):
+    m = denseCNN()
+    m.setpams(pams)
+    return m
+
+def getData(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.2)
+    x[::10] = 0 # some empty events
+    return x.astype(np.float64)
+
+def writeInput(fname, x):
+    pd.DataFrame(x, columns=['CALQ_%i'%i for i in range(48)]).to_csv(fname, index=False)
+
+def test_stream_clones():
+    m = getModel()
+    with tempfile.TemporaryDirectory() as d:
+        fname = os.path.join(d,'input.csv')
+        writeInput(fname, getData())
+        # as train.py: the validation events in memory, the training events streamed with their clones
+        normdata,maxdata,sumdata = normalize(dataLoader.loadEvents(fname, 'val', chunksize=300))
+        val_input, val_ind = dataPipeline.evalInput(m, normdata)
+        ds = dataPipeline.streamDataset(m, fname, 'train', chunksize=300, shuffle_buffer=0)
+        ntrain = sum(len(x) for x,_ in ds)
+        train = np.concatenate(list(dataLoader.streamEvents(fname, 'train', chunksize=300)))
+    assert val_input.shape==(len(normdata),4,4,3)
+    assert np.array_equal(val_input.reshape(len(normdata),48), normdata)
+    assert len(maxdata[val_ind])==len(sumdata[val_ind])==len(val_input)
+    assert ntrain==len(m.prepInput(normalize(train)[0])) and ntrain>len(train)
+
+def test_evalOnly():
+    m = getModel()
+    with tempfile.TemporaryDirectory() as d:
+        fname = os.path.join(d,'input.csv')
+        writeInput(fname, getData())
+        data = dataLoader.loadEvents(fname, 'all', chunksize=300)
+    maxQ = data.max(axis=1)
+    normdata,maxdata,sumdata = normalize(data)
+    val_input, val_ind = dataPipeline.evalInput(m, normdata)
+    assert len(val_input)==len(data)==900
+    assert np.array_equal(maxdata[val_ind], maxQ)
+
+def batches(ds):
+    return [x.numpy() for x,_ in ds]
+
+## events as sorted cell charges, in a sorted order: equal for cell permutations of the same events
+def canonical(x):
+    x = np.sort(x.reshape(len(x),-1), axis=1)
+    return x[np.lexsort(x.T[::-1])]
+
+def test_lazyClone():
+    m = getModel()
+    normdata = normalize(getData())[0]
+    x = m.prepInput(normdata.copy(), clone=False)
+    ds = dataPipeline.arrayDataset(m, x, batch_size=100, lazyClone=True, seed=3)
+    first = batches(ds)
+    # the same seed gives the same batches, in a new dataset or not
+    for b0,b1 in zip(first, batches(dataPipeline.arrayDataset(m, x, batch_size=100, lazyClone=True, seed=3))):
+        assert np.array_equal(b0, b1)
+    assert not all(np.array_equal(b0, b1) for b0,b1 in zip(first, batches(ds)))
+    # every batch has its n_copy clones of the hi occ events, as the clones of prepInput
+    for b in first:
+        occ = np.count_nonzero(b[:100].reshape(-1,48), axis=1)
+        nsel = np.count_nonzero((occ>PAMS['occ_low']) & (occ<=PAMS['occ_hi']))
+        assert len(b)==100+PAMS['n_copy']*nsel
+    ref = m.prepInput(normdata.copy(), clone=True)
+    lazy = np.concatenate(first)
+    assert lazy.shape==ref.shape
+    assert np.array_equal(canonical(lazy), canonical(ref))
+
+def main():
+    m = getModel()
+    with tempfile.TemporaryDirectory() as d:
+        fname = os.path.join(d,'input.csv')
+        writeInput(fname, getData(200000))
+        t0 = time.time()
+        normdata = normalize(dataLoader.loadEvents(fname, 'train', chunksize=20000))[0]
+        nbatch = sum(1 for b in dataPipeline.arrayDataset(m, m.prepInput(normdata)))
+        t1 = time.time()
+        nstream = sum(1 for b in dataPipeline.streamDataset(m, fname, 'train', chunksize=20000))
+        t2 = time.time()
+    print('200k events, read and batched: in memory {:7.3f}s ({} batches)  streamed {:7.3f}s ({} batches)'.format(t1-t0, nbatch, t2-t1, nstream))
+    # an epoch with the clones made in memory or per batch
+    x = m.prepInput(normdata, clone=False)
+    t0 = time.time()
+    neager = sum(len(b) for b,_ in dataPipeline.arrayDataset(m, m.prepInput(normdata.copy(), clone=True)))
+    t1 = time.time()
+    nlazy = sum(len(b) for b,_ in dataPipeline.arrayDataset(m, x, lazyClone=True))
+    t2 = time.time()
+    print('epoch with n_copy={}: eager clones {:7.3f}s ({} events)  lazy clones {:7.3f}s ({} events)'.format(PAMS['n_copy'], t1-t0, neager, t2-t1, nlazy))
+    test_stream_clones()
+    test_evalOnly()
+    test_lazyClone()
+    print('streamed inputs and clones ok')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# compare the batched EMD engine with the per-event emd, and time both
+import numpy as np
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import emdEngine
+from emdEngine import emd,emd_batch,emd_sparse,emd_tree,treeCalibration
+
+def getData(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.2)
+    y = x * rng.random((n,48)) + rng.random((n,48)) * (rng.random((n,48))<0.1)
+    x[::10] = 0 # some empty inputs
+    y[5::10] = 0 # and empty outputs
+    return x.astype(np.float64), y.astype(np.float32)
+
+def getSparse(n=2000, seed=0):
+    # low occupancy on both sides, with some single-cell events
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.1)
+    y = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.1)
+    x[::7] = 0
+    x[::7,rng.integers(0,48)] = 50
+    y[3::7] = 0
+    y[3::7,rng.integers(0,48)] = 20
+    x[::10] = 0
+    return x.astype(np.float64), y.astype(np.float64)
+
+def loop(x, y, threshold=-1, f=emd):
+    return np.array([f(x[i],y[i],threshold) for i in range(len(x))])
+
+def test_serial():
+    x,y = getData()
+    vals = emd_batch(x, y)
+    assert vals.flags['C_CONTIGUOUS'] and vals.dtype==np.float64
+    assert np.array_equal(loop(x,y), vals)
+    assert np.all(vals[::10]==-1.) and np.all(vals[5::10]==-0.5)
+
+def test_workers():
+    x,y = getData()
+    assert np.array_equal(loop(x,y), emd_batch(x, y, workers=3, chunksize=100))
+
+def test_threshold():
+    x,y = getData(500)
+    with np.errstate(invalid='ignore'):
+        assert np.array_equal(loop(x,y,0.02), emd_batch(x, y, threshold=0.02), equal_nan=True)
+
+def test_shaped():
+    x,y = getData(200)
+    assert np.array_equal(loop(x,y), emd_batch(x.reshape(200,4,4,3), y.reshape(200,4,4,3)))
+
+def test_sparse():
+    for x,y in [getData(), getSparse()]:
+        ref = loop(x,y)
+        assert np.allclose(ref, loop(x,y,f=emd_sparse), rtol=1e-12, atol=1e-12)
+        assert np.array_equal(loop(x,y,f=emd_sparse), emd_batch(x, y, sparse=True, workers=2, chunksize=300))
+
+def test_tree():
+    for x,y in [getData(), getSparse()]:
+        exact = emd_batch(x, y)
+        tree  = emd_tree(x, y)
+        assert np.array_equal(tree[exact<0], exact[exact<0])
+        # tree paths are never shorter than the straight lines
+        assert np.all(tree[exact>=0] >= exact[exact>=0]-1e-9)
+        # a single cell moved to a neighbour in the same 2x2 supercell
+        a = np.zeros((1,48)); a[0,0] = 1
+        b = np.zeros((1,48)); b[0,1] = 1
+        assert np.isclose(emd_tree(a,b)[0], 2*emdEngine.treeWeights_48[[0,1]].mean())
+    calib = treeCalibration(*getData(500))
+    assert calib['n']==np.count_nonzero(emd_batch(*getData(500))>=0)
+    assert calib['spearman']>0.5
+
+def main():
+    x,y = getData(20000)
+    t0 = time.time()
+    ref = loop(x,y)
+    t1 = time.time()
+    print('per-event loop   {:7.3f}s'.format(t1-t0))
+    for workers in [1,4,-1]:
+        t0 = time.time()
+        vals = emd_batch(x, y, workers=workers)
+        t1 = time.time()
+        print('emd_batch({:2d})    {:7.3f}s'.format(workers, t1-t0))
+        assert np.array_equal(ref, vals)
+    print('outputs identical')
+    x,y = getSparse(20000)
+    for f in [emd, emd_sparse]:
+        t0 = time.time()
+        loop(x,y,f=f)
+        t1 = time.time()
+        print('{:16s} {:7.3f}s (low occupancy inputs and outputs)'.format(f.__name__, t1-t0))
+    x,y = getData(20000)
+    t0 = time.time()
+    emd_batch(x, y, sparse=True)
+    t1 = time.time()
+    print('emd_batch sparse {:7.3f}s'.format(t1-t0))
+    test_sparse()
+    print('sparse results match')
+    x,y = getData(1000000)
+    t0 = time.time()
+    emd_tree(x, y)
+    t1 = time.time()
+    print('emd_tree         {:7.3f}s for 1M events'.format(t1-t0))
+    test_tree()
+
+if __name__ == "__main__":
+    main()
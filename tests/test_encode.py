@@ -0,0 +1,72 @@
+# compare the array encode/decode with the scalar hgcal_encode, input_conversion/encode and utils versions, and time them
+import numpy as np
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','input_conversion'))
+import hgcal_encode
+import encode as roc_encode
+import utils
+
+SETTINGS = [(4,3),(5,4),(5,3),(5,5),(3,2),(16,16)]
+
+def getValues(seed=0):
+    rng = np.random.default_rng(seed)
+    powers = 1 << np.arange(40)
+    return np.unique(np.concatenate([np.arange(1<<14), powers-1, powers, powers+1,
+                                     rng.integers(0, 1<<22, 20000), rng.integers(0, 1<<40, 2000)]))
+
+def test_bit_length():
+    v = np.concatenate([getValues(), [(1<<53)-1, 1<<53, (1<<62)+5]])
+    ref = [len(bin(int(x)))-2 for x in v]
+    assert list(hgcal_encode.bit_length(v))==ref
+    assert list(hgcal_encode.bit_length(v[:-3]))==ref[:-3]
+
+def test_encode():
+    v = getValues()
+    for expBits, mantBits in SETTINGS:
+        for dropBits in [0,1,3]:
+            for roundBits in [False,True]:
+                ref = np.array([hgcal_encode.encode(int(x), dropBits, expBits, mantBits, roundBits, asInt=True) for x in v])
+                assert np.array_equal(hgcal_encode.encode_array(v, dropBits, expBits, mantBits, roundBits), ref)
+                if expBits==5 and mantBits==4 and dropBits==0 and not roundBits:
+                    # the sum encoding of the golden model
+                    ref = np.array([roc_encode.encode(int(x), dropBits, expBits, mantBits, roundBits, asInt=True) for x in v])
+                    assert np.array_equal(hgcal_encode.encode_array(v, dropBits, expBits, mantBits, roundBits), ref)
+
+def test_decode():
+    rng = np.random.default_rng(1)
+    for expBits, mantBits in SETTINGS:
+        ncodes = 1 << (expBits+mantBits)
+        codes = np.arange(ncodes) if ncodes <= (1<<12) else rng.integers(0, ncodes, 5000)
+        for droppedBits in [0,1,3]:
+            for edge, quarter in [(False,False),(True,False),(False,True)]:
+                ref = [hgcal_encode.decode(int(c), droppedBits, expBits, mantBits, edge, quarter) for c in codes]
+                assert list(hgcal_encode.decode_array(codes, droppedBits, expBits, mantBits, edge, quarter))==ref
+                assert list(hgcal_encode.decode_codes(codes, droppedBits, expBits, mantBits, edge, quarter))==ref
+    # the 7b and 9b tables
+    assert len(hgcal_encode.decode_lut(1,4,3))==128 and len(hgcal_encode.decode_lut(0,5,4))==512
+    assert list(hgcal_encode.decode_lut(0,5,4)) == [roc_encode.decode(c,0,5,4) for c in range(512)]
+
+def test_econ():
+    v = getValues()
+    ref = [utils.encode_ECON(int(x)) for x in v]
+    mantissa, exp = utils.encode_ECON_array(v)
+    assert np.array_equal(mantissa, [r[0] for r in ref]) and np.array_equal(exp, [r[1] for r in ref])
+    m, e = np.meshgrid(np.arange(1<<3), np.arange(1<<4))
+    ref = [utils.decode_ECON(int(a), int(b)) for a,b in zip(m.ravel(), e.ravel())]
+    assert np.array_equal(utils.decode_ECON_array(m.ravel(), e.ravel()), ref)
+
+def main():
+    rng = np.random.default_rng(0)
+    v = rng.integers(0, 1<<22, 1000000)
+    t0 = time.time()
+    ref = np.array([hgcal_encode.decode(hgcal_encode.encode(int(x), 0, 5, 4, asInt=True), 0, 5, 4) for x in v])
+    t1 = time.time()
+    out = hgcal_encode.decode_codes(hgcal_encode.encode_array(v, 0, 5, 4), 0, 5, 4)
+    t2 = time.time()
+    print('scalar: %.2f s, arrays: %.3f s, identical: %s'%(t1-t0, t2-t1, np.array_equal(out, ref)))
+
+if __name__ == "__main__":
+    main()
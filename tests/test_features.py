@@ -0,0 +1,38 @@
+# compare the per-event feature table and scaling with the former per-event computations
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import features
+
+def getData(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.3)
+    data[::10,0] = 1
+    return data.astype(np.float64)
+
+def test_table():
+    data = getData()
+    maxQ = data.max(axis=1)/35.
+    sumQ = data.sum(axis=1)/35.
+    t = features.featureTable(data, maxQ, sumQ, mip=35.)
+    assert len(t)==len(data)
+    assert np.array_equal(t['occupancy'].values, np.count_nonzero(data,axis=1))
+    assert np.array_equal(t['occupancy_1MT'].values, np.count_nonzero(data>35,axis=1))
+    assert np.array_equal(t['log10_maxQ'].values, np.log10(maxQ))
+    assert np.array_equal(t['log10_sumQ'].values, np.log10(sumQ))
+
+def test_perEvent():
+    data = getData()
+    sumQ = data.sum(axis=1)/35.
+    norm = (data/data.sum(axis=1,keepdims=True)).reshape(-1,4,4,3).astype(np.float32)
+    ref = np.array([norm[i]*sumQ[i] for i in range(0,len(norm))]) * 35.
+    assert np.array_equal(ref, features.perEvent(norm, sumQ) * 35.)
+
+def main():
+    test_table()
+    test_perEvent()
+    print('features match')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# compare the integer encoder with a float32 TF model quantized as qkeras does, and time both
+import numpy as np
+import tensorflow as tf
+import pickle
+import json
+import tempfile
+import time
+import sys
+import os
+import pytest
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import fixedPoint
+
+PAMS = {
+    'CNN_layer_nodes': [8], 'CNN_kernel_size': [3], 'CNN_pool': [False],
+    'Dense_layer_nodes': [], 'encoded_dim': 16, 'shape': [4, 4, 3],
+    'channels_first': False, 'activation': 'relu',
+    'nBits_input'  : {'total': 10, 'integer': 3, 'keep_negative': 1},
+    'nBits_accum'  : {'total': 11, 'integer': 3, 'keep_negative': 1},
+    'nBits_weight' : {'total':  5, 'integer': 1, 'keep_negative': 1},
+    'nBits_encod'  : {'total':  9, 'integer': 1, 'keep_negative': 0},
+}
+
+# quantized_bits(alpha=1) of qkeras, on float32 tensors
+def tfQuant(x, nBits):
+    m = 2.**(nBits['total']-nBits['keep_negative'])
+    m_i = 2.**nBits['integer']
+    xq = m_i * tf.clip_by_value(tf.round(x*m/m_i), -nBits['keep_negative']*m, m-1) / m
+    return x + tf.stop_gradient(-x + xq)
+
+def tfEncoder(pams, qweights, x):
+    wbits = pams['nBits_weight']
+    x = tfQuant(tf.constant(x, tf.float32), pams['nBits_input'])
+    for i in range(len(pams['CNN_layer_nodes'])):
+        k, b = qweights["conv2d_%i_m"%i]['weights']
+        x = tf.nn.relu(tf.nn.conv2d(x, k, 1, 'SAME') + b)
+        if pams['CNN_pool'][i]: x = tf.nn.max_pool2d(x, 2, 2, 'SAME')
+    x = tfQuant(x, pams['nBits_accum'])
+    x = tf.reshape(x, (x.shape[0], -1))
+    names = ["en_dense_%i"%i for i in range(len(pams['Dense_layer_nodes']))] + ['encoded_vector']
+    for name in names:
+        k, b = qweights[name]['weights']
+        x = tf.matmul(x, k) + b
+        if name!='encoded_vector' or pams['activation']=='relu': x = tf.nn.relu(x)
+    return tfQuant(x, pams['nBits_encod']).numpy()
+
+# random weights on the quantizer grid, as model_save_quantized_weights saves them
+def getWeights(pams, seed=0):
+    rng = np.random.default_rng(seed)
+    q = fixedPoint.QuantizedBits.fromPams(pams['nBits_weight'])
+    def rand(*shape):
+        return np.ldexp(rng.integers(q.min, q.max+1, size=shape), q.exponent).astype(np.float32)
+    qweights = {}
+    if pams.get('channels_first', False):
+        cin, h, w = pams['shape']
+    else:
+        h, w, cin = pams['shape']
+    for i, n in enumerate(pams['CNN_layer_nodes']):
+        k = pams['CNN_kernel_size'][i]
+        qweights["conv2d_%i_m"%i] = {'weights': [rand(k,k,cin,n), rand(n)]}
+        cin = n
+        if pams['CNN_pool'][i]: h, w = (h+1)//2, (w+1)//2
+    nin = h*w*cin
+    names = ["en_dense_%i"%i for i in range(len(pams['Dense_layer_nodes']))] + ['encoded_vector']
+    for name, n in zip(names, pams['Dense_layer_nodes']+[pams['encoded_dim']]):
+        qweights[name] = {'weights': [rand(nin,n)/8, rand(n)/8]}  # keep some codes below saturation
+        nin = n
+    for name in names:
+        qweights[name]['weights'] = [np.ldexp(np.round(np.ldexp(a, -q.exponent)), q.exponent).astype(np.float32)
+                                     for a in qweights[name]['weights']]
+    return qweights
+
+def getData(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.exponential(1., size=(n,48)) * (rng.random((n,48))<0.3)
+    x = x/np.maximum(x.sum(axis=1, keepdims=True), 1e-9)
+    x[::10] *= 20. # some saturating inputs
+    return x.astype(np.float32)
+
+def configs():
+    yield PAMS
+    yield dict(PAMS, CNN_layer_nodes=[8,4], CNN_kernel_size=[3,3], CNN_pool=[True,False], Dense_layer_nodes=[12])
+    yield dict(PAMS, CNN_kernel_size=[2], activation='linear', nBits_encod={'total': 9, 'integer': 2, 'keep_negative': 1})
+
+def test_roundShift():
+    ints = np.arange(-64, 64)
+    for shift in [1,2,3]:
+        ref = np.round(ints/2.**shift).astype(np.int64)
+        assert np.array_equal(fixedPoint._roundShift(ints, shift), ref)
+
+def test_encoder():
+    x = getData()
+    for pams in configs():
+        qweights = getWeights(pams)
+        enc = fixedPoint.FixedPointEncoder(pams, qweights)
+        out = enc.encode(x)
+        ref = tfEncoder(pams, qweights, x.reshape((-1,)+tuple(pams['shape'])))
+        assert np.array_equal(out, ref)
+        ints = enc.encode(x, asInt=True)
+        assert np.array_equal(np.ldexp(ints, enc.encod_q.exponent), ref)
+        assert ints.min()>=enc.encod_q.min and ints.max()<=enc.encod_q.max
+
+# the int64 path, for layers whose sums would not be exact in float64
+def test_int64():
+    class IntEncoder(fixedPoint.FixedPointEncoder):
+        maxExact = 0
+    x = getData(2000)
+    for pams in configs():
+        qweights = getWeights(pams)
+        enc = IntEncoder(pams, qweights)
+        assert enc.dtype==np.int64
+        assert np.array_equal(enc.encode(x), fixedPoint.FixedPointEncoder(pams, qweights).encode(x))
+
+def test_load():
+    qweights = getWeights(PAMS)
+    with tempfile.TemporaryDirectory() as d:
+        with open(os.path.join(d,'m_pams.json'),'w') as f: json.dump(PAMS, f)
+        with open(os.path.join(d,'encoder_m.pkl'),'wb') as f: pickle.dump(qweights, f)
+        enc = fixedPoint.FixedPointEncoder.load('m', d)
+    x = getData(100)
+    assert np.array_equal(enc.encode(x), fixedPoint.FixedPointEncoder(PAMS, qweights).encode(x))
+
+def test_errors():
+    with pytest.raises(ValueError):
+        fixedPoint.FixedPointEncoder(dict(PAMS, activation='sigmoid'), getWeights(PAMS))
+    qweights = getWeights(PAMS)
+    qweights['encoded_vector']['weights'][0] = qweights['encoded_vector']['weights'][0] + 0.01
+    with pytest.raises(ValueError):
+        fixedPoint.FixedPointEncoder(PAMS, qweights)
+
+# the same encoder by hand, in float64 (exact for these few bits): quantized_bits as
+# in its docstring, explicit 'same' convolutions and pooling, Flatten in the data format
+def quant(x, nBits):
+    m = 2.**(nBits['total']-nBits['keep_negative'])
+    m_i = 2.**nBits['integer']
+    return m_i * np.clip(np.round(x*m/m_i), -nBits['keep_negative']*m, m-1) / m
+
+def refEncoder(pams, qweights, x):
+    channels_first = pams.get('channels_first', False)
+    x = quant(x.astype(np.float64), pams['nBits_input'])
+    if channels_first: x = x.transpose(0,2,3,1)
+    for i in range(len(pams['CNN_layer_nodes'])):
+        k, b = qweights["conv2d_%i_m"%i]['weights']
+        kh, kw, cin, cout = k.shape
+        n, h, w, _ = x.shape
+        out = np.zeros((n, h, w, cout)) + b
+        for r in range(h):
+            for c in range(w):
+                for dr in range(kh):
+                    for dc in range(kw):
+                        rr, cc = r+dr-(kh-1)//2, c+dc-(kw-1)//2
+                        if 0<=rr<h and 0<=cc<w: out[:,r,c] += x[:,rr,cc].dot(k[dr,dc])
+        x = np.maximum(out, 0)
+        if pams['CNN_pool'][i]:
+            pooled = np.full((n, (h+1)//2, (w+1)//2, cout), -np.inf)
+            for r in range(h):
+                for c in range(w):
+                    pooled[:,r//2,c//2] = np.maximum(pooled[:,r//2,c//2], x[:,r,c])
+            x = pooled
+    x = quant(x, pams['nBits_accum'])
+    if channels_first: x = x.transpose(0,3,1,2)
+    x = x.reshape(len(x), -1)
+    names = ["en_dense_%i"%i for i in range(len(pams['Dense_layer_nodes']))] + ['encoded_vector']
+    for name in names:
+        k, b = qweights[name]['weights']
+        x = x.dot(k) + b
+        if name!='encoded_vector' or pams['activation']=='relu': x = np.maximum(x, 0)
+    return quant(x, pams['nBits_encod'])
+
+TINY = [
+    dict(PAMS, shape=[3,5,2], CNN_layer_nodes=[3], CNN_kernel_size=[3], CNN_pool=[True], encoded_dim=4),
+    dict(PAMS, shape=[2,3,5], channels_first=True, CNN_layer_nodes=[3], CNN_kernel_size=[3], CNN_pool=[True], encoded_dim=4),
+    dict(PAMS, shape=[2,4,3], channels_first=True, CNN_layer_nodes=[4,2], CNN_kernel_size=[2,3], CNN_pool=[False,False],
+         Dense_layer_nodes=[5], encoded_dim=4, activation='linear', nBits_encod={'total': 9, 'integer': 2, 'keep_negative': 1}),
+]
+
+@pytest.mark.parametrize('pams', TINY)
+@pytest.mark.parametrize('maxExact', [2**53, 1])
+def test_reference(pams, maxExact, monkeypatch):
+    # maxExact=1: the int64 path, as for layers whose sums would not be exact in float64
+    monkeypatch.setattr(fixedPoint.FixedPointEncoder, 'maxExact', maxExact)
+    qweights = getWeights(pams, seed=1)
+    enc = fixedPoint.FixedPointEncoder(pams, qweights)
+    assert enc.dtype==(np.int64 if maxExact==1 else np.float64)
+    x = getData(300)[:,:int(np.prod(pams['shape']))].reshape((-1,)+tuple(pams['shape']))*4
+    ints = enc._encodeInt(x)
+    assert ints.dtype==np.int64
+    ref = refEncoder(pams, qweights, x)
+    assert np.any(ref!=0) and np.array_equal(np.ldexp(ints, enc.encod_q.exponent), ref)
+
+# encoder outputs of real qkeras models, saved by tests/make_qkeras_vectors.py
+def test_qkerasVectors():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),'qkeras_vectors.pkl'),'rb') as f:
+        vectors = pickle.load(f)
+    for v in vectors:
+        enc = fixedPoint.FixedPointEncoder(v['pams'], v['qweights'])
+        assert np.any(v['encoded']!=0)
+        assert np.array_equal(enc.encode(v['input']), v['encoded'])
+
+# the real qkeras encoder, where qkeras is installed
+def test_qkeras():
+    pytest.importorskip('qkeras')
+    from qkeras.utils import model_save_quantized_weights
+    from qDenseCNN import qDenseCNN
+    m = qDenseCNN()
+    m.setpams(dict(PAMS, shape=(4,4,3)))
+    m.init(printSummary=False)
+    ae, en = m.get_models()
+    qweights = model_save_quantized_weights(en)
+    x = getData(5000)
+    ref = en.predict(x.reshape(-1,4,4,3))
+    assert np.array_equal(fixedPoint.FixedPointEncoder(PAMS, qweights).encode(x), ref)
+
+def main():
+    x = getData(200000)
+    qweights = getWeights(PAMS)
+    enc = fixedPoint.FixedPointEncoder(PAMS, qweights)
+    t0 = time.time()
+    ref = tfEncoder(PAMS, qweights, x.reshape(-1,4,4,3))
+    t1 = time.time()
+    out = enc.encode(x)
+    t2 = time.time()
+    print('TF: %.2f s, integer: %.2f s, identical: %s'%(t1-t0, t2-t1, np.array_equal(out, ref)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# compare the analytic FLOP counts with the TF profiler on the frozen graph, and time both
+import numpy as np
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from denseCNN import denseCNN
+import get_flops
+
+PAMS = [
+    {'shape':(4,4,3),'encoded_dim':16},
+    {'shape':(8,8,1),'encoded_dim':16,'CNN_layer_nodes':[8,4],'CNN_kernel_size':[3,3],'CNN_pool':[True,False],'CNN_padding':['same','same']},
+]
+
+def getModels(pams):
+    m = denseCNN()
+    m.setpams(pams)
+    m.init(printSummary=False)
+    return m.get_models()
+
+def test_flops():
+    for pams in PAMS:
+        ae, en = getModels(pams)
+        counts = get_flops.count_ops(en)
+        assert counts['flops']==get_flops.get_flops_from_model(en)
+        assert counts['params']==en.count_params()
+        assert counts['weight_bits']==32*en.count_params()
+        # the profiler also counts the 2 index multiplications of UpSampling2D
+        assert abs(get_flops.count_ops(ae)['flops']-get_flops.get_flops_from_model(ae))<=2
+
+def test_cache():
+    _, en1 = getModels(PAMS[0])
+    _, en2 = getModels(PAMS[0])
+    _, en3 = getModels(dict(PAMS[0],encoded_dim=8))
+    assert get_flops.architecture_hash(en1)==get_flops.architecture_hash(en2)
+    assert get_flops.architecture_hash(en1)!=get_flops.architecture_hash(en3)
+    assert get_flops.count_ops(en1) is get_flops.count_ops(en2)
+
+def test_quantizerBits():
+    assert get_flops._quantizerBits(None)==32
+    assert get_flops._quantizerBits({'class_name':'quantized_bits','config':{'bits':5,'integer':1}})==5
+    assert get_flops._quantizerBits('quantized_bits(6,2,1,alpha=1)')==6
+    assert get_flops._quantizerBits('quantized_bits(bits=7, integer=1)')==7
+
+def main():
+    ae, en = getModels(PAMS[1])
+    t0 = time.time()
+    ref = get_flops.get_flops_from_model(en)
+    t1 = time.time()
+    get_flops._cache.clear()
+    counts = get_flops.count_ops(en)
+    t2 = time.time()
+    print('profiler: %i flops in %.3f s, analytic: %i flops in %.4f s'%(ref,t1-t0,counts['flops'],t2-t1))
+    for l in counts['layers']: print(l)
+
+if __name__ == "__main__":
+    main()
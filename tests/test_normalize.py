@@ -0,0 +1,120 @@
+# compare the batched normalize/unnormalize with the former per-event loops, and time both
+import numpy as np
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from dataLoader import normalize,unnormalize,normalizeInt,toUint
+
+# per-event loops as they were in train.py (without numba, which ran them in object mode)
+def normalize_loop(data,rescaleInputToMax=False, sumlog2=True):
+    maxes =[]
+    sums =[]
+    sums_log2=[]
+    for i in range(len(data)):
+        maxes.append( data[i].max() )
+        sums.append( data[i].sum() )
+        sums_log2.append( 2**(np.floor(np.log2(data[i].sum()))) )
+        if sumlog2:
+            data[i] = 1.*data[i]/(sums_log2[-1] if sums_log2[-1] else 1.)
+        elif rescaleInputToMax:
+            data[i] = 1.*data[i]/(data[i].max() if data[i].max() else 1.)
+        else:
+            data[i] = 1.*data[i]/(data[i].sum() if data[i].sum() else 1.)
+    if sumlog2:
+        return  data,np.array(maxes),np.array(sums_log2)
+    else:
+        return data,np.array(maxes),np.array(sums)
+
+def unnormalize_loop(norm_data,maxvals,rescaleOutputToMax=False, sumlog2=True):
+    for i in range(len(norm_data)):
+        if rescaleOutputToMax:
+            norm_data[i] =  norm_data[i] * maxvals[i] / (norm_data[i].max() if norm_data[i].max() else 1.)
+        else:
+            # the loop used to overwrite the sumlog2 flag here, switching to the plain sum after an empty event
+            if sumlog2:
+                s = 2**(np.floor(np.log2(norm_data[i].sum())))
+                norm_data[i] =  norm_data[i] * maxvals[i] / (s if s else 1.)
+            else:
+                norm_data[i] =  norm_data[i] * maxvals[i] / (norm_data[i].sum() if norm_data[i].sum() else 1.)
+    return norm_data
+
+def getData(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0,300,size=(n,48)) * (rng.random((n,48))<0.2)
+    data[::10] = 0 # some empty events
+    return data.astype(np.float64)
+
+modes = [dict(sumlog2=True), dict(sumlog2=False,rescaleInputToMax=True), dict(sumlog2=False)]
+outModes = [dict(sumlog2=True), dict(rescaleOutputToMax=True), dict(sumlog2=False)]
+
+def test_normalize():
+    data = getData(2000)
+    for kw in modes:
+        ref = normalize_loop(data.copy(), **kw)
+        new = normalize(data.copy(), **kw)
+        for r,n in zip(ref,new):
+            assert np.array_equal(r,n), kw
+
+def test_normalize_shaped():
+    data = getData(500)
+    ref = normalize_loop(data.copy().reshape(500,4,4,3))
+    new = normalize(data.copy().reshape(500,4,4,3))
+    for r,n in zip(ref,new):
+        assert np.array_equal(r,n)
+
+def test_unnormalize():
+    data = getData(2000)
+    # use events with charge only, see comment in unnormalize_loop
+    data = data[data.sum(axis=1)>0]
+    norm,maxes,sums = normalize(data.copy())
+    output = norm * np.random.default_rng(1).random(norm.shape)
+    for kw in outModes:
+        vals = maxes if kw.get('rescaleOutputToMax') else sums
+        ref = unnormalize_loop(output.copy(), vals, **kw)
+        new = unnormalize(output.copy(), vals, **kw)
+        assert np.array_equal(ref,new), kw
+
+def test_float32():
+    data = getData(2000).astype(np.float32)
+    ref = normalize_loop(data.copy())
+    new = normalize(data.copy())
+    for r,n in zip(ref,new):
+        assert np.allclose(r,n,rtol=1e-6,atol=0)
+
+def test_normalizeInt():
+    # the integer charges of --intCharges, normalized in chunks as in one float32 array
+    data = toUint(getData(2000))
+    for kw in modes:
+        ref = normalize(data.astype(np.float32), **kw)
+        new = normalizeInt(data, chunksize=300, **kw)
+        assert new[0].dtype==np.float32
+        for r,n in zip(ref,new):
+            assert np.array_equal(r,n), kw
+
+def main():
+    data = getData(100000)
+    for kw in modes:
+        t0 = time.time()
+        normalize_loop(data.copy(), **kw)
+        t1 = time.time()
+        normalize(data.copy(), **kw)
+        t2 = time.time()
+        print('normalize   {:45s} loop {:7.3f}s  batched {:7.3f}s'.format(str(kw), t1-t0, t2-t1))
+    norm,maxes,sums = normalize(data.copy())
+    for kw in outModes:
+        t0 = time.time()
+        unnormalize_loop(norm.copy(), sums, **kw)
+        t1 = time.time()
+        unnormalize(norm.copy(), sums, **kw)
+        t2 = time.time()
+        print('unnormalize {:45s} loop {:7.3f}s  batched {:7.3f}s'.format(str(kw), t1-t0, t2-t1))
+    test_normalize()
+    test_normalize_shaped()
+    test_unnormalize()
+    test_float32()
+    test_normalizeInt()
+    print('outputs identical')
+
+if __name__ == "__main__":
+    main()
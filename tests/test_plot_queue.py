@@ -0,0 +1,96 @@
+# check that deferred plots are drawn in the directory they were submitted from, serially or in a pool,
+# from a saved spec file, and time the deferred rendering against drawing the plots one by one
+import numpy as np
+import tempfile
+import pytest
+import timeit
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import plotQueue
+
+def submitPlots(n, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        vals = rng.exponential(2.,size=10000)
+        plotQueue.submit(plotQueue.renderHist, vals, 'hist%i'%i, './hist%i.pdf'%i, stats=(vals.mean(),vals.std()))
+        x = np.arange(10.)
+        plotQueue.submit(plotQueue.renderProfile, x, x, 0.1*x, 0.2*x, 'prof%i'%i, './prof%i.pdf'%i)
+        plotQueue.submit(plotQueue.renderOverlay, [('a',[x,x,0.1*x]),('b',[x,2*x,0.1*x])], 'ovl%i'%i, './ovl%i.pdf'%i)
+
+def expected(n):
+    return sorted('%s%i.pdf'%(p,i) for p in ['hist','prof','ovl'] for i in range(n))
+
+def runDeferred(workers, n=2):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        plotQueue.defer(True)
+        submitPlots(n)
+        plotQueue.defer(False)
+        assert plotQueue.pending()==3*n and os.listdir(d)==[]
+        # render from another directory: plots still land where they were submitted
+        os.chdir(cwd)
+        plotQueue.render(workers)
+        assert plotQueue.pending()==0
+        assert sorted(os.listdir(d))==expected(n)
+
+def test_immediate():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        submitPlots(1)
+        os.chdir(cwd)
+        assert sorted(os.listdir(d))==expected(1)
+
+def test_deferred():
+    runDeferred(1)
+
+def test_pool():
+    runDeferred(2)
+
+def test_specFile():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        plotQueue.defer(True)
+        submitPlots(1)
+        plotQueue.defer(False)
+        fname = os.path.join(d,'plots.pkl')
+        plotQueue.save(fname)
+        os.chdir(cwd)
+        assert plotQueue.pending()==3
+        plotQueue.clear()
+        plotQueue.renderFile(fname, 2)
+        assert sorted(os.listdir(d))==sorted(expected(1)+['plots.pkl'])
+
+def test_saveAndRender():
+    # as train.py with --plotSpecs and without --noRender: the saved plots are also drawn
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)
+        plotQueue.defer(True)
+        submitPlots(1)
+        plotQueue.defer(False)
+        plotQueue.save(os.path.join(d,'plots.pkl'))
+        os.chdir(cwd)
+        plotQueue.render(1)
+        assert plotQueue.pending()==0
+        assert sorted(os.listdir(d))==sorted(expected(1)+['plots.pkl'])
+
+def test_submitOther():
+    # only the render functions of plotQueue are found when rendering the specs
+    plotQueue.defer(True)
+    try:
+        with pytest.raises(ValueError):
+            plotQueue.submit(np.histogram, np.arange(10))
+        assert plotQueue.pending()==0
+    finally:
+        plotQueue.defer(False)
+
+def main():
+    for workers in [1,2,4]:
+        print('workers %i: %.2f s'%(workers, timeit.timeit(lambda: runDeferred(workers, n=8), number=1)))
+
+if __name__ == "__main__":
+    main()
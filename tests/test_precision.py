@@ -7,7 +7,7 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 sys.path.append("/home/therwig/data/sandbox/hgcal/Ecoder/")
-from hgcal_encode import encode,decode
+from hgcal_encode import encode,decode,encode_array,decode_codes
 
 @numba.jit
 def normalize(data,rescaleInputToMax=False):
@@ -46,7 +46,7 @@ def test():
         data.describe()
     else:
         #data = pd.read_csv(inFileName,dtype=np.float64, header=0, usecols=[*range(1, 49)])
-        data = pd.read_csv(inFileName,dtype=np.float64, header=0, usecols=[*range(1, 49)],nrows=1000)
+        data = pd.read_csv(inFileName,dtype=np.float64, header=0, usecols=[*range(1, 49)])
 
     # (3) find the module sum with “full” 27/25b precision (21/19b per TC * 48 TC)
     # (4) find the AE input fractions using on the “full" precision 27/25b values
@@ -56,31 +56,31 @@ def test():
     # The inputs from the CSV files are already encoded and decoded
     #
     # (1) perform 4E+3M ROC TC encoding to 7b
-    #data_encoded = np.array([encode(int(x),expBits=4,mantBits=3,asInt=True) for x in data.to_numpy().flatten()]).reshape(normdata.shape)
+    #data_encoded = encode_array(data.to_numpy().astype(np.int64),expBits=4,mantBits=3)
     # (2) perform ECON TC decoding to 21/19 bits
-    #data_decoded = np.array([decode(x,expBits=4,mantBits=3) for x in data_encoded.flatten()]).reshape(normdata.shape)
+    #data_decoded = decode_codes(data_encoded,expBits=4,mantBits=3)
 
     results={}
     for sum_exp, sum_mant in [(5,3),(5,4),(5,5),(16,16)]:
         for frac_bits in [4,5,6,7,8,10,12,16]:
 
             # (5) encode the sum with 5E+3M, 5E+4M, and 5E+5M
-            sum_encoded = np.array([encode(int(x),expBits=sum_exp,mantBits=sum_mant,asInt=True) for x in sumdata])
+            sum_encoded = encode_array(sumdata.astype(np.int64),expBits=sum_exp,mantBits=sum_mant)
         
             # (6) encode the fractions with 4,5,…,8b 
             #normdata_encoded = np.array([encode_fraction(x,nBits=5) for x in normdata])
             normdata_encoded = encode_fraction(normdata,nBits=frac_bits)
         
             # (g) PART I: decode the sum and fractions ...
-            sum_decoded = np.array([decode(x,expBits=sum_exp,mantBits=sum_mant) for x in sum_encoded])
+            sum_decoded = decode_codes(sum_encoded,expBits=sum_exp,mantBits=sum_mant).astype(np.float64)
             normdata_decoded = decode_fraction(normdata_encoded,nBits=frac_bits)
 
             # the decorded fractions may not sum to 1, so we can re-normalize
-            renormdata_size = np.array([(normdata_decoded[i].sum()) for i in range(len(normdata_decoded))])
-            renormdata_decoded = np.array([normdata_decoded[i]/(normdata_decoded[i].sum()) for i in range(len(normdata_decoded))])
+            renormdata_size = normdata_decoded.sum(axis=1)
+            renormdata_decoded = normdata_decoded/renormdata_size[:,None]
 
             # (g) PART II: ... and multiply to find the value of each TC
-            data_decoded_from_norm = np.array([normdata_decoded[i]*sum_decoded[i] for i in range(len(sum_decoded))])
+            data_decoded_from_norm = normdata_decoded*sum_decoded[:,None]
 
             results[(sum_exp, sum_mant, frac_bits,1)] = renormdata_size
 
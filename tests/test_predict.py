@@ -0,0 +1,66 @@
+# compare the single-pass denseCNN.predict with separate autoencoder and encoder predictions, and time both
+import numpy as np
+import pytest
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from denseCNN import denseCNN
+
+CONFIGS = [
+    {'shape':(4,4,3), 'encoded_dim':16},
+    {'shape':(3,4,4), 'encoded_dim':8, 'channels_first':True},
+    {'shape':(8,8,1), 'encoded_dim':12, 'CNN_layer_nodes':[8,4], 'CNN_kernel_size':[3,3],
+     'CNN_pool':[True,False], 'CNN_padding':['same','same'], 'Dense_layer_nodes':[16]},
+]
+
+def getModel(pams):
+    m = denseCNN()
+    m.setpams(pams)
+    m.init(printSummary=False)
+    return m
+
+@pytest.mark.parametrize('pams', CONFIGS)
+@pytest.mark.parametrize('batch_size', [None, 7])
+def test_predict(pams, batch_size):
+    m = getModel(pams)
+    x = np.random.default_rng(0).random((200,)+pams['shape']).astype(np.float32)
+    inputs, decoded, encoded = m.predict(x, batch_size)
+    assert inputs is x
+    assert decoded.shape==(200,)+pams['shape']
+    assert encoded.shape==(200,pams['encoded_dim'],1)
+    assert np.allclose(decoded, m.autoencoder.predict(x, batch_size=batch_size), rtol=1e-5, atol=1e-6)
+    assert np.allclose(encoded[:,:,0], m.encoder.predict(x, batch_size=batch_size), rtol=1e-5, atol=1e-6)
+    # built once, until the encoder and decoder are rebuilt
+    inference = m.get_inference_model()
+    assert m.get_inference_model() is inference
+    m.init(printSummary=False)
+    assert m.get_inference_model() is not inference
+
+## best of n runs, single timings have outliers
+def bestTime(f, n=3):
+    times = []
+    for i in range(n):
+        t0 = time.time()
+        f()
+        times.append(time.time()-t0)
+    return min(times)
+
+def main():
+    m = getModel(CONFIGS[0])
+    x = np.random.default_rng(0).random((200000,4,4,3)).astype(np.float32)
+    def separate():
+        m.autoencoder.predict(x, batch_size=5000, verbose=0)
+        m.encoder.predict(x, batch_size=5000, verbose=0)
+    separate()
+    m.predict(x[:100])
+    t0 = bestTime(separate)
+    t1 = bestTime(lambda: m.predict(x, 5000))
+    print('200k events: autoencoder+encoder {:7.3f}s  single pass {:7.3f}s'.format(t0, t1))
+    for pams in CONFIGS:
+        for batch_size in [None, 7]:
+            test_predict(pams, batch_size)
+    print('predictions match')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# compare the sort-based binned quantiles with scipy.stats.binned_statistic, as plotProfile used it, and time both
+import numpy as np
+import scipy.stats
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import profiles
+
+# the former plotProfile statistics
+def binnedQuantiles(x, y, nbins=40, lims=None):
+    if lims==None: lims = (x.min(),x.max())
+    median_result = scipy.stats.binned_statistic(x, y, bins=nbins, range=lims, statistic=lambda x: np.quantile(x,0.5))
+    lo_result     = scipy.stats.binned_statistic(x, y, bins=nbins, range=lims, statistic=lambda x: np.quantile(x,0.5-0.68/2))
+    hi_result     = scipy.stats.binned_statistic(x, y, bins=nbins, range=lims, statistic=lambda x: np.quantile(x,0.5+0.68/2))
+    return np.array([lo_result.statistic, median_result.statistic, hi_result.statistic])
+
+def getData(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    occ = rng.integers(0,30,size=n).astype(np.float64)
+    maxQ = np.log10(1+rng.exponential(20,size=n))
+    vals = rng.exponential(1.,size=n) * (1+occ/10)
+    vals[::7] = -1. # sentinels
+    vals[3::11] = 0.
+    return occ, maxQ, vals
+
+def test_profiles():
+    occ, maxQ, vals = getData()
+    for x,nbins,lims in [(occ,12,(0,24)),(maxQ,20,(0,2.5)),(maxQ,15,None),(occ,40,None)]:
+        ref = binnedQuantiles(x, vals, nbins, lims)
+        new = profiles.Profile(x, vals, nbins, lims).quantiles()
+        assert np.array_equal(ref, new, equal_nan=True), (nbins,lims)
+
+def test_slices():
+    occ, maxQ, vals = getData()
+    prof = profiles.Profile(maxQ, vals, 20, (0,2.5))
+    occ_bins = [0,2,5,10,15]
+    masks = [(occ>=lo) & (occ<(occ_bins[i+1] if i+1<len(occ_bins) else 9e99)) for i,lo in enumerate(occ_bins)]
+    new = prof.sliceQuantiles(masks)
+    for mask,q in zip(masks,new):
+        ref = binnedQuantiles(maxQ[mask], vals[mask], 20, (0,2.5))
+        assert np.array_equal(ref, q, equal_nan=True)
+    # an empty slice
+    assert np.all(np.isnan(prof.quantiles(occ<0)))
+
+def main():
+    occ, maxQ, vals = getData(1000000)
+    occ_bins = [0,2,5,10,15]
+    masks = [(occ>=lo) & (occ<(occ_bins[i+1] if i+1<len(occ_bins) else 9e99)) for i,lo in enumerate(occ_bins)]
+    t0 = time.time()
+    binnedQuantiles(maxQ, vals, 20, (0,2.5))
+    for mask in masks: binnedQuantiles(maxQ[mask], vals[mask], 20, (0,2.5))
+    t1 = time.time()
+    prof = profiles.Profile(maxQ, vals, 20, (0,2.5))
+    prof.quantiles()
+    prof.sliceQuantiles(masks)
+    t2 = time.time()
+    print('profile + {} slices, 1M events: binned_statistic {:7.3f}s  sorted {:7.3f}s'.format(len(masks), t1-t0, t2-t1))
+    test_profiles()
+    test_slices()
+    print('quantiles identical')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# compare the fused telescope losses with the original ones (values and gradients), and time both
+import numpy as np
+import tensorflow as tf
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import telescope
+
+pairs = [
+    (telescope.telescopeMSE2,   telescope.telescopeMSE2F,   48),
+    (telescope.telescopeMSE443, telescope.telescopeMSE443F, 48),
+    (telescope.telescopeMSE663, telescope.telescopeMSE663F, 108),
+    (telescope.telescopeMSE8x8, telescope.telescopeMSE8x8F, 64),
+]
+
+def getData(n=500, n_in=48, seed=0):
+    rng = np.random.default_rng(seed)
+    y_true = rng.random((n,n_in)) * (rng.random((n,n_in))<0.3)
+    y_pred = rng.random((n,n_in)) * 0.1
+    return tf.constant(y_true, tf.float32), tf.constant(y_pred, tf.float32)
+
+def lossAndGrad(fn, y_true, y_pred):
+    y_pred = tf.Variable(y_pred)
+    with tf.GradientTape() as tape:
+        loss = fn(y_true, y_pred)
+        total = tf.reduce_mean(loss)
+    return loss.numpy(), tape.gradient(total, y_pred).numpy()
+
+def test_values():
+    for ref, fused, n_in in pairs:
+        y_true, y_pred = getData(n_in=n_in)
+        assert np.allclose(ref(y_true,y_pred).numpy(), fused(y_true,y_pred).numpy(), rtol=1e-5, atol=1e-7), fused.__name__
+
+def test_gradients():
+    for ref, fused, n_in in pairs:
+        y_true, y_pred = getData(n_in=n_in)
+        l0,g0 = lossAndGrad(ref, y_true, y_pred)
+        l1,g1 = lossAndGrad(fused, y_true, y_pred)
+        assert np.allclose(l0, l1, rtol=1e-5, atol=1e-7), fused.__name__
+        assert np.allclose(g0, g1, rtol=1e-4, atol=1e-9), fused.__name__
+
+def test_shapes():
+    # the models call the loss with the arranged (N,4,4,3) images
+    y_true, y_pred = getData()
+    y_true, y_pred = tf.reshape(y_true,(-1,4,4,3)), tf.reshape(y_pred,(-1,4,4,3))
+    assert telescope.telescopeMSE2F(y_true,y_pred).shape==(500,)
+    assert np.allclose(telescope.telescopeMSE2(y_true,y_pred).numpy(), telescope.telescopeMSE2F(y_true,y_pred).numpy(), rtol=1e-5, atol=1e-7)
+
+def bench(fn, y_true, y_pred, n=200):
+    y_pred = tf.Variable(y_pred)
+    @tf.function
+    def step():
+        with tf.GradientTape() as tape:
+            total = tf.reduce_mean(fn(y_true, y_pred))
+        return tape.gradient(total, y_pred)
+    step()
+    t0 = time.time()
+    for i in range(n): step()
+    return (time.time()-t0)/n
+
+def main():
+    for ref, fused, n_in in pairs:
+        y_true, y_pred = getData(n_in=n_in)
+        t0 = bench(ref, y_true, y_pred)
+        t1 = bench(fused, y_true, y_pred)
+        print('{:18s} loss+grad, batch of 500: {:7.3f}ms   fused {:7.3f}ms'.format(ref.__name__, 1e3*t0, 1e3*t1))
+    test_values()
+    test_gradients()
+    test_shapes()
+    print('losses and gradients match')
+
+if __name__== "__main__":
+    main()
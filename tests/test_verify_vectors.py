@@ -0,0 +1,75 @@
+# compare the verification vector writer with np.savetxt, check the fixed-point/hex/binary outputs, and time them
+import numpy as np
+import tempfile
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import verifyVectors
+
+nBits_input = {'total': 10, 'integer': 3, 'keep_negative': 1}
+nBits_encod = {'total':  9, 'integer': 1, 'keep_negative': 0}
+
+def getData(n=5000, ncol=48, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.exponential(0.1, size=(n,ncol)) * (rng.random((n,ncol))<0.3)
+    x[::7] *= -100.
+    return x.astype(np.float32)
+
+def read(fname):
+    with open(fname) as f: return f.read()
+
+def test_float():
+    x = getData()
+    with tempfile.TemporaryDirectory() as d:
+        ref = os.path.join(d,'ref.csv')
+        np.savetxt(ref, x, delimiter=",", fmt='%.12f')
+        for workers in [1,2]:
+            name = os.path.join(d,'v%i'%workers)
+            verifyVectors.writeVectors(name, x, chunksize=777, workers=workers)
+            assert read(name+'.csv')==read(ref)
+        # floats whatever the format, without a quantizer
+        verifyVectors.writeVectors(os.path.join(d,'h'), x, fmt='hex')
+        assert read(os.path.join(d,'h.csv'))==read(ref)
+
+def test_fixed():
+    x = getData()
+    codes = verifyVectors.toFixed(x, nBits_input)
+    with tempfile.TemporaryDirectory() as d:
+        name = os.path.join(d,'int')
+        meta = verifyVectors.writeVectors(name, x, fmt='int', nBits=nBits_input, binary=True, chunksize=1000, workers=2)
+        assert np.array_equal(np.loadtxt(name+'.csv', delimiter=',', dtype=np.int64), codes)
+        assert np.array_equal(verifyVectors.readBinary(name), codes)
+        assert meta['dtype']=='<i2' and meta['exponent']==-6
+        assert np.all(codes*2.**meta['exponent']==np.clip(np.round(x*64)/64, -8, 8-1/64))
+
+        name = os.path.join(d,'hex')
+        meta = verifyVectors.writeVectors(name, x, fmt='hex', nBits=nBits_input)
+        rows = [l.split(',') for l in read(name+'.csv').splitlines()]
+        assert all(len(v)==3 for r in rows for v in r)
+        hexcodes = np.array([[int(v,16) for v in r] for r in rows])
+        # two's complement in 12 bits
+        assert np.array_equal(np.where(hexcodes>=2**11, hexcodes-2**12, hexcodes), codes)
+
+        name = os.path.join(d,'encod')
+        meta = verifyVectors.writeVectors(name, getData(100,16)/100., fmt='hex', nBits=nBits_encod, binary=True)
+        assert meta['dtype']=='<i2' and meta['hexDigits']==3
+        assert verifyVectors.readBinary(name).min()>=0
+
+def main():
+    x = getData(80000)
+    with tempfile.TemporaryDirectory() as d:
+        t0 = time.time()
+        np.savetxt(os.path.join(d,'ref.csv'), x, delimiter=",", fmt='%.12f')
+        t1 = time.time()
+        print('np.savetxt: %.2f s'%(t1-t0))
+        for workers in [1,4]:
+            t1 = time.time()
+            verifyVectors.writeVectors(os.path.join(d,'v'), x, workers=workers)
+            t2 = time.time()
+            verifyVectors.writeVectors(os.path.join(d,'i'), x, fmt='int', nBits=nBits_input, binary=True, workers=workers)
+            t3 = time.time()
+            print('workers %i: float %.2f s, int+bin %.2f s'%(workers, t2-t1, t3-t2))
+
+if __name__ == "__main__":
+    main()
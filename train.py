@@ -29,49 +29,32 @@ from dense2DkernelCNN import dense2DkernelCNN
 import ot
 import graphUtil
 import plotWafer
-from get_flops import get_flops_from_model
+from get_flops import count_ops
+import dataLoader
+import dataPipeline
+from dataLoader import normalize,unnormalize
+import emdEngine
+import batchMetrics
+import baselineCache
+import profiles
+import features
+import accumulators
+import plotQueue
+import verifyVectors
+from baselines import STC4mask,STC16mask,make_supercells,best_choice
+from emdEngine import hexCoords,HexSigmaX,HexSigmaY,hexMetric,MAXDIST,emd
 
 
 def double_data(data):
+    # integer charges are summed in 64 bits, their sums may not fit the stored type
+    intCharges = np.issubdtype(data.dtype, np.integer)
+    if intCharges: data = data.astype(np.int64)
     doubled=[]
     i=0
     while i<= len(data)-2:
         doubled.append( data[i] + data[i+1] )
         i+=2
-    return np.array(doubled)
-
-@numba.jit
-def normalize(data,rescaleInputToMax=False, sumlog2=True):
-    maxes =[]
-    sums =[]
-    sums_log2=[]
-    for i in range(len(data)):
-        maxes.append( data[i].max() )
-        sums.append( data[i].sum() )
-        sums_log2.append( 2**(np.floor(np.log2(data[i].sum()))) )
-        if sumlog2:
-            data[i] = 1.*data[i]/(sums_log2[-1] if sums_log2[-1] else 1.)
-        elif rescaleInputToMax:
-            data[i] = 1.*data[i]/(data[i].max() if data[i].max() else 1.)
-        else:
-            data[i] = 1.*data[i]/(data[i].sum() if data[i].sum() else 1.)
-    if sumlog2:
-        return  data,np.array(maxes),np.array(sums_log2)
-    else:
-        return data,np.array(maxes),np.array(sums)
-
-@numba.jit
-def unnormalize(norm_data,maxvals,rescaleOutputToMax=False, sumlog2=True):
-    for i in range(len(norm_data)):
-        if rescaleOutputToMax:
-            norm_data[i] =  norm_data[i] * maxvals[i] / (norm_data[i].max() if norm_data[i].max() else 1.)
-        else:
-            if sumlog2:
-                sumlog2 = 2**(np.floor(np.log2(norm_data[i].sum())))
-                norm_data[i] =  norm_data[i] * maxvals[i] / (sumlog2 if sumlog2 else 1.)
-            else:
-                norm_data[i] =  norm_data[i] * maxvals[i] / (norm_data[i].sum() if norm_data[i].sum() else 1.)
-    return norm_data
+    return dataLoader.toUint(np.array(doubled)) if intCharges else np.array(doubled)
 
 def StringToTextFile(fname,s):
     with open(fname,'w') as f:
@@ -79,28 +62,14 @@ def StringToTextFile(fname,s):
 
 def plotHist(vals,name,odir='.',xtitle="",ytitle="",nbins=40,lims=None,
              stats=True, logy=False, leg=None):
-    plt.figure(figsize=(6,4))
-    if leg:
-        n, bins, patches = plt.hist(vals, nbins, range=lims, label=leg)
-    else:
-        n, bins, patches = plt.hist(vals, nbins, range=lims)
-    # print('bins',bins)
-    # print('n',n)
-    ax = plt.gca()
-    plt.text(0.1, 0.9, name,transform=ax.transAxes)
-    if stats:
-        mu = np.mean(vals)
-        std = np.std(vals)
-        plt.text(0.1, 0.8, r'$\mu=%.3f,\ \sigma=%.3f$'%(mu,std),transform=ax.transAxes)
-    plt.xlabel(xtitle)
-    plt.ylabel(ytitle if ytitle else 'Entries')
-    if logy: plt.yscale('log')
+    mu = np.mean(vals)
+    std = np.std(vals)
     pname = odir+"/"+name+".pdf"
-    print("Saving "+pname)
     tname = pname.replace('.pdf','.txt')
-    StringToTextFile(tname, "{}, {}, {}, \t {}, {}, \n".format(np.quantile(vals,0.5), np.quantile(vals,0.5-0.68/2), np.quantile(vals,0.5+0.68/2), np.mean(vals), np.std(vals)))
-    plt.savefig(pname)
-    plt.close()
+    StringToTextFile(tname, "{}, {}, {}, \t {}, {}, \n".format(np.quantile(vals,0.5), np.quantile(vals,0.5-0.68/2), np.quantile(vals,0.5+0.68/2), mu, std))
+    # drawn now, or later with the deferred plots (--deferPlots)
+    plotQueue.submit(plotQueue.renderHist, vals, name, pname, xtitle=xtitle, ytitle=ytitle, nbins=nbins, lims=lims,
+                     stats=(mu,std) if stats else None, logy=logy, leg=leg)
     return
 
 def getWeights(vals, n=None, a=None, b=None):
@@ -127,78 +96,40 @@ def getWeights(vals, n=None, a=None, b=None):
 
 
 def plotProfile(x,y,name,odir='.',xtitle="",ytitle="Entries",nbins=40,lims=None,
-                stats=True, logy=False, leg=None, text=""):
-
-    #median_result = scipy.stats.binned_statistic(x, y, bins=nbins, statistic='median')
-    if lims==None: lims = (x.min(),x.max())
-    median_result = scipy.stats.binned_statistic(x, y, bins=nbins, range=lims, statistic=lambda x: np.quantile(x,0.5))
-    lo_result     = scipy.stats.binned_statistic(x, y, bins=nbins, range=lims, statistic=lambda x: np.quantile(x,0.5-0.68/2))
-    hi_result     = scipy.stats.binned_statistic(x, y, bins=nbins, range=lims, statistic=lambda x: np.quantile(x,0.5+0.68/2))
-    median = np.nan_to_num(median_result.statistic)
-    hi = np.nan_to_num(hi_result.statistic)
-    lo = np.nan_to_num(lo_result.statistic)
+                stats=True, logy=False, leg=None, text="", profile=None):
+
+    # profile: precomputed (bin_centers, lo, median, hi), e.g. from profiles.Profile.stats
+    if profile is None:
+        profile = profiles.Profile(x, y, nbins=nbins, lims=lims).stats()
+    bin_centers, lo, median, hi = profile
+    median = np.nan_to_num(median)
+    hi = np.nan_to_num(hi)
+    lo = np.nan_to_num(lo)
     hie = hi-median
     loe = median-lo
-    bin_edges = median_result.bin_edges
-    bin_centers = (bin_edges[:-1] + bin_edges[1:])/2.
 
     # means_result = scipy.stats.binned_statistic(x, [y, y**2], bins=nbins, statistic='mean')
     # means, means2 = means_result.statistic
     # standard_deviations = np.sqrt(means2 - means**2)
     # bin_edges = means_result.bin_edges
     # bin_centers = (bin_edges[:-1] + bin_edges[1:])/2.
-    
-    plt.figure(figsize=(6,4))
-    plt.errorbar(x=bin_centers, y=median, yerr=[loe,hie], linestyle='none', marker='.', label=leg)
 
     printstr=""
     for i,b in enumerate(bin_centers):
         printstr += "{} {} {} {} \n".format(b, median[i], loe[i], hie[i])
 
-    ax = plt.gca()
-    plt.text(0.1, 0.9, name,transform=ax.transAxes)
-    if text: plt.text(0.1, 0.82, text.replace('MAX','inf'), transform=ax.transAxes)
-    plt.xlabel(xtitle)
-    plt.ylabel(ytitle)
-    if logy: plt.yscale('log')
     pname = odir+"/"+name+".pdf"
-    print("Saving "+pname)
     tname = pname.replace('.pdf','.txt')
     StringToTextFile(tname, printstr)
-    plt.savefig(pname)
-    plt.close()
+    plotQueue.submit(plotQueue.renderProfile, bin_centers, median, loe, hie, name, pname,
+                     xtitle=xtitle, ytitle=ytitle, logy=logy, leg=leg, text=text)
 #    return bin_centers, means, standard_deviations
     return bin_centers, median, [loe,hie]
 
 def OverlayPlots(results, name, xtitle="",ytitle="Entries",odir='.',text="",ylim=None):
     #print('overlay: ',name)
-    centers = results[0][1][0]
-    wid = centers[1]-centers[0]
-    offset = 0.33*wid
-
-    plt.figure(figsize=(6,4))
-
-    for ir,r in enumerate(results):
-        lab = r[0]
-        dat = r[1]
-        off = offset * (ir-1)/2 * (-1. if ir%2 else 1.) # .1 left, .1 right, .2 left, ...
-        plt.errorbar(x=dat[0]+off, y=dat[1], yerr=dat[2], label=lab)
-        #plt.errorbar(x=r[0], y=r[1], yerr=r[2], linestyle='none', marker='.', label=leg)
-
-    ax = plt.gca()
-    plt.text(0.1, 0.9, name, transform=ax.transAxes)
-    if text: plt.text(0.1, 0.82, text.replace('MAX','inf'), transform=ax.transAxes)
-    if ylim is not None:
-        plt.ylim(ylim[0],ylim[1])
-    plt.xlabel(xtitle)
-    plt.ylabel(ytitle)
-    plt.legend(loc='upper right')
-    #if logy: plt.yscale('log')
     pname = odir+"/"+name+".pdf"
-    print("Saving "+pname)
-    plt.savefig(pname)
-    plt.close()
-
+    plotQueue.submit(plotQueue.renderOverlay, results, name, pname, xtitle=xtitle, ytitle=ytitle, text=text, ylim=ylim)
     return
 
 def split(shaped_data, validation_frac=0.2,randomize=False):
@@ -228,7 +159,14 @@ def train(autoencoder,encoder,train_input,train_target,val_input,name,n_epochs=1
 
     es = callbacks.EarlyStopping(monitor='val_loss', mode='min', verbose=1, patience=3)
     #reduce_lr = callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5,patience=3)
-    if train_weights != None:
+    if isinstance(train_input, tf.data.Dataset):
+        # streamed input, batching and shuffling are done by the pipeline
+        history = autoencoder.fit(train_input,
+                                  epochs=n_epochs,
+                                  validation_data=(val_input,val_input),
+                                  callbacks=[es]
+        )
+    elif train_weights != None:
         history = autoencoder.fit(train_input,train_target,
                                   #sample_weight=train_weights,
                                   epochs=n_epochs,
@@ -311,49 +249,6 @@ def ssd(x,y):
     ssd = ssd/(np.sum(x**2)*np.sum(y**2))**0.5
     return ssd
 
-# calculate "earth mover's distance"
-# (cost, in distance, to move earth from one config to another)
-hexCoords = np.array([ 
-    [0.0, 0.0], [0.0, -2.4168015], [0.0, -4.833603], [0.0, -7.2504044], 
-    [2.09301, -1.2083969], [2.09301, -3.6251984], [2.09301, -6.042], [2.09301, -8.458794], 
-    [4.18602, -2.4168015], [4.18602, -4.833603], [4.18602, -7.2504044], [4.18602, -9.667198], 
-    [6.27903, -3.6251984], [6.27903, -6.042], [6.27903, -8.458794], [6.27903, -10.875603], 
-    [-8.37204, -10.271393], [-6.27903, -9.063004], [-4.18602, -7.854599], [-2.0930138, -6.6461945], 
-    [-8.37204, -7.854599], [-6.27903, -6.6461945], [-4.18602, -5.4377975], [-2.0930138, -4.229393], 
-    [-8.37204, -5.4377975], [-6.27903, -4.229393], [-4.18602, -3.020996], [-2.0930138, -1.8125992], 
-    [-8.37204, -3.020996], [-6.27903, -1.8125992], [-4.18602, -0.6042023], [-2.0930138, 0.6042023], 
-    [4.7092705, -12.386101], [2.6162605, -11.177696], [0.5232506, -9.969299], [-1.5697594, -8.760895], 
-    [2.6162605, -13.594498], [0.5232506, -12.386101], [-1.5697594, -11.177696], [-3.6627693, -9.969299], 
-    [0.5232506, -14.802895], [-1.5697594, -13.594498], [-3.6627693, -12.386101], [-5.7557793, -11.177696], 
-    [-1.5697594, -16.0113], [-3.6627693, -14.802895], [-5.7557793, -13.594498], [-7.848793, -12.386101]])
-
-#normalize so that distance between small cells (there are 4 per TC) is 1
-oneHexCell = 0.5 * 2.4168015
-#oneHexCell = 0.5 * np.min(ot.dist(hexCoords[:16],hexCoords[:16],'euclidean'))
-hexCoords = hexCoords / oneHexCell
-# for later normalization
-HexSigmaX = np.std(hexCoords[:,0]) 
-HexSigmaY = np.std(hexCoords[:,1])
-# pairwise distances
-hexMetric = ot.dist(hexCoords, hexCoords, 'euclidean')
-MAXDIST = np.max(hexMetric)
-def emd(_x, _y, threshold=-1):
-    if (np.sum(_x)==0): return -1.
-    if (np.sum(_y)==0): return -0.5
-    x = np.array(_x, dtype=np.float64)
-    y = np.array(_y, dtype=np.float64)
-    x = (1./x.sum() if x.sum() else 1.)*x.flatten()
-    y = (1./y.sum() if y.sum() else 1.)*y.flatten()
-
-    if threshold > 0:
-        # only keep entries above 2%, e.g.
-        x = np.where(x>threshold,x,0)
-        y = np.where(y>threshold,y,0)
-        x = 1.*x/x.sum()
-        y = 1.*y/y.sum()
-
-    return ot.emd2(x, y, hexMetric)
-
 def d_weighted_mean(x, y):
     if (np.sum(x)==0): return -1.
     if (np.sum(y)==0): return -0.5
@@ -383,51 +278,14 @@ def d_abs_weighted_rms(a, b):
     if (np.sum(b)==0): return -0.5
     return np.abs(d_weighted_rms(a, b))
 
-STC4mask = np.array([
-    [ 0,  1,  4,  5], #indices for 1 super trigger cell
-    [ 2,  3,  6,  7],
-    [ 8,  9, 12, 13],
-    [10, 11, 14, 15],
-    [16, 17, 20, 21],
-    [18, 19, 22, 23],
-    [24, 25, 28, 29],
-    [26, 27, 30, 31],
-    [32, 33, 36, 37],
-    [34, 35, 38, 39],
-    [40, 41, 44, 45],
-    [43, 43, 46, 47]])
-STC16mask = np.array(range(16))
-STC16mask = np.array([STC16mask,STC16mask+16,STC16mask+32])
-
-def make_supercells(inQ, shareQ=False, stc16=True):
-    outQ = inQ.copy()
-    inshape = inQ[0].shape
-    for i in range(len(inQ)):
-        inFlat = inQ[i].flatten()
-        outFlat = outQ[i].flatten()
-        for sc in (STC16mask if stc16 else STC4mask):
-            # set max cell to sum
-            if shareQ:
-                mysum = np.sum( inFlat[sc] )
-                outFlat[sc]=mysum/4.
-            else:
-                ii = np.argmax( inFlat[sc] )
-                mysum = np.sum( inFlat[sc] )
-                outFlat[sc]=0
-                outFlat[sc[ii]]=mysum
-        outQ[i] = outFlat.reshape(inshape)
-    return outQ
-
-def best_choice(inQ, n):
-    outQ = inQ.copy()
-    inshape = inQ[0].shape
-    for i in range(len(inQ)):
-        inFlat = inQ[i].flatten()
-        outFlat = outQ[i].flatten()
-        outFlat[np.argsort(outFlat)[:-n]]=0
-        # get indices of all but n largest Q, set elements to zero
-        outQ[i] = outFlat.reshape(inshape)
-    return outQ
+## batched versions of the metrics above, used by evalModel
+batchMetric = {
+    cross_corr        :batchMetrics.cross_corr,
+    ssd               :batchMetrics.ssd,
+    d_weighted_mean   :batchMetrics.d_weighted_mean,
+    d_weighted_rms    :batchMetrics.d_weighted_rms,
+    d_abs_weighted_rms:batchMetrics.d_abs_weighted_rms,
+}
 
 # unused
 # def threshold(_x, cut):
@@ -455,36 +313,9 @@ def visDisplays(index,input_Q,input_calQ,decoded_Q,encoded_Q=np.array([]),conv2d
     inputImgCalQ= input_calQ[index]
     outputImg   = decoded_Q[index]
 
-  
-    fig, axs = plt.subplots(3, Nevents, figsize=(16, 10))
-    for i in range(Nevents):
-        if i==0:
-            axs[0,i].set(xlabel='',ylabel='cell_y',title='Input_%i'%i)
-        else:
-            axs[0,i].set(xlabel='',title='Input_%i'%i)       
-        plotWafer.plotWafer( inputImgCalQ[i], fig, axs[0,i])
-            
-    for i in range(Nevents):
-        if i==0:
-            axs[1,i].set(xlabel='cell_x',ylabel='cell_y',title='CNN Ouput_%i'%i)        
-        else:
-            axs[1,i].set(xlabel='cell_x',title='CNN Ouput_%i'%i)
-        plotWafer.plotWafer( outputImg[i], fig, axs[1,i])
-
-    if len(encoded_Q):
-        encodedImg  = encoded_Q[index]
-        for i in range(0,Nevents):
-            if i==0:
-                axs[2,i].set(xlabel='latent dim',ylabel='depth',title='Encoded_%i'%i)
-            else:
-                axs[2,i].set(xlabel='latent dim',title='Encoded_%i'%i)
-            c1=axs[2,i].imshow(encodedImg[i])
-            if i==Nevents:
-                plt.colorbar(c1,ax=axs[2,i])
-            
-    #plt.tight_layout()
-    plt.savefig("%s_examples.pdf"%name)
-    plt.close()
+    encodedImg  = encoded_Q[index] if len(encoded_Q) else np.array([])
+
+    plotQueue.submit(plotQueue.renderDisplays, inputImgCalQ, outputImg, encodedImg, "%s_examples.pdf"%name)
 
     #if conv2d is not None:
     #    actImg      = conv2d.predict(inputImg.reshape(Nevents,4,4,3))
@@ -516,8 +347,8 @@ def visMetric(input_Q,decoded_Q,metric,name,odir,skipPlot=False):
     plt.savefig("hist_Qfr_%s.pdf"%name)
     plt.close()
 
-    input_Q_abs   = np.array([input_Q[i] * maxQ[i] for i in range(0,len(input_Q))])
-    decoded_Q_abs = np.array([decoded_Q[i]*maxQ[i] for i in range(0,len(decoded_Q))])
+    input_Q_abs   = features.perEvent(input_Q, maxQ)
+    decoded_Q_abs = features.perEvent(decoded_Q, maxQ)
 
     nonzeroQs = np.count_nonzero(input_Q_abs.reshape(len(input_Q_abs),48),axis=1)
     occbins = [0,5,10,20,48]
@@ -558,6 +389,36 @@ def GetBitsString(In, Accum, Weight, Encoded, Dense=False, Conv=False):
 
 def sumTCQ(x): return x.reshape(len(x),48).sum(axis=1)
 
+def makeModel(model,weights_f=None,printSummary=True):
+    if weights_f is None: weights_f = model['ws']
+    if model['isQK']:
+        m = qDenseCNN(weights_f=weights_f)
+        print ("m is a qDenseCNN")
+        #m.extend = True # for extra inputs
+    elif model['isDense2D']:
+        m = dense2DkernelCNN(weights_f=weights_f)
+        print ("m is a dense2DkernelCNN")
+    else:
+        m = denseCNN(weights_f=weights_f)
+        print ("m is a denseCNN")
+    m.setpams(model['pams'])
+    m.init(printSummary)
+    return m
+
+## encoder size against the --maxFlops/--maxPams budget, before any training
+## (the counts are cached by architecture, and reused by evalModel)
+def withinBudget(model,options):
+    counts = count_ops(makeModel(model,weights_f='',printSummary=False).get_models()[1])
+    print('%s: encoder flops = %i, macs = %i, pams = %i, weight bits = %i'%(
+        model['name'],counts['flops'],counts['macs'],counts['params'],counts['weight_bits']))
+    if options.maxFlops>0 and counts['flops']>options.maxFlops:
+        print('Skipping %s: %i flops over the budget of %i'%(model['name'],counts['flops'],options.maxFlops))
+        return False
+    if options.maxPams>0 and counts['params']>options.maxPams:
+        print('Skipping %s: %i parameters over the budget of %i'%(model['name'],counts['params'],options.maxPams))
+        return False
+    return True
+
 def buildmodels(options,pam_updates):
     arrange8x8 = np.array([
         28,29,30,31,0,4,8,12,
@@ -740,6 +601,8 @@ def buildmodels(options,pam_updates):
         if options.loss:
             m['pams']['loss'] = options.loss
         print(m)
+    if options.maxFlops>0 or options.maxPams>0:
+        models = [m for m in models if withinBudget(m,options)]
     return models
 
 def compareModels(models,perf_dict,eval_settings,options):
@@ -759,7 +622,7 @@ def compareModels(models,perf_dict,eval_settings,options):
     logTotTitle =eval_settings["logTotTitle"]
 
 
-    summary_entries=['name','en_pams','tot_pams','en_flops']
+    summary_entries=['name','en_pams','tot_pams','en_flops','en_macs','en_weight_bits']
     for algname in algnames:
         for mname in metrics:
             name = mname+"_"+algname
@@ -806,6 +669,22 @@ def compareModels(models,perf_dict,eval_settings,options):
     print(summary)
 
 
+def computeMetric(metric,input_calQ,alg_out,options):
+    if metric is emd and options.treeEMD:
+        return emdEngine.emd_tree(input_calQ,alg_out)
+    if metric is emd:
+        return emdEngine.emd_batch(input_calQ,alg_out,workers=options.emdWorkers,sparse=options.sparseEMD)
+    if metric in batchMetric:
+        return batchMetric[metric](input_calQ,alg_out)
+    return np.array([metric(input_calQ[i],alg_out[i]) for i in range(0,len(input_calQ))])
+
+## the options computeMetric depends on, for the baseline cache
+def metricSettings(metric,options):
+    settings = {'fn':metric.__name__}
+    if metric is emd:
+        settings.update(treeEMD=options.treeEMD, sparseEMD=options.sparseEMD)
+    return settings
+
 def evalModel(model,charges,aux_arrs,eval_settings,options):
 
     ### input arrays
@@ -830,6 +709,8 @@ def evalModel(model,charges,aux_arrs,eval_settings,options):
     #ae_out_frac = normalize(cnn_deQ.copy())
     ### axilliary arrays with shapes 
     occupancy_1MT = aux_arrs['occupancy_1MT']
+    val_features  = aux_arrs['features']
+    log10_maxQ    = val_features['log10_maxQ'].values
 
     # visualize conv2d activations
     if not model['isQK']:
@@ -868,14 +749,25 @@ def evalModel(model,charges,aux_arrs,eval_settings,options):
                   'zero_frac':'zero fraction',}
 
     print("Running non-AE algorithms")
+    # the baselines and their metrics only depend on the validation inputs: reuse them across models
+    alg_settings = {}
     if options.AEonly:
         alg_outs = {'ae' : ae_out}
     else:
-        thr_lo_Q = np.where(input_Q_abs>1.35,input_Q_abs,0) # 1.35 transverse MIPs
-        #stc_Q = make_supercells(input_Q_abs, stc16=(options.nElinks!=5))
-        stc_Q = make_supercells(input_Q_abs, stc16=True)
+        dataKey = baselineCache.arrayHash(input_Q_abs, input_calQ)
         nBC={2:4, 3:6, 4:9, 5:14} #4, 6, 9, 14 (for 2,3,4,5 e-links)
-        bc_Q = best_choice(input_Q_abs, nBC[options.nElinks]) 
+        alg_settings = {
+            'thr_lo': {'thr':1.35},
+            'stc'   : {'stc16':True, 'shareQ':False},
+            'bc'    : {'n':nBC[options.nElinks]},
+        }
+        thr_lo_Q = baselineCache.cached(options.baselineCache, dataKey, 'thr_lo', alg_settings['thr_lo'],
+                                        lambda: np.where(input_Q_abs>1.35,input_Q_abs,0)) # 1.35 transverse MIPs
+        #stc_Q = make_supercells(input_Q_abs, stc16=(options.nElinks!=5))
+        stc_Q = baselineCache.cached(options.baselineCache, dataKey, 'stc', alg_settings['stc'],
+                                     lambda: make_supercells(input_Q_abs, stc16=True))
+        bc_Q = baselineCache.cached(options.baselineCache, dataKey, 'bc', alg_settings['bc'],
+                                    lambda: best_choice(input_Q_abs, nBC[options.nElinks]))
         alg_outs = {
             'ae' : ae_out,
             'stc': stc_Q,
@@ -897,24 +789,29 @@ def evalModel(model,charges,aux_arrs,eval_settings,options):
 
     model_name = model['name']
     plots={}
+    en_counts = count_ops(model['m_autoCNNen'])
     summary_dict = {
         'name':model_name,
         'en_pams' : model['m_autoCNNen'].count_params(),
-        'en_flops' : get_flops_from_model(model['m_autoCNNen']),
+        'en_flops' : en_counts['flops'],
+        'en_macs' : en_counts['macs'],
+        'en_weight_bits' : en_counts['weight_bits'],
         'tot_pams': model['m_autoCNN'].count_params(),
     }
-    if (not options.skipPlot): plotHist(np.log10(val_sum.flatten()),
+    if (not options.skipPlot): plotHist(val_features['log10_sumQ'].values,
                                         "sumQ_validation",xtitle=logTotTitle,ytitle="Entries",
                                         stats=True,logy=True,nbins=chglog_nbins,lims = chglog_range)
-    if (not options.skipPlot): plotHist([np.log10(val_max.flatten())],
+    if (not options.skipPlot): plotHist([log10_maxQ],
                                         "maxQ_validation",xtitle=logMaxTitle,ytitle="Entries",
                                         stats=True,logy=True,nbins=chglog_nbins,lims = chglog_range)
 
     if (not options.skipPlot):
-        for ilayer in range(0,len(model['m_autoCNNen'].layers)):
-            label = model['m_autoCNNen'].layers[ilayer].name
-            output,bins = np.histogram(graphUtil.layerOutput(model['m_autoCNNen'],ilayer,input_Q).flatten(),50)
-            plots['hist_output_%s'%ilayer] = output,bins,label
+        # output ranges of all encoder layers, in one pass over the inputs
+        layerStats = graphUtil.activationStats(model['m_autoCNNen'],input_Q,batch_size=options.predictBatch,nBins=50)
+        for ilayer,s in enumerate(layerStats):
+            plots['hist_output_%s'%ilayer] = s.hist.counts,s.hist.edges(),s.name
+        with open('activations.json','w') as f:
+            f.write(json.dumps({s.name:s.summary() for s in layerStats},indent=4))
 
     # compute metrics for each alg
     for algname, alg_out in alg_outs.items():
@@ -943,32 +840,46 @@ def evalModel(model,charges,aux_arrs,eval_settings,options):
             print('  '+mname)
             name = mname+"_"+algname
             if (algname =='ae' and mname=='EMD'):
+                if options.treeEMD and options.treeCalib>0:
+                    # tree EMD against the exact EMD, once per model on the AE outputs
+                    emdEngine.printCalibration(emdEngine.treeCalibration(input_calQ,alg_out,options.treeCalib,options.emdWorkers))
                 #vals = np.array([metric(input_Q_abs[i],alg_out[i]) for i in range(0,len(input_Q_abs))])
-                vals = np.array([metric(input_calQ[i],alg_out[i]) for i in range(0,len(input_Q_abs))])
+                vals = computeMetric(metric,input_calQ,alg_out,options)
                 #low_index = (np.where(vals<np.quantile(vals,0.1)))[0]
                 #print("np.quantile(vals,0.1) =",np.quantile(vals,0.1))
                 #print("EMD: input calQ[1] =",np.round(input_calQ[low_index[0]],3))
                 #print("EMD: output Q[1] =",np.round(alg_out[low_index[0]],3))
                 #print("EMD: metric Q[1] =",metric(input_calQ[low_index[0]],alg_out[low_index[0]]))
+            elif algname in alg_settings:
+                settings = dict(alg_settings[algname], metric=mname, **metricSettings(metric,options))
+                vals = baselineCache.cached(options.baselineCache, dataKey, name, settings,
+                                            lambda: computeMetric(metric,input_calQ,alg_out,options))
             else:
                 #vals = np.array([metric(input_Q_abs[i],alg_out[i]) for i in range(0,len(input_Q_abs))])
-                vals = np.array([metric(input_calQ[i],alg_out[i]) for i in range(0,len(input_Q_abs))])
+                vals = computeMetric(metric,input_calQ,alg_out,options)
             model[name]        = np.round(np.mean(vals), 3)
             model[name+'_err'] = np.round(np.std(vals), 3)
             summary_dict[name]        = model[name]
             summary_dict[name+'_err'] = model[name+'_err']
+            if options.saveAccumulators:
+                # mergeable summary of vals, see accumulators.py
+                accumulators.accumulate(vals, lims=accumulators.metricLims.get(mname,(-1.,20.))).save("acc_"+name+".npz")
             if(not options.skipPlot) and (not('zero_frac' in mname)):
                 # metric distribution
                 plotHist(vals,"hist_"+name,xtitle=longMetric[mname])
                 plotHist(vals[vals>-1e-9],"hist_nonzero_"+name,xtitle=longMetric[mname])
                 plotHist(np.where(vals>-1e-9,1,0),"hist_iszero_"+name,xtitle=longMetric[mname])
-                # 1d profiles
+                # 1d profiles, the events are sorted once per profile and reused for the slices below
+                occProfile = profiles.Profile(occupancy_1MT, vals, nbins=occ_nbins, lims=occ_range)
+                chgProfile = profiles.Profile(log10_maxQ, vals, nbins=chglog_nbins, lims=chglog_range)
                 plots["occ_"+name] = plotProfile(occupancy_1MT, vals,"profile_occ_"+name,
                                                  nbins=occ_nbins, lims=occ_range,
-                                                 xtitle=occTitle,ytitle=longMetric[mname])
-                plots["chg_"+name] = plotProfile(np.log10(val_max), vals,"profile_maxQ_"+name,ytitle=longMetric[mname],
+                                                 xtitle=occTitle,ytitle=longMetric[mname],
+                                                 profile=occProfile.stats())
+                plots["chg_"+name] = plotProfile(log10_maxQ, vals,"profile_maxQ_"+name,ytitle=longMetric[mname],
                                                  nbins=chglog_nbins, lims=chglog_range,
-                                                 xtitle=logMaxTitle if options.rescaleInputToMax else logTotTitle)
+                                                 xtitle=logMaxTitle if options.rescaleInputToMax else logTotTitle,
+                                                 profile=chgProfile.stats())
                 #plotHist(vals[val_max<1],"hist_0chg1_"+name,xtitle=longMetric[mname])
                 #plotHist(vals[val_max<2],"hist_0chg2_"+name,xtitle=longMetric[mname])
                 #plotHist(vals[val_max<5],"hist_0chg5_"+name,xtitle=longMetric[mname])
@@ -986,11 +897,12 @@ def evalModel(model,charges,aux_arrs,eval_settings,options):
                     occ_hi_s = 'MAX' if iocc+1==len(occ_bins) else str(occ_hi)
                     indices = (occupancy_1MT >= occ_lo) & (occupancy_1MT < occ_hi)
                     pname = "chg_{}occ{}_{}".format(occ_lo,occ_hi_s,name)
-                    plots[pname] = plotProfile(np.log10(val_max[indices]), vals[indices],"profile_"+pname,
+                    plots[pname] = plotProfile(log10_maxQ[indices], vals[indices],"profile_"+pname,
                                                xtitle=logMaxTitle,
                                                nbins=chglog_nbins, lims=chglog_range,
                                                ytitle=longMetric[mname],
-                                               text="{} <= occupancy < {}".format(occ_lo,occ_hi_s,name))
+                                               text="{} <= occupancy < {}".format(occ_lo,occ_hi_s,name),
+                                               profile=chgProfile.stats(indices))
                     #plotHist(vals[indices].flatten(),"hist_{}_{}occ{}".format(mname,occ_lo,occ_hi_s),
                     #                           xtitle=longMetric[mname],
                     #                           nbins=chglog_nbins, lims=None,
@@ -1000,13 +912,14 @@ def evalModel(model,charges,aux_arrs,eval_settings,options):
                 for ichg, chg_lo in enumerate(chg_bins):
                     chg_hi = 9e99 if ichg+1==len(chg_bins) else chg_bins[ichg+1]
                     chg_hi_s = 'MAX' if ichg+1==len(chg_bins) else str(chg_hi)
-                    indices = (val_max >= chg_lo) & (val_max < chg_hi)
+                    indices = (val_features['maxQ'].values >= chg_lo) & (val_features['maxQ'].values < chg_hi)
                     pname = "occ_{}chg{}_{}".format(chg_lo,chg_hi_s,name)
                     plots[pname] = plotProfile(occupancy_1MT[indices], vals[indices],"profile_"+pname,
                                                xtitle=occTitle,
                                                ytitle=longMetric[mname],
                                                nbins=occ_nbins, lims=occ_range,
-                                               text="{} <= Max Q < {}".format(chg_lo,chg_hi_s,name))
+                                               text="{} <= Max Q < {}".format(chg_lo,chg_hi_s,name),
+                                               profile=occProfile.stats(indices))
                     #plotHist(vals[indices].flatten(),"hist_{}_{}chg{}".format(mname,chg_lo,chg_hi_s),
                     #                           xtitle=longMetric[mname],
                     #                           nbins=chglog_nbins, lims=None,
@@ -1081,22 +994,14 @@ def trainCNN(options, args, pam_updates=None):
 
     # from tensorflow.keras import backend
     # backend.set_image_data_format('channels_first')
-    if os.path.isdir(options.inputFile):
-        df_arr = []
-        for infile in os.listdir(options.inputFile):
-            if os.path.isdir(options.inputFile+infile): continue
-            infile = os.path.join(options.inputFile,infile)
-            df_arr.append(pd.read_csv(infile, dtype=np.float64, header=0, nrows = options.nrowsPerFile, usecols=[*range(0, 48)]))
-            #df_arr.append(pd.read_csv(infile, dtype=np.float64, header=0,  usecols=[*range(0, 48)]))
-        data = pd.concat(df_arr)
-        data = data.loc[(data.sum(axis=1) != 0)] #drop rows where occupancy = 0
-        data.describe()
+    if options.stream:
+        # only the validation events are held in memory, training events are streamed from the inputs
+        data_values = dataLoader.loadEvents(options.inputFile, ('all' if options.evalOnly else 'val'), options.maxVal,
+                                            chunksize=options.chunksize, nrowsPerFile=options.nrowsPerFile, cacheDir=options.cacheDir,
+                                            intCharges=options.intCharges)
     else:
-        data = pd.read_csv(options.inputFile, dtype=np.float64, usecols=[*range(0, 48)])
-        data = data.loc[(data.sum(axis=1) != 0)] #drop rows where occupancy = 0
-    print('input data shape:',data.shape)
-
-    data_values = data.values
+        data_values = dataLoader.loadData(options.inputFile, options.nrowsPerFile, options.cacheDir, options.loadWorkers, options.intCharges)
+    print('input data shape:',data_values.shape)
 
     if(options.double):
         doubled_data = double_data(data_values.copy())
@@ -1111,11 +1016,18 @@ def trainCNN(options, args, pam_updates=None):
     # >>> h.Fit(f2,"","",20,199)
 
 
-    occupancy_all = np.count_nonzero(data_values,axis=1)
-    occupancy_all_1MT = np.count_nonzero(data_values>35,axis=1)
-    normdata,maxdata,sumdata = normalize(data_values.copy(),rescaleInputToMax=options.rescaleInputToMax)
+    # integer charges are only converted to (float32) fractions here, chunk by chunk
+    if options.intCharges:
+        normdata,maxdata,sumdata = dataLoader.normalizeInt(data_values, rescaleInputToMax=options.rescaleInputToMax,
+                                                           chunksize=options.chunksize)
+    else:
+        normdata,maxdata,sumdata = normalize(data_values.astype(np.float64), rescaleInputToMax=options.rescaleInputToMax)
     maxdata = maxdata / 35. # normalize to units of transverse MIPs
     sumdata = sumdata / 35. # normalize to units of transverse MIPs
+    # per-event occupancies and charges of the full dataset
+    data_features = features.featureTable(data_values, maxdata, sumdata, mip=35.)
+    occupancy_all = data_features['occupancy'].values
+    occupancy_all_1MT = data_features['occupancy_1MT'].values
 
     if options.occReweight:
         weights_occ = getWeights(occupancy_all_1MT,50,0,50)
@@ -1153,7 +1065,20 @@ def trainCNN(options, args, pam_updates=None):
             # 'SSD'      :ssd,
         }
         eval_settings['metrics'].update(more_metrics)
-
+    if options.shapeMetrics:
+        # batched, see batchMetrics.py
+        eval_settings['metrics'].update({
+            'dMean'     :d_weighted_mean,
+            'dRMS'      :d_abs_weighted_rms,
+            'cross_corr':cross_corr,
+            'SSD'       :ssd,
+        })
+
+    # relative to the starting directory, not to odir
+    if options.baselineCache: options.baselineCache = os.path.abspath(options.baselineCache)
+    if options.plotSpecs: options.plotSpecs = os.path.abspath(options.plotSpecs)
+    # plots are recorded and drawn at the end of the run (or saved, to be drawn elsewhere)
+    plotQueue.defer(options.deferPlots or options.noRender or bool(options.plotSpecs))
     orig_dir = os.getcwd()
     if not os.path.exists(options.odir): os.mkdir(options.odir)
     os.chdir(options.odir)
@@ -1163,9 +1088,9 @@ def trainCNN(options, args, pam_updates=None):
                  stats=False,logy=True,nbins=50,lims=[0,50])
         plotHist(occupancy_all_1MT.flatten(),"occ_1MT",xtitle=r"occupancy (1 MIP$_{\mathrm{T}}$ cells)",ytitle="evts",
                  stats=False,logy=True,nbins=50,lims=[0,50])
-        plotHist(np.log10(maxdata.flatten()),"maxQ_all",xtitle=eval_settings['logMaxTitle'],ytitle="evts",
+        plotHist(data_features['log10_maxQ'].values,"maxQ_all",xtitle=eval_settings['logMaxTitle'],ytitle="evts",
                  stats=False,logy=True,nbins=20,lims=[0,2.5])
-        plotHist(np.log10(sumdata.flatten()),"sumQ_all",xtitle=eval_settings['logTotTitle'],ytitle="evts",
+        plotHist(data_features['log10_sumQ'].values,"sumQ_all",xtitle=eval_settings['logTotTitle'],ytitle="evts",
                  stats=False,logy=True,nbins=20,lims=[0,2.5])
     # keep track of each models performance
     perf_dict={}
@@ -1174,28 +1099,37 @@ def trainCNN(options, args, pam_updates=None):
         if not os.path.exists(model_name): os.mkdir(model_name)
         os.chdir(model_name)
 
-        if model['isQK']:
-            m = qDenseCNN(weights_f=model['ws'])
-            print ("m is a qDenseCNN")
-            #m.extend = True # for extra inputs
-        elif model['isDense2D']:
-            m = dense2DkernelCNN(weights_f=model['ws'])
-            print ("m is a dense2DkernelCNN")
-        else:
-            m = denseCNN(weights_f=model['ws'])
-            print ("m is a denseCNN")
-        m.setpams(model['pams'])
-        m.init()
-        shaped_data                     = m.prepInput(normdata)
+        m = makeModel(model)
+        lazyClone = options.lazyClone and m.pams['n_copy']>0
         if options.evalOnly:
-            val_input = shaped_data
-            val_ind = np.array(range(len(shaped_data)))
+            val_input, val_ind = dataPipeline.evalInput(m, normdata)
             train_input = val_input[:0] #empty with correct shape
             train_ind = val_ind[:0]
             print('training shape',train_input.shape)
             print('validation shape',val_input.shape)
+        elif options.stream:
+            val_input, val_ind = dataPipeline.evalInput(m, normdata)
+            train_input = dataPipeline.streamDataset(m, options.inputFile, 'train',
+                                                     rescaleInputToMax=options.rescaleInputToMax,
+                                                     chunksize=options.chunksize, nrowsPerFile=options.nrowsPerFile,
+                                                     cacheDir=options.cacheDir, intCharges=options.intCharges,
+                                                     lazyClone=lazyClone, seed=options.cloneSeed)
+            train_ind = val_ind[:0]
+            print('training input streamed from',options.inputFile)
+            print('validation shape',val_input.shape)
         else:
+            # split the events first: only the training events get the n_copy hi occ clones,
+            # in memory or per batch (lazyClone), so both see the same validation events
+            shaped_data                     = m.prepInput(normdata, clone=False)
             val_input, train_input, val_ind, train_ind = split(shaped_data)
+            if lazyClone:
+                train_input = dataPipeline.arrayDataset(m, train_input, lazyClone=True, seed=options.cloneSeed)
+            elif m.pams['n_copy']>0:
+                occ = np.count_nonzero(train_input.reshape(len(train_input),-1),axis=1)
+                cloned_ind = train_ind[(occ>m.pams['occ_low']) & (occ<=m.pams['occ_hi'])]
+                train_input = m.cloneInput(train_input, m.pams['n_copy'], m.pams['occ_low'], m.pams['occ_hi'])
+                train_ind = np.concatenate([train_ind]+[cloned_ind]*m.pams['n_copy'])
+                print('training shape with clones',train_input.shape)
         m_autoCNN , m_autoCNNen         = m.get_models()
         model['m_autoCNN'] = m_autoCNN
         model['m_autoCNNen'] = m_autoCNNen
@@ -1215,7 +1149,9 @@ def trainCNN(options, args, pam_updates=None):
 
 
         if model['ws']=='':
-            if options.quickTrain: 
+            if options.quickTrain and isinstance(train_input, tf.data.Dataset):
+                train_input = train_input.take(10) # 10 batches of 500
+            elif options.quickTrain: 
                 train_input = train_input[:5000]
                 train_weights = train_weights[:5000]
             if options.occReweight:
@@ -1242,7 +1178,7 @@ def trainCNN(options, args, pam_updates=None):
 
 
         print("Evaluate AE")
-        input_Q, cnn_deQ, cnn_enQ = m.predict(val_input)
+        input_Q, cnn_deQ, cnn_enQ = m.predict(val_input, options.predictBatch)
         ## use physical arrangements for display
         print('input_Q shape',input_Q.shape)
         input_calQ  = m.mapToCalQ(input_Q)   # shape = (N,48) in CALQ order
@@ -1250,28 +1186,38 @@ def trainCNN(options, args, pam_updates=None):
         output_calQ_fr = m.mapToCalQ(cnn_deQ)   # shape = (N,48) in CALQ order
 
         print("Restore normalization")
-        input_Q_abs = np.array([input_Q[i]*(val_max[i] if options.rescaleInputToMax else val_sum[i]) for i in range(0,len(input_Q))]) * 35.   # restore abs input in CALQ unit
-        input_calQ  = np.array([input_calQ[i]*(val_max[i] if options.rescaleInputToMax else val_sum[i]) for i in range(0,len(input_calQ)) ])  # shape = (N,48) in CALQ order
+        val_norm = val_max if options.rescaleInputToMax else val_sum
+        input_Q_abs = features.perEvent(input_Q, val_norm) * 35.   # restore abs input in CALQ unit
+        input_calQ  = features.perEvent(input_calQ, val_norm)  # shape = (N,48) in CALQ order
         output_calQ =  unnormalize(output_calQ_fr.copy(), val_max if options.rescaleOutputToMax else val_sum, rescaleOutputToMax=options.rescaleOutputToMax)
 
         print("Save CSVs")
         ## csv files for RTL verification
         N_csv= (options.nCSV if options.nCSV>=0 else input_Q.shape[0]) # about 80k
         AEvol = m.pams['shape'][0]* m.pams['shape'][1] *  m.pams['shape'][2] 
-        np.savetxt("verify_input_ae.csv", input_Q[0:N_csv].reshape(N_csv,AEvol), delimiter=",",fmt='%.12f')
-        np.savetxt("verify_input_ae_abs.csv", input_Q_abs[0:N_csv].reshape(N_csv,AEvol), delimiter=",",fmt='%.12f')
-        np.savetxt("verify_input_calQ.csv", input_calQ[0:N_csv].reshape(N_csv,48), delimiter=",",fmt='%.12f')
-        np.savetxt("verify_output.csv",cnn_enQ[0:N_csv].reshape(N_csv,m.pams['encoded_dim']), delimiter=",",fmt='%.12f')
-        np.savetxt("verify_decoded.csv",cnn_deQ[0:N_csv].reshape(N_csv,AEvol), delimiter=",",fmt='%.12f')
-        np.savetxt("verify_decoded_calQ.csv",output_calQ_fr[0:N_csv].reshape(N_csv,48), delimiter=",",fmt='%.12f')
+        # fixed-point codes for the quantized inputs/encoded vector of qkeras models, floats otherwise
+        nBits_input = m.pams.get('nBits_input') if model['isQK'] else None
+        nBits_encod = m.pams.get('nBits_encod') if model['isQK'] else None
+        vectors = [
+            ("verify_input_ae",       input_Q[0:N_csv].reshape(N_csv,AEvol),                     nBits_input),
+            ("verify_input_ae_abs",   input_Q_abs[0:N_csv].reshape(N_csv,AEvol),                 None),
+            ("verify_input_calQ",     input_calQ[0:N_csv].reshape(N_csv,48),                     None),
+            ("verify_output",         cnn_enQ[0:N_csv].reshape(N_csv,m.pams['encoded_dim']),     nBits_encod),
+            ("verify_decoded",        cnn_deQ[0:N_csv].reshape(N_csv,AEvol),                     None),
+            ("verify_decoded_calQ",   output_calQ_fr[0:N_csv].reshape(N_csv,48),                 None),
+        ]
+        for vname, vals, nBits in vectors:
+            verifyVectors.writeVectors(vname, vals, fmt=options.verifyFormat, nBits=nBits,
+                                       binary=options.verifyBin, workers=options.verifyWorkers)
 
 
 
         # re-normalize outputs of AE for comparisons
         #occupancy_0MT = np.count_nonzero(input_Q_abs.reshape(len(input_Q),48),axis=1)
         #occupancy_1MT = np.count_nonzero(input_Q_abs.reshape(len(input_Q),48)>1.,axis=1)
-        occupancy_0MT = np.count_nonzero(input_calQ.reshape(len(input_Q),48),axis=1)
-        occupancy_1MT = np.count_nonzero(input_calQ.reshape(len(input_Q),48)>1.,axis=1)
+        val_features = features.featureTable(input_calQ, val_max, val_sum, mip=1.)
+        occupancy_0MT = val_features['occupancy'].values
+        occupancy_1MT = val_features['occupancy_1MT'].values
 
         charges = {
             'input_Q'    : input_Q,               # shape = (N,4,4,3)
@@ -1285,7 +1231,8 @@ def trainCNN(options, args, pam_updates=None):
             'val_max'    : val_max,
         }
         aux_arrs = {
-           'occupancy_1MT':occupancy_1MT 
+           'occupancy_1MT':occupancy_1MT,
+           'features'     :val_features,
         } 
         
         #perf_dict[model_name] , model['summary_dict'] = evalModel(model,charges,aux_arrs,eval_settings,options)
@@ -1307,6 +1254,11 @@ def trainCNN(options, args, pam_updates=None):
     # compare the relative performance of each model
     compareModels(models,perf_dict,eval_settings,options)
 
+    if options.plotSpecs:
+        plotQueue.save(options.plotSpecs)
+    if not options.noRender:
+        plotQueue.render(options.plotWorkers)
+
     os.chdir(orig_dir)
     return     
 
@@ -1322,17 +1274,41 @@ if __name__== "__main__":
     parser.add_option("--nELinks", type='int', default = 5, dest="nElinks", help="n of e-links")
     parser.add_option("--skipPlot", action='store_true', default = False,dest="skipPlot", help="skip the plotting step")
     parser.add_option("--full", action='store_true', default = False,dest="full", help="run all algorithms and metrics")
+    parser.add_option("--shapeMetrics", action='store_true', default = False,dest="shapeMetrics", help="also compute the dMean, dRMS, cross_corr and SSD metrics")
     parser.add_option("--quickTrain", action='store_true', default = False,dest="quickTrain", help="train w only 5k events for testing purposes")
     parser.add_option("--retrain", action='store_true', default = False,dest="retrain", help="retrain models even if weights are already present for testing purposes")
     parser.add_option("--double", action='store_true', default = False,dest="double", help="test PU400 by combining PU200 events")
     parser.add_option("--evalOnly", action='store_true', default = False,dest="evalOnly", help="only evaluate the NN on the input sample, no train")
     parser.add_option("--overrideInput", action='store_true', default = False,dest="overrideInput", help="disable safety check on inputs")
     parser.add_option("--nCSV", type='int', default = 50, dest="nCSV", help="n of validation events to write to csv")
+    parser.add_option("--verifyFormat", type="choice", choices=verifyVectors.FORMATS, default = 'float', dest="verifyFormat", help="format of the verify_*.csv quantized vectors: float, or the fixed-point codes as int or hex")
+    parser.add_option("--verifyBin", action='store_true', default = False, dest="verifyBin", help="also write the verification vectors to .bin files, described in .json files")
+    parser.add_option("--verifyWorkers", type='int', default=1, dest="verifyWorkers", help="n of processes formatting the verification vectors (-1: all cores)")
     parser.add_option("--maxVal", type='int', default = -1, dest="maxVal", help="n of validation events to consider")
     parser.add_option("--AEonly", type='int', default=1, dest="AEonly", help="run only AE algo")
     parser.add_option("--rescaleInputToMax", type='int', default=0, dest="rescaleInputToMax", help="recale the input images so the maximum deposit is 1. Else normalize")
     parser.add_option("--rescaleOutputToMax", type='int', default=0, dest="rescaleOutputToMax", help="recale the output images to match the initial sum")
     parser.add_option("--nrowsPerFile", type='int', default=500000, dest="nrowsPerFile", help="load nrowsPerFile in a directory")
+    parser.add_option("--cacheDir", type="string", default = '', dest="cacheDir", help="cache parsed input CSVs as memory-mapped .npy files in this directory")
+    parser.add_option("--loadWorkers", type='int', default=1, dest="loadWorkers", help="n of processes reading the files of an input directory (-1: all cores)")
+    parser.add_option("--stream", action='store_true', default = False,dest="stream", help="stream the training events with tf.data instead of loading the full input")
+    parser.add_option("--chunksize", type='int', default=100000, dest="chunksize", help="n of rows read per chunk when streaming, and normalized per chunk with --intCharges")
+    parser.add_option("--intCharges", action='store_true', default = False,dest="intCharges", help="keep the raw input charges as unsigned integers, and the normalized inputs as float32")
+    parser.add_option("--lazyClone", action='store_true', default = False,dest="lazyClone", help="make the n_copy hi occ clones of the training events per batch instead of in memory")
+    parser.add_option("--cloneSeed", type='int', default=0, dest="cloneSeed", help="seed for the training event order and the cell order of the lazy clones")
+    parser.add_option("--predictBatch", type='int', default=500, dest="predictBatch", help="batch size for the AE evaluation")
+    parser.add_option("--emdWorkers", type='int', default=1, dest="emdWorkers", help="n of processes computing the EMD of the evaluation events (-1: all cores)")
+    parser.add_option("--sparseEMD", action='store_true', default = False,dest="sparseEMD", help="solve the EMD on the non-zero cells of each event only")
+    parser.add_option("--treeEMD", action='store_true', default = False,dest="treeEMD", help="use the tree-Wasserstein approximation on the supercell hierarchy for the EMD")
+    parser.add_option("--treeCalib", type='int', default=0, dest="treeCalib", help="n of AE output events on which to compare the tree EMD with the exact EMD, once per model")
+    parser.add_option("--baselineCache", type="string", default = '', dest="baselineCache", help="save the baseline algorithm outputs and metrics in this directory, to reuse them in later runs")
+    parser.add_option("--saveAccumulators", action='store_true', default = False,dest="saveAccumulators", help="save mergeable histograms/moments of each metric (acc_<metric>_<alg>.npz)")
+    parser.add_option("--deferPlots", action='store_true', default = False,dest="deferPlots", help="draw the plots at the end of the run, in --plotWorkers processes")
+    parser.add_option("--plotWorkers", type='int', default=1, dest="plotWorkers", help="n of processes drawing the deferred plots (-1: all cores)")
+    parser.add_option("--plotSpecs", type="string", default = '', dest="plotSpecs", help="save the deferred plots to this file, to draw them with 'python plotQueue.py <file>'")
+    parser.add_option("--noRender", action='store_true', default = False,dest="noRender", help="do not draw the deferred plots (e.g. on batch nodes, with --plotSpecs)")
+    parser.add_option("--maxFlops", type='int', default=0, dest="maxFlops", help="skip the models whose encoder needs more FLOPs than this")
+    parser.add_option("--maxPams", type='int', default=0, dest="maxPams", help="skip the models whose encoder has more parameters than this")
     parser.add_option("--occReweight", action='store_true', default = False,dest="occReweight", help="Train with per-event weight on TC occupancy")
     (options, args) = parser.parse_args()
     trainCNN(options,args)
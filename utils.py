@@ -53,6 +53,22 @@ def encode_ECON(val,n_mantissa=3,n_exp=4):
     mantissa = (val>>exp) - (1<<(n_mantissa-1))
     return (mantissa,exp)
 
+## array versions, identical to the scalar ones element by element
+def decode_ECON_array(mantissa, exp, n_mantissa=3,n_exp=4):
+    mantissa = np.asarray(mantissa, dtype=np.int64)
+    exp = np.asarray(exp, dtype=np.int64)
+    return np.where(exp==0, mantissa, (mantissa + (1<<n_mantissa)) << np.maximum(exp-1,0))
+
+def encode_ECON_array(val,n_mantissa=3,n_exp=4):
+    val = np.asarray(val, dtype=np.int64)
+    # same float log2 as encode_ECON
+    with np.errstate(divide='ignore'):
+        msb = np.where(val>0, np.log2(np.maximum(val,1)), 0).astype(np.int64)
+    exp = np.maximum(msb-n_mantissa+1,(1<<n_exp)-1)
+    mantissa = (val>>exp) - (1<<(n_mantissa-1))
+    small = (val==0) | (msb<n_mantissa)
+    return np.where(small, val, mantissa), np.where(small, 0, exp)
+
 def test_econ():
     for m in range(1<<3):    
         for e in range(1<<4):
@@ -0,0 +1,93 @@
+import numpy as np
+import json
+from concurrent.futures import ProcessPoolExecutor
+from fixedPoint import QuantizedBits
+import poolUtil
+
+## Verification vectors for the RTL testbench: one event per row, written chunk by
+## chunk, with the text formatting of the chunks optionally spread over processes.
+##   fmt='float' : csv as np.savetxt(fname, x, delimiter=',', fmt='%.12f')
+##   fmt='int'   : csv of the fixed-point integer codes of the quantizer nBits
+##   fmt='hex'   : same codes in two's complement hex, ceil(bits/4) digits
+## With binary=True, the same values go to <name>.bin (float32 or the smallest
+## signed int type holding the codes, little endian), and the layout to <name>.json.
+
+FORMATS = ['float','int','hex']
+
+def _formatChunk(job):
+    rowfmt, chunk = job
+    return (rowfmt*len(chunk)) % tuple(chunk.ravel().tolist())
+
+def _chunks(x, chunksize):
+    for i in range(0, len(x), chunksize):
+        yield x[i:i+chunksize]
+
+## the lines of x, formatted by rowfmt, in order; at most 2*workers chunks in flight
+def _formatted(x, rowfmt, chunksize, workers):
+    workers = poolUtil.nWorkers(workers)
+    if workers <= 1 or len(x) <= chunksize:
+        for chunk in _chunks(x, chunksize):
+            yield _formatChunk((rowfmt, chunk))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in _chunks(x, chunksize):
+            pending.append(pool.submit(_formatChunk, (rowfmt, np.asarray(chunk))))
+            if len(pending) >= 2*workers:
+                yield pending.pop(0).result()
+        for f in pending:
+            yield f.result()
+
+def writeText(fname, x, fmt='%.12f', chunksize=10000, workers=1):
+    x = np.asarray(x)
+    x = x.reshape(len(x), -1)
+    rowfmt = ','.join([fmt]*x.shape[1]) + '\n'
+    with open(fname, 'w') as f:
+        for s in _formatted(x, rowfmt, chunksize, workers):
+            f.write(s)
+
+## fixed-point codes of x for the nBits quantizer (as the 'nBits_*' pams of qDenseCNN)
+def toFixed(x, nBits):
+    return QuantizedBits.fromPams(nBits).fromFloat(x)[0]
+
+def _intType(q):
+    for dtype in [np.int8, np.int16, np.int32]:
+        if q.min >= np.iinfo(dtype).min and q.max <= np.iinfo(dtype).max: return dtype
+    return np.int64
+
+def writeVectors(name, x, fmt='float', nBits=None, binary=False, chunksize=10000, workers=1):
+    if fmt not in FORMATS:
+        raise ValueError("unknown verification vector format '%s', use one of %s"%(fmt, FORMATS))
+    x = np.asarray(x)
+    x = x.reshape(len(x), -1)
+    meta = {'rows':x.shape[0], 'columns':x.shape[1], 'format':fmt, 'byteorder':'little'}
+    if fmt=='float' or nBits is None:
+        # no quantizer for these values (e.g. decoder outputs), always floats
+        meta['format'] = 'float'
+        writeText(name+'.csv', x, '%.12f', chunksize, workers)
+        dtype = np.float32
+        values = x
+    else:
+        q = QuantizedBits.fromPams(nBits)
+        dtype = _intType(q)
+        values = toFixed(x, nBits)
+        meta.update({'nBits':nBits, 'exponent':q.exponent})  # value = code * 2**exponent
+        if fmt=='int':
+            writeText(name+'.csv', values, '%d', chunksize, workers)
+        else:
+            digits = (q.bits+3)//4
+            meta['hexDigits'] = digits
+            writeText(name+'.csv', values & ((1<<(4*digits))-1), '%%0%ix'%digits, chunksize, workers)
+    if binary:
+        meta['dtype'] = np.dtype(dtype).newbyteorder('<').str
+        with open(name+'.bin', 'wb') as f:
+            for chunk in _chunks(values, chunksize):
+                f.write(np.ascontiguousarray(chunk, dtype=meta['dtype']).tobytes())
+        with open(name+'.json', 'w') as f:
+            f.write(json.dumps(meta, indent=4))
+    return meta
+
+def readBinary(name):
+    with open(name+'.json') as f:
+        meta = json.load(f)
+    return np.fromfile(name+'.bin', dtype=meta['dtype']).reshape(meta['rows'], meta['columns'])